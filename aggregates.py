@@ -0,0 +1,111 @@
+# Agregados por coluna mantidos incrementalmente
+#
+# Cada coluna guarda o total de cards, a contagem por prioridade e a maior
+# posição ocupada. O repositório ajusta esses valores na mesma transação de cada
+# mutação de card, com incrementos feitos pelo próprio banco (sem ler e regravar
+# a linha), de modo que o resumo do quadro e o cálculo do final da coluna não
+# precisam percorrer os cards. `recompute` recalcula os valores a partir dos
+# cards e é usado pela migração e pelo reparo de divergências.
+from typing import Dict, Iterable, List
+
+from sqlalchemy import bindparam, func, inspect, or_, select, text, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.util import identity_key
+from sqlalchemy.schema import CreateColumn
+
+from model import Card, Kcolumn, PriorityLevel
+
+# Contador de cada prioridade na coluna
+PRIORITY_COUNTS = {
+    PriorityLevel.LOW: Kcolumn.low_count,
+    PriorityLevel.MEDIUM: Kcolumn.medium_count,
+    PriorityLevel.HIGH: Kcolumn.high_count,
+}
+
+COUNT_COLUMNS = (Kcolumn.card_count, *PRIORITY_COUNTS.values())
+AGGREGATE_COLUMNS = (*COUNT_COLUMNS, Kcolumn.max_position)
+AGGREGATE_KEYS = [column.key for column in AGGREGATE_COLUMNS]
+
+kcolumns = Kcolumn.__table__
+
+
+def _max_position():
+    return select(func.max(Card.position)).where(Card.kcolumn_id == Kcolumn.id).scalar_subquery()
+
+
+def _computed_values() -> Dict[str, object]:
+    """Subconsultas correlacionadas com o valor correto de cada agregado"""
+    cards = select(func.count(Card.id)).where(Card.kcolumn_id == Kcolumn.id)
+    values = {Kcolumn.card_count.key: cards.scalar_subquery()}
+    for priority, count in PRIORITY_COUNTS.items():
+        values[count.key] = cards.where(Card.priority == priority).scalar_subquery()
+    values[Kcolumn.max_position.key] = _max_position()
+    return values
+
+
+def install_aggregates(connection: Connection) -> None:
+    """Adiciona as colunas de agregados ausentes e preenche todos os valores"""
+    existing = {column["name"] for column in inspect(connection).get_columns(kcolumns.name)}
+    for key in AGGREGATE_KEYS:
+        if key not in existing:
+            ddl = CreateColumn(kcolumns.c[key]).compile(dialect=connection.dialect)
+            connection.execute(text(f"ALTER TABLE {kcolumns.name} ADD COLUMN {ddl}"))
+    recompute(connection)
+
+
+def recompute(connection: Connection, kcolumn_ids: Iterable[int] = None) -> None:
+    """Recalcula os agregados das colunas informadas (todas, se None)"""
+    statement = update(kcolumns).values(_computed_values())
+    if kcolumn_ids is not None:
+        statement = statement.where(kcolumns.c.id.in_(list(kcolumn_ids)))
+    connection.execute(statement)
+
+
+def find_drift(connection: Connection, board_id: int = None) -> List[int]:
+    """IDs das colunas cujos agregados divergem dos cards (opcionalmente de um quadro)"""
+    values = _computed_values()
+    query = select(Kcolumn.id).where(or_(*(
+        getattr(Kcolumn, key).is_distinct_from(value) for key, value in values.items()
+    )))
+    if board_id is not None:
+        query = query.where(Kcolumn.board_id == board_id)
+    return list(connection.execute(query.order_by(Kcolumn.id)).scalars())
+
+
+def apply_count_deltas(connection: Connection, deltas: Dict[int, Dict[PriorityLevel, int]]) -> None:
+    """Soma as variações por prioridade (kcolumn_id -> {prioridade: variação})
+    aos contadores das colunas, com um único executemany"""
+    if not deltas:
+        return
+    statement = update(kcolumns).where(kcolumns.c.id == bindparam("target_id")).values({
+        Kcolumn.card_count.key: kcolumns.c.card_count + bindparam("delta_total"),
+        **{
+            count.key: kcolumns.c[count.key] + bindparam(f"delta_{priority.value}")
+            for priority, count in PRIORITY_COUNTS.items()
+        }
+    })
+    connection.execute(statement, [
+        {
+            "target_id": kcolumn_id,
+            "delta_total": sum(by_priority.values()),
+            **{f"delta_{priority.value}": by_priority.get(priority, 0) for priority in PRIORITY_COUNTS}
+        }
+        for kcolumn_id, by_priority in deltas.items()
+    ])
+
+
+def refresh_max_positions(connection: Connection, kcolumn_ids: Iterable[int]) -> None:
+    """Recalcula max_position das colunas pelo índice (kcolumn_id, position)"""
+    connection.execute(
+        update(kcolumns).where(kcolumns.c.id.in_(list(kcolumn_ids))).values(max_position=_max_position())
+    )
+
+
+def expire_columns(session: Session, kcolumn_ids: Iterable[int]) -> None:
+    """Descarta os agregados (e a versão) em memória das colunas já carregadas
+    na sessão, que ficam desatualizados após os UPDATEs feitos fora do ORM"""
+    for kcolumn_id in kcolumn_ids:
+        column = session.identity_map.get(identity_key(Kcolumn, kcolumn_id))
+        if column is not None:
+            session.expire(column, AGGREGATE_KEYS + [Kcolumn.version.key])
@@ -0,0 +1,204 @@
+# Métricas de fluxo sobre o histórico de transições (ver history.py)
+#
+# Todas as métricas são calculadas pelo banco, em uma consulta cada, com
+# agregações e funções de janela sobre `card_transitions`; nenhum card é
+# carregado em Python. As definições usadas:
+#
+# - conclusão: a primeira vez que o card é movido para uma coluna de
+#   concluídos (is_done) do quadro; cards criados diretamente nela não contam
+# - lead time: da criação do card até a conclusão
+# - tempo de ciclo: da primeira entrada em uma coluna em andamento (nem a
+#   primeira coluna do quadro, nem de concluídos) até a conclusão
+# - WIP: cards em cada coluna em um instante, segundo a última transição de
+#   cada card até ele
+#
+# As colunas são as atuais do quadro: transições para colunas já excluídas
+# não entram nas métricas. Os percentis são do tipo "nearest rank", obtidos
+# com CUME_DIST() tanto no SQLite quanto no PostgreSQL.
+from datetime import date, datetime
+from typing import Dict, List, Sequence
+
+from sqlalchemy import Date, and_, case, cast, func, select
+from sqlalchemy.orm import Session
+
+from model import CardTransition, Kcolumn
+
+# Percentis padrão dos tempos de ciclo e de lead time
+CYCLE_TIME_PERCENTILES = (0.5, 0.85, 0.95)
+
+# Períodos aceitos por throughput
+PERIODS = ("day", "week", "month")
+
+transitions = CardTransition.__table__
+kcolumns = Kcolumn.__table__
+
+
+def _seconds_between(dialect: str, start, end):
+    if dialect == "sqlite":
+        return (func.julianday(end) - func.julianday(start)) * 86400.0
+    if dialect == "postgresql":
+        return func.extract("epoch", end - start)
+    raise ValueError(f"Métricas de fluxo não suportadas para o banco '{dialect}'")
+
+
+def _period_start(dialect: str, moment, period: str):
+    if period not in PERIODS:
+        raise ValueError(f"Período desconhecido. Use um de: {', '.join(PERIODS)}")
+    if dialect == "sqlite":
+        if period == "day":
+            return func.date(moment)
+        if period == "week":
+            # Segunda-feira da semana: avança até o domingo e volta seis dias
+            return func.date(moment, "weekday 0", "-6 days")
+        return func.strftime("%Y-%m-01", moment)
+    if dialect == "postgresql":
+        return cast(func.date_trunc(period, moment), Date)
+    raise ValueError(f"Métricas de fluxo não suportadas para o banco '{dialect}'")
+
+
+def _percentile_key(fraction: float) -> str:
+    return f"p{fraction * 100:g}"
+
+
+def _board_columns(board_id: int, *conditions):
+    """IDs das colunas atuais do quadro que atendem às condições"""
+    return select(kcolumns.c.id).where(kcolumns.c.board_id == board_id, *conditions)
+
+
+def _completions(board_id: int, since: datetime = None, until: datetime = None):
+    """Subconsulta (card_id, created_at, started_at, done_at) dos cards
+    concluídos no quadro dentro de [since, until)"""
+    done_columns = _board_columns(board_id, kcolumns.c.is_done == True)
+    first_position = select(func.min(kcolumns.c.position)).where(
+        kcolumns.c.board_id == board_id
+    ).scalar_subquery()
+    in_progress_columns = _board_columns(
+        board_id, kcolumns.c.is_done == False, kcolumns.c.position > first_position
+    )
+    done_arrival = and_(
+        transitions.c.to_kcolumn_id.in_(done_columns),
+        transitions.c.from_kcolumn_id.isnot(None)
+    )
+    
+    # Candidatos: cards com alguma chegada a concluídos no intervalo, pelo
+    # índice (to_kcolumn_id, transitioned_at)
+    arrivals = select(transitions.c.card_id).where(done_arrival)
+    if since is not None:
+        arrivals = arrivals.where(transitions.c.transitioned_at >= since)
+    if until is not None:
+        arrivals = arrivals.where(transitions.c.transitioned_at < until)
+    
+    # Um registro por card com o instante de cada marco, sobre todo o histórico
+    # do card (a primeira conclusão pode ter sido antes do intervalo)
+    per_card = select(
+        transitions.c.card_id,
+        func.min(case(
+            (transitions.c.from_kcolumn_id.is_(None), transitions.c.transitioned_at)
+        )).label("created_at"),
+        func.min(case(
+            (transitions.c.to_kcolumn_id.in_(in_progress_columns), transitions.c.transitioned_at)
+        )).label("started_at"),
+        func.min(case((done_arrival, transitions.c.transitioned_at))).label("done_at"),
+    ).where(
+        transitions.c.card_id.in_(arrivals)
+    ).group_by(transitions.c.card_id).subquery()
+    
+    query = select(per_card)
+    if since is not None:
+        query = query.where(per_card.c.done_at >= since)
+    if until is not None:
+        query = query.where(per_card.c.done_at < until)
+    return query.subquery()
+
+
+def cycle_times(session: Session, board_id: int, since: datetime = None, until: datetime = None,
+                percentiles: Sequence[float] = CYCLE_TIME_PERCENTILES) -> Dict[str, dict]:
+    """Percentis, média e contagem do lead time e do tempo de ciclo (segundos)
+    dos cards concluídos em [since, until)"""
+    dialect = session.get_bind().dialect.name
+    completed = _completions(board_id, since, until)
+    
+    durations = select(
+        _seconds_between(dialect, completed.c.created_at, completed.c.done_at).label("lead_time"),
+        case((
+            completed.c.started_at <= completed.c.done_at,
+            _seconds_between(dialect, completed.c.started_at, completed.c.done_at)
+        )).label("cycle_time")
+    ).subquery()
+    # Uma única passagem: a distribuição acumulada de cada métrica, separando
+    # os cards sem a métrica (nulos) em outra partição
+    metrics = (durations.c.lead_time, durations.c.cycle_time)
+    ranked = select(*metrics, *(
+        func.cume_dist().over(partition_by=metric.is_(None), order_by=metric).label(f"{metric.name}_rank")
+        for metric in metrics
+    )).subquery()
+    
+    aggregates = []
+    for metric in metrics:
+        value, rank = ranked.c[metric.name], ranked.c[f"{metric.name}_rank"]
+        aggregates.extend((func.count(value), func.avg(value)))
+        aggregates.extend(
+            func.min(case((and_(value.isnot(None), rank >= fraction), value))) for fraction in percentiles
+        )
+    row = session.execute(select(*aggregates)).one()
+    
+    result = {}
+    width = 2 + len(percentiles)
+    for index, metric in enumerate(metrics):
+        count, mean, *values = row[index * width:(index + 1) * width]
+        result[metric.name] = {
+            "count": count,
+            "mean": float(mean) if count else None,
+            **{
+                _percentile_key(fraction): float(value) if count else None
+                for fraction, value in zip(percentiles, values)
+            }
+        }
+    return result
+
+
+def throughput(session: Session, board_id: int, period: str = "week", since: datetime = None,
+               until: datetime = None) -> List[dict]:
+    """Cards concluídos por período em [since, until), em ordem cronológica;
+    períodos sem conclusões são omitidos"""
+    dialect = session.get_bind().dialect.name
+    completed = _completions(board_id, since, until)
+    bucket = _period_start(dialect, completed.c.done_at, period).label("period_start")
+    rows = session.execute(
+        select(bucket, func.count()).group_by(bucket).order_by(bucket)
+    ).all()
+    return [
+        {
+            "period_start": date.fromisoformat(start) if isinstance(start, str) else start,
+            "count": count
+        }
+        for start, count in rows
+    ]
+
+
+def wip(session: Session, board_id: int, at: datetime) -> Dict[int, int]:
+    """Número de cards em cada coluna do quadro no instante `at`, indexado pelo
+    ID da coluna (colunas sem cards são omitidas)"""
+    board_columns = _board_columns(board_id)
+    # Última transição até `at` de cada card que passou pelo quadro
+    touched = select(transitions.c.card_id).where(
+        transitions.c.to_kcolumn_id.in_(board_columns),
+        transitions.c.transitioned_at <= at
+    )
+    latest = select(
+        transitions.c.to_kcolumn_id,
+        func.row_number().over(
+            partition_by=transitions.c.card_id,
+            order_by=(transitions.c.transitioned_at.desc(), transitions.c.id.desc())
+        ).label("recency")
+    ).where(
+        transitions.c.card_id.in_(touched),
+        transitions.c.transitioned_at <= at
+    ).subquery()
+    rows = session.execute(
+        select(latest.c.to_kcolumn_id, func.count()).where(
+            latest.c.recency == 1,
+            latest.c.to_kcolumn_id.in_(board_columns)
+        ).group_by(latest.c.to_kcolumn_id)
+    ).all()
+    return dict(rows)
@@ -0,0 +1,135 @@
+# Arquivamento de quadros inativos e de cards concluídos
+#
+# Quadros excluídos (soft delete) e cards parados em colunas de concluídos
+# continuariam nas tabelas principais para sempre, e toda consulta teria de
+# filtrá-los. O arquivamento move essas linhas, em lotes, para tabelas de
+# arquivo com a mesma estrutura (`archived_boards`, `archived_kcolumns`,
+# `archived_cards`) dentro do mesmo banco: cada lote é um INSERT ... SELECT
+# seguido do DELETE correspondente, na mesma transação, de modo que uma linha
+# nunca fica nos dois lugares nem em nenhum. Os IDs são preservados, e
+# `restore_board` devolve um quadro arquivado às tabelas principais.
+from datetime import datetime
+from typing import Iterable, List
+
+from sqlalchemy import literal, select
+from sqlalchemy.orm import Session
+
+from model import (ArchivedBoard, ArchivedCard, ArchivedKcolumn, Board, BoardChange, Card,
+                   Kcolumn)
+
+# Tamanho padrão dos lotes de arquivamento
+ARCHIVE_BATCH_SIZE = 500
+
+# Dias em uma coluna de concluídos após os quais um card é arquivado, por padrão
+DONE_CARD_RETENTION_DAYS = 30
+
+# Colunas copiadas entre as tabelas principais e as de arquivo
+BOARD_COLUMNS = ("id", "uuid", "name", "description", "created_at", "updated_at", "is_active", "revision")
+KCOLUMN_COLUMNS = ("id", "uuid", "title", "position", "board_id", "created_at", "updated_at", "is_done")
+CARD_COLUMNS = (
+    "id", "uuid", "title", "description", "assignee", "due_date", "priority", "position",
+    "kcolumn_id", "created_at", "updated_at", "version"
+)
+
+boards = Board.__table__
+kcolumns = Kcolumn.__table__
+cards = Card.__table__
+board_changes = BoardChange.__table__
+archived_boards = ArchivedBoard.__table__
+archived_kcolumns = ArchivedKcolumn.__table__
+archived_cards = ArchivedCard.__table__
+
+
+def _columns(model, names: Iterable[str]) -> list:
+    return [getattr(model, name) for name in names]
+
+
+def archive_boards(session: Session, board_ids: List[int]) -> None:
+    """Move os quadros, suas colunas e seus cards para as tabelas de arquivo.
+    
+    O registro de alterações dos quadros é descartado: clientes que os
+    sincronizavam passam a receber None em get_board_changes.
+    """
+    now = datetime.now()
+    kcolumn_ids = select(Kcolumn.id).where(Kcolumn.board_id.in_(board_ids))
+    session.execute(archived_boards.insert().from_select(
+        [*BOARD_COLUMNS, "archived_at"],
+        select(*_columns(Board, BOARD_COLUMNS), literal(now)).where(Board.id.in_(board_ids))
+    ))
+    session.execute(archived_kcolumns.insert().from_select(
+        [*KCOLUMN_COLUMNS, "archived_at"],
+        select(*_columns(Kcolumn, KCOLUMN_COLUMNS), literal(now)).where(Kcolumn.board_id.in_(board_ids))
+    ))
+    session.execute(archived_cards.insert().from_select(
+        [*CARD_COLUMNS, "board_id", "archived_at"],
+        select(*_columns(Card, CARD_COLUMNS), Kcolumn.board_id, literal(now)).join(
+            Kcolumn, Kcolumn.id == Card.kcolumn_id
+        ).where(Kcolumn.board_id.in_(board_ids))
+    ))
+    
+    session.execute(cards.delete().where(Card.kcolumn_id.in_(kcolumn_ids)))
+    session.execute(kcolumns.delete().where(Kcolumn.board_id.in_(board_ids)))
+    session.execute(board_changes.delete().where(BoardChange.board_id.in_(board_ids)))
+    session.execute(boards.delete().where(Board.id.in_(board_ids)))
+
+
+def archive_cards(session: Session, card_ids: List[int]) -> None:
+    """Move os cards para `archived_cards`; as colunas continuam ativas"""
+    session.execute(archived_cards.insert().from_select(
+        [*CARD_COLUMNS, "board_id", "archived_at"],
+        select(*_columns(Card, CARD_COLUMNS), Kcolumn.board_id, literal(datetime.now())).join(
+            Kcolumn, Kcolumn.id == Card.kcolumn_id
+        ).where(Card.id.in_(card_ids))
+    ))
+    session.execute(cards.delete().where(Card.id.in_(card_ids)))
+
+
+def restore_board(session: Session, board_id: int) -> List[int]:
+    """Devolve às tabelas principais um quadro arquivado, ativo, com suas
+    colunas e todos os cards arquivados delas.
+    
+    O quadro volta em uma revisão nova, já marcada como podada, para que
+    clientes com revisões antigas recarreguem o quadro. Retorna os IDs das
+    colunas restauradas (para o recálculo dos agregados). Levanta ValueError se
+    o quadro não estiver arquivado ou se algum ID já estiver em uso (possível em
+    bancos SQLite anteriores ao arquivamento, que reutilizam IDs).
+    """
+    revision = session.execute(
+        select(ArchivedBoard.revision).where(ArchivedBoard.id == board_id)
+    ).scalar()
+    if revision is None:
+        raise ValueError(f"Quadro não arquivado: {board_id}")
+    
+    kcolumn_ids = list(session.execute(
+        select(ArchivedKcolumn.id).where(ArchivedKcolumn.board_id == board_id)
+    ).scalars())
+    card_ids = select(ArchivedCard.id).where(ArchivedCard.kcolumn_id.in_(kcolumn_ids))
+    in_use = (
+        session.execute(select(Board.id).where(Board.id == board_id)).first()
+        or session.execute(select(Kcolumn.id).where(Kcolumn.id.in_(kcolumn_ids)).limit(1)).first()
+        or session.execute(select(Card.id).where(Card.id.in_(card_ids)).limit(1)).first()
+    )
+    if in_use:
+        raise ValueError(f"IDs do quadro {board_id} já estão em uso; não é possível restaurá-lo")
+    
+    restored_columns = [name for name in BOARD_COLUMNS if name not in ("is_active", "revision")]
+    session.execute(boards.insert().from_select(
+        [*restored_columns, "is_active", "revision", "pruned_revision"],
+        select(
+            *_columns(ArchivedBoard, restored_columns),
+            literal(True), literal(revision + 1), literal(revision + 1)
+        ).where(ArchivedBoard.id == board_id)
+    ))
+    session.execute(kcolumns.insert().from_select(
+        list(KCOLUMN_COLUMNS),
+        select(*_columns(ArchivedKcolumn, KCOLUMN_COLUMNS)).where(ArchivedKcolumn.id.in_(kcolumn_ids))
+    ))
+    session.execute(cards.insert().from_select(
+        list(CARD_COLUMNS),
+        select(*_columns(ArchivedCard, CARD_COLUMNS)).where(ArchivedCard.kcolumn_id.in_(kcolumn_ids))
+    ))
+    
+    session.execute(archived_cards.delete().where(ArchivedCard.kcolumn_id.in_(kcolumn_ids)))
+    session.execute(archived_kcolumns.delete().where(ArchivedKcolumn.board_id == board_id))
+    session.execute(archived_boards.delete().where(ArchivedBoard.id == board_id))
+    return kcolumn_ids
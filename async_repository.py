@@ -0,0 +1,345 @@
+# Repositório assíncrono do Sistema Kanban
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session
+from analytics import CYCLE_TIME_PERCENTILES
+from archive import ARCHIVE_BATCH_SIZE, DONE_CARD_RETENTION_DAYS
+from changes import CHANGE_RETENTION
+from db import Base, DatabaseConfig, ReplicaSet
+from migrations import SCHEMA_VERSION, ensure_schema
+from model import Board, Card, Kcolumn, PriorityLevel
+from records import BoardRecord, CardRecord, ColumnRecord
+from repository import CARD_BATCH_SIZE, PAGE_SIZE, KanbanRepository, Page, batched
+
+logger = logging.getLogger("kanban.async_repository")
+
+class AsyncKanbanRepository:
+    """Versão assíncrona do KanbanRepository, sobre create_async_engine/AsyncSession.
+    
+    As consultas são as mesmas do repositório síncrono: cada operação abre uma
+    AsyncSession, executa o método correspondente do KanbanRepository sobre ela
+    via `AsyncSession.run_sync` e faz o commit de forma assíncrona. Assim as
+    duas implementações não divergem e operações independentes podem rodar em
+    paralelo com `asyncio.gather`, cada uma na sua sessão.
+    
+    Requer aiosqlite (SQLite) ou asyncpg (PostgreSQL). Leituras são
+    direcionadas às réplicas de `config.replicas` com as mesmas regras do
+    repositório síncrono.
+    """
+    
+    def __init__(self, config: DatabaseConfig, engine: AsyncEngine = None):
+        """`engine` permite compartilhar um AsyncEngine entre vários repositórios"""
+        self.config = config
+        self.engine = engine or config.create_async_engine()
+        self.SessionLocal = async_sessionmaker(self.engine, autoflush=False, expire_on_commit=False)
+        # AsyncSession do unit_of_work() atual, se houver
+        self._active_session: ContextVar[Optional[AsyncSession]] = ContextVar(
+            f"kanban_async_active_session_{id(self)}", default=None
+        )
+        self.replicas = config.create_async_replica_set()
+        self._last_write: ContextVar[Optional[float]] = ContextVar(
+            f"kanban_async_last_write_{id(self)}", default=None
+        )
+        self._primary_reads: ContextVar[bool] = ContextVar(
+            f"kanban_async_primary_reads_{id(self)}", default=False
+        )
+        # O roteamento das leituras é feito aqui; o repositório síncrono só
+        # executa as operações nas sessões que recebe
+        self._repository = KanbanRepository(config, engine=self.engine.sync_engine, create_schema=False,
+                                            replicas=ReplicaSet([]))
+    
+    async def create_tables(self):
+        """Cria as tabelas e aplica as migrações pendentes, sem DDL se o esquema
+        já está na versão atual (ver KanbanRepository.create_tables)"""
+        async with self.engine.begin() as connection:
+            applied = await connection.run_sync(ensure_schema)
+        if applied is None:
+            logger.debug("Esquema do banco %s já está na versão %s", self.config.database_type, SCHEMA_VERSION)
+        else:
+            logger.info("Tabelas criadas no banco %s", self.config.database_type)
+            if applied:
+                logger.info("Migrações aplicadas: %s", applied)
+        if self.replicas and self.config.database_type == "sqlite":
+            await self.refresh_replicas()
+    
+    async def refresh_replicas(self) -> None:
+        """Copia o banco primário sobre cada réplica SQLite (ver KanbanRepository.refresh_replicas)"""
+        await asyncio.to_thread(self._repository.refresh_replicas)
+    
+    async def drop_tables(self):
+        """Remove todas as tabelas (USE COM CUIDADO!)"""
+        async with self.engine.begin() as connection:
+            await connection.run_sync(Base.metadata.drop_all)
+        logger.info("Todas as tabelas foram removidas")
+    
+    async def dispose(self):
+        """Fecha as conexões do pool (primário e réplicas)"""
+        await self.engine.dispose()
+        for replica in self.replicas.engines:
+            await replica.dispose()
+    
+    def get_session(self) -> AsyncSession:
+        """Retorna uma sessão assíncrona do banco de dados"""
+        return self.SessionLocal()
+    
+    @asynccontextmanager
+    async def unit_of_work(self) -> AsyncIterator[AsyncSession]:
+        """Executa as operações do bloco em uma única AsyncSession e transação.
+        
+        Commit único ao final e rollback se ocorrer exceção. As operações do
+        bloco compartilham a sessão e por isso devem ser aguardadas em
+        sequência, não com asyncio.gather.
+        """
+        if self._active_session.get() is not None:
+            yield self._active_session.get()
+            return
+        
+        async with self.get_session() as session:
+            session.sync_session.autoflush = True
+            token = self._active_session.set(session)
+            try:
+                yield session
+            except BaseException:
+                await session.rollback()
+                raise
+            finally:
+                self._active_session.reset(token)
+            await session.commit()
+        self._last_write.set(time.monotonic())
+    
+    def in_unit_of_work(self) -> bool:
+        """Indica se há um unit_of_work() ativo no contexto atual"""
+        return self._active_session.get() is not None
+    
+    async def _run(self, operation, *args, **kwargs):
+        """Executa uma operação do repositório síncrono em uma AsyncSession.
+        
+        Usa a sessão do unit_of_work() ativo ou abre uma nova, com commit ao final.
+        """
+        session = self._active_session.get()
+        if session is not None:
+            return await session.run_sync(self._call_in_session, operation, args, kwargs)
+        
+        async with self.get_session() as session:
+            result = await session.run_sync(self._call_in_session, operation, args, kwargs)
+            await session.commit()
+        self._last_write.set(time.monotonic())
+        return result
+    
+    async def _run_read(self, operation, *args, **kwargs):
+        """Executa uma leitura do repositório síncrono na sessão ativa ou em
+        uma sessão de leitura (ver _read_session), sem commit"""
+        session = self._active_session.get()
+        if session is not None:
+            return await session.run_sync(self._call_in_session, operation, args, kwargs)
+        
+        async with self._read_session() as session:
+            return await session.run_sync(self._call_in_session, operation, args, kwargs)
+    
+    @asynccontextmanager
+    async def _read_session(self) -> AsyncIterator[AsyncSession]:
+        """AsyncSession em uma réplica, ou no primário sem réplicas, dentro de
+        read_from_primary() e logo após uma escrita do mesmo contexto"""
+        if not self.replicas or self._reads_from_primary():
+            async with self.get_session() as session:
+                yield session
+            return
+        
+        with self.replicas.acquire() as replica:
+            async with self.SessionLocal(bind=replica) as session:
+                yield session
+    
+    def _reads_from_primary(self) -> bool:
+        if self._primary_reads.get():
+            return True
+        last_write = self._last_write.get()
+        return last_write is not None and time.monotonic() - last_write < self.config.read_your_writes_window
+    
+    @contextmanager
+    def read_from_primary(self) -> Iterator[None]:
+        """Direciona ao primário as leituras do bloco (ver KanbanRepository.read_from_primary)"""
+        token = self._primary_reads.set(True)
+        try:
+            yield
+        finally:
+            self._primary_reads.reset(token)
+    
+    def _call_in_session(self, session: Session, operation, args, kwargs):
+        with self._repository.use_session(session):
+            return operation(*args, **kwargs)
+    
+    # CRUD Operations para Board
+    async def create_board(self, name: str, description: str = None) -> BoardRecord:
+        return await self._run(self._repository.create_board, name=name, description=description)
+    
+    async def get_board(self, board_id: int, include_archived: bool = False) -> Optional[BoardRecord]:
+        return await self._run_read(self._repository.get_board, board_id=board_id, include_archived=include_archived)
+    
+    async def get_all_boards(self, include_archived: bool = False) -> List[BoardRecord]:
+        return await self._run_read(self._repository.get_all_boards, include_archived=include_archived)
+    
+    async def update_board(self, board_id: int, name: str = None, description: str = None) -> Optional[Board]:
+        return await self._run(self._repository.update_board, board_id=board_id, name=name,
+                               description=description)
+    
+    async def delete_board(self, board_id: int) -> bool:
+        return await self._run(self._repository.delete_board, board_id=board_id)
+    
+    # CRUD Operations para Kcolumn
+    async def create_column(self, board_id: int, title: str, position: int = None,
+                            is_done: bool = False) -> Optional[Kcolumn]:
+        return await self._run(self._repository.create_column, board_id=board_id, title=title, position=position,
+                               is_done=is_done)
+    
+    async def get_column(self, column_id: int) -> Optional[ColumnRecord]:
+        return await self._run_read(self._repository.get_column, column_id=column_id)
+    
+    async def update_column(self, column_id: int, title: str = None, position: int = None,
+                            is_done: bool = None) -> Optional[Kcolumn]:
+        return await self._run(self._repository.update_column, column_id=column_id, title=title, position=position,
+                               is_done=is_done)
+    
+    async def delete_column(self, column_id: int) -> bool:
+        return await self._run(self._repository.delete_column, column_id=column_id)
+    
+    # CRUD Operations para Card
+    async def create_card(self, kcolumn_id: int, title: str, description: str = None,
+                          assignee: str = None, due_date=None,
+                          priority: PriorityLevel = PriorityLevel.MEDIUM,
+                          before_card_id: int = None) -> Optional[Card]:
+        return await self._run(self._repository.create_card, kcolumn_id=kcolumn_id, title=title,
+                               description=description, assignee=assignee, due_date=due_date,
+                               priority=priority, before_card_id=before_card_id)
+    
+    async def get_card(self, card_id: int, include_archived: bool = False) -> Optional[CardRecord]:
+        return await self._run_read(self._repository.get_card, card_id=card_id, include_archived=include_archived)
+    
+    async def update_card(self, card_id: int, **kwargs) -> Optional[Card]:
+        return await self._run(self._repository.update_card, card_id, **kwargs)
+    
+    async def move_card(self, card_id: int, target_kcolumn_id: int, position: int = None,
+                        before_card_id: int = None, expected_version: int = None) -> Optional[Card]:
+        return await self._run(self._repository.move_card, card_id=card_id, target_kcolumn_id=target_kcolumn_id,
+                               position=position, before_card_id=before_card_id,
+                               expected_version=expected_version)
+    
+    async def delete_card(self, card_id: int, expected_version: int = None) -> bool:
+        return await self._run(self._repository.delete_card, card_id=card_id, expected_version=expected_version)
+    
+    async def rebalance_column(self, kcolumn_id: int) -> int:
+        return await self._run(self._repository.rebalance_column, kcolumn_id=kcolumn_id)
+    
+    # Operações em lote para Card: um commit por lote, como no repositório síncrono
+    async def bulk_create_cards(self, cards: Iterable[dict], batch_size: int = CARD_BATCH_SIZE) -> List[int]:
+        created_ids = []
+        for batch in batched(cards, batch_size):
+            created_ids.extend(await self._run(self._repository.bulk_create_cards, batch, batch_size))
+        return created_ids
+    
+    async def bulk_move_cards(self, moves: Iterable[Tuple[int, int]], batch_size: int = CARD_BATCH_SIZE) -> int:
+        moved = 0
+        for batch in batched(moves, batch_size):
+            moved += await self._run(self._repository.bulk_move_cards, batch, batch_size)
+        return moved
+    
+    async def iter_board_cards(self, board_id: int, batch_size: int = CARD_BATCH_SIZE) -> AsyncIterator[dict]:
+        """Percorre os cards de um quadro ativo em streaming (ver KanbanRepository.iter_board_cards)"""
+        statement = KanbanRepository._board_cards_statement(board_id).execution_options(yield_per=batch_size)
+        async with self._read_session() as session:
+            result = await session.stream(statement)
+            async for row in result:
+                yield KanbanRepository._export_row(row)
+    
+    # Listagens paginadas por cursor
+    async def list_boards(self, limit: int = PAGE_SIZE, cursor: str = None) -> Page:
+        return await self._run_read(self._repository.list_boards, limit=limit, cursor=cursor)
+    
+    async def list_cards(self, limit: int = PAGE_SIZE, cursor: str = None, **filters) -> Page:
+        """Mesmos filtros de KanbanRepository.list_cards"""
+        return await self._run_read(self._repository.list_cards, limit=limit, cursor=cursor, **filters)
+    
+    async def iter_cards(self, batch_size: int = PAGE_SIZE, **filters) -> AsyncIterator[CardRecord]:
+        cursor = None
+        while True:
+            page = await self.list_cards(limit=batch_size, cursor=cursor, **filters)
+            for card in page.items:
+                yield card
+            if page.next_cursor is None:
+                return
+            cursor = page.next_cursor
+    
+    async def search_cards(self, query: str, board_id: int = None,
+                           limit: int = PAGE_SIZE, cursor: str = None) -> Page:
+        return await self._run_read(self._repository.search_cards, query=query, board_id=board_id,
+                               limit=limit, cursor=cursor)
+    
+    # Consultas
+    async def get_board_ids_for_columns(self, kcolumn_ids: Iterable[int]) -> Set[int]:
+        with self.read_from_primary():
+            return await self._run_read(self._repository.get_board_ids_for_columns, kcolumn_ids)
+    
+    async def get_board_ids_for_cards(self, card_ids: Iterable[int]) -> Set[int]:
+        with self.read_from_primary():
+            return await self._run_read(self._repository.get_board_ids_for_cards, card_ids)
+    
+    async def get_board_with_data(self, board_id: int, include_archived: bool = False) -> Optional[dict]:
+        return await self._run_read(self._repository.get_board_with_data, board_id=board_id,
+                                    include_archived=include_archived)
+    
+    async def get_boards_with_data(self, board_ids: Iterable[int]) -> Dict[int, dict]:
+        return await self._run_read(self._repository.get_boards_with_data, board_ids=list(board_ids))
+    
+    async def get_board_summary(self, board_id: int) -> Optional[dict]:
+        return await self._run_read(self._repository.get_board_summary, board_id=board_id)
+    
+    async def verify_aggregates(self, board_id: int = None, repair: bool = False) -> List[int]:
+        return await self._run(self._repository.verify_aggregates, board_id=board_id, repair=repair)
+    
+    async def get_board_changes(self, board_id: int, since_revision: int = 0) -> Optional[dict]:
+        return await self._run_read(self._repository.get_board_changes, board_id=board_id,
+                                    since_revision=since_revision)
+    
+    async def prune_board_changes(self, older_than: timedelta = CHANGE_RETENTION) -> int:
+        return await self._run(self._repository.prune_board_changes, older_than=older_than)
+    
+    # Métricas de fluxo (ver analytics.py)
+    async def get_cycle_times(self, board_id: int, since: datetime = None, until: datetime = None,
+                              percentiles: Sequence[float] = CYCLE_TIME_PERCENTILES) -> Optional[dict]:
+        return await self._run_read(self._repository.get_cycle_times, board_id=board_id, since=since,
+                                    until=until, percentiles=percentiles)
+    
+    async def get_throughput(self, board_id: int, period: str = "week", since: datetime = None,
+                             until: datetime = None) -> Optional[List[dict]]:
+        return await self._run_read(self._repository.get_throughput, board_id=board_id, period=period,
+                                    since=since, until=until)
+    
+    async def get_wip(self, board_id: int, at: datetime = None) -> Optional[List[dict]]:
+        return await self._run_read(self._repository.get_wip, board_id=board_id, at=at)
+    
+    # Arquivamento: cada lote em uma sessão e transação, como no repositório síncrono
+    async def archive_boards(self, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+        archived = 0
+        while True:
+            count = await self._run(self._repository._archive_boards_batch, batch_size)
+            if not count:
+                return archived
+            archived += count
+    
+    async def archive_done_cards(self, older_than_days: int = DONE_CARD_RETENTION_DAYS,
+                                 batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+        cutoff = datetime.now() - timedelta(days=older_than_days)
+        archived = 0
+        while True:
+            count = await self._run(self._repository._archive_done_cards_batch, cutoff, batch_size)
+            if not count:
+                return archived
+            archived += count
+    
+    async def restore_board(self, board_id: int) -> Optional[BoardRecord]:
+        return await self._run(self._repository.restore_board, board_id=board_id)
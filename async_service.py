@@ -0,0 +1,179 @@
+# Serviço assíncrono do Sistema Kanban
+import asyncio
+import json
+import random
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, TypeVar
+from analytics import CYCLE_TIME_PERCENTILES
+from archive import ARCHIVE_BATCH_SIZE, DONE_CARD_RETENTION_DAYS
+from async_repository import AsyncKanbanRepository
+from changes import CHANGE_RETENTION
+from model import Board, Card, Kcolumn, PriorityLevel
+from records import BoardRecord, CardRecord, ColumnRecord
+from repository import CARD_BATCH_SIZE, PAGE_SIZE, ConcurrencyConflictError, Page
+from service import CONFLICT_ATTEMPTS, CONFLICT_BACKOFF, _json_default
+
+T = TypeVar("T")
+
+class AsyncKanbanService:
+    """Contraparte assíncrona do KanbanService, com a mesma interface de CRUD.
+    
+    Leituras independentes podem ser feitas em paralelo, por exemplo:
+    `await asyncio.gather(*(kanban.get_board_with_data(i) for i in ids))`.
+    """
+    
+    def __init__(self, repository: AsyncKanbanRepository):
+        self.repository = repository
+    
+    @asynccontextmanager
+    async def batch(self) -> AsyncIterator["AsyncKanbanService"]:
+        """Executa várias chamadas do serviço em uma única transação (ver KanbanService.batch)"""
+        async with self.repository.unit_of_work():
+            yield self
+    
+    def read_from_primary(self):
+        """Contexto (síncrono) em que as leituras vão ao primário (ver KanbanService.read_from_primary)"""
+        return self.repository.read_from_primary()
+    
+    async def retry_on_conflict(self, operation: Callable[[], Awaitable[T]], attempts: int = CONFLICT_ATTEMPTS,
+                                backoff: float = CONFLICT_BACKOFF) -> T:
+        """Aguarda `operation()` repetindo-a em caso de conflito de versão (ver
+        KanbanService.retry_on_conflict)"""
+        if self.repository.in_unit_of_work():
+            return await operation()
+        
+        for attempt in range(attempts):
+            try:
+                return await operation()
+            except ConcurrencyConflictError:
+                if attempt == attempts - 1:
+                    raise
+                await asyncio.sleep(random.uniform(0, backoff * 2 ** attempt))
+    
+    async def create_board(self, name: str, description: str = None) -> BoardRecord:
+        return await self.repository.create_board(name=name, description=description)
+    
+    async def get_board(self, board_id: int, include_archived: bool = False) -> Optional[BoardRecord]:
+        return await self.repository.get_board(board_id=board_id, include_archived=include_archived)
+    
+    async def get_all_boards(self, include_archived: bool = False) -> List[BoardRecord]:
+        return await self.repository.get_all_boards(include_archived=include_archived)
+    
+    async def update_board(self, board_id: int, name: str = None, description: str = None) -> Optional[Board]:
+        return await self.repository.update_board(board_id=board_id, name=name, description=description)
+    
+    async def delete_board(self, board_id: int) -> bool:
+        return await self.repository.delete_board(board_id=board_id)
+    
+    # CRUD Operations para Kcolumn
+    async def create_column(self, board_id: int, title: str, position: int = None,
+                            is_done: bool = False) -> Optional[Kcolumn]:
+        return await self.repository.create_column(board_id=board_id, title=title, position=position,
+                                                   is_done=is_done)
+    
+    async def get_column(self, column_id: int) -> Optional[ColumnRecord]:
+        return await self.repository.get_column(column_id=column_id)
+    
+    async def update_column(self, column_id: int, title: str = None, position: int = None,
+                            is_done: bool = None) -> Optional[Kcolumn]:
+        return await self.repository.update_column(column_id=column_id, title=title, position=position,
+                                                   is_done=is_done)
+    
+    async def delete_column(self, column_id: int) -> bool:
+        return await self.repository.delete_column(column_id=column_id)
+    
+    # CRUD Operations para Card
+    async def create_card(self, kcolumn_id: int, title: str, description: str = None,
+                          assignee: str = None, due_date: datetime = None,
+                          priority: PriorityLevel = PriorityLevel.MEDIUM,
+                          before_card_id: int = None) -> Optional[Card]:
+        return await self.repository.create_card(kcolumn_id=kcolumn_id, title=title, description=description,
+                                                 assignee=assignee, due_date=due_date,
+                                                 priority=priority, before_card_id=before_card_id)
+    
+    async def get_card(self, card_id: int, include_archived: bool = False) -> Optional[CardRecord]:
+        return await self.repository.get_card(card_id=card_id, include_archived=include_archived)
+    
+    async def update_card(self, card_id: int, **kwargs) -> Optional[Card]:
+        return await self.repository.update_card(card_id, **kwargs)
+    
+    async def move_card(self, card_id: int, target_kcolumn_id: int, position: int = None,
+                        before_card_id: int = None, expected_version: int = None) -> Optional[Card]:
+        return await self.repository.move_card(card_id=card_id, target_kcolumn_id=target_kcolumn_id,
+                                               position=position, before_card_id=before_card_id,
+                                               expected_version=expected_version)
+    
+    async def delete_card(self, card_id: int, expected_version: int = None) -> bool:
+        return await self.repository.delete_card(card_id=card_id, expected_version=expected_version)
+    
+    async def rebalance_column(self, kcolumn_id: int) -> int:
+        return await self.repository.rebalance_column(kcolumn_id=kcolumn_id)
+    
+    # Importação e exportação em lote
+    async def bulk_create_cards(self, cards: Iterable[dict], batch_size: int = CARD_BATCH_SIZE) -> List[int]:
+        return await self.repository.bulk_create_cards(cards=cards, batch_size=batch_size)
+    
+    async def bulk_move_cards(self, moves: Iterable[Tuple[int, int]], batch_size: int = CARD_BATCH_SIZE) -> int:
+        return await self.repository.bulk_move_cards(moves=moves, batch_size=batch_size)
+    
+    async def export_board_jsonl(self, board_id: int, batch_size: int = CARD_BATCH_SIZE) -> AsyncIterator[str]:
+        """Gera uma linha JSON por card do quadro, sem carregá-lo inteiro"""
+        async for card_data in self.repository.iter_board_cards(board_id=board_id, batch_size=batch_size):
+            yield json.dumps(card_data, default=_json_default, ensure_ascii=False) + "\n"
+    
+    # Listagens paginadas por cursor
+    async def list_boards(self, limit: int = PAGE_SIZE, cursor: str = None) -> Page:
+        return await self.repository.list_boards(limit=limit, cursor=cursor)
+    
+    async def list_cards(self, limit: int = PAGE_SIZE, cursor: str = None, **filters) -> Page:
+        return await self.repository.list_cards(limit=limit, cursor=cursor, **filters)
+    
+    def iter_cards(self, batch_size: int = PAGE_SIZE, **filters) -> AsyncIterator[CardRecord]:
+        return self.repository.iter_cards(batch_size=batch_size, **filters)
+    
+    async def search_cards(self, query: str, board_id: int = None,
+                           limit: int = PAGE_SIZE, cursor: str = None) -> Page:
+        return await self.repository.search_cards(query=query, board_id=board_id, limit=limit, cursor=cursor)
+    
+    async def get_board_with_data(self, board_id: int, include_archived: bool = False) -> Optional[dict]:
+        return await self.repository.get_board_with_data(board_id=board_id, include_archived=include_archived)
+    
+    async def get_boards_with_data(self, board_ids: Iterable[int]) -> Dict[int, dict]:
+        return await self.repository.get_boards_with_data(board_ids=board_ids)
+    
+    async def get_board_summary(self, board_id: int) -> Optional[dict]:
+        return await self.repository.get_board_summary(board_id=board_id)
+    
+    async def verify_aggregates(self, board_id: int = None, repair: bool = False) -> List[int]:
+        return await self.repository.verify_aggregates(board_id=board_id, repair=repair)
+    
+    async def get_board_changes(self, board_id: int, since_revision: int = 0) -> Optional[dict]:
+        return await self.repository.get_board_changes(board_id=board_id, since_revision=since_revision)
+    
+    async def prune_board_changes(self, older_than: timedelta = CHANGE_RETENTION) -> int:
+        return await self.repository.prune_board_changes(older_than=older_than)
+    
+    # Métricas de fluxo
+    async def get_cycle_times(self, board_id: int, since: datetime = None, until: datetime = None,
+                              percentiles: Sequence[float] = CYCLE_TIME_PERCENTILES) -> Optional[dict]:
+        return await self.repository.get_cycle_times(board_id=board_id, since=since, until=until,
+                                                     percentiles=percentiles)
+    
+    async def get_throughput(self, board_id: int, period: str = "week", since: datetime = None,
+                             until: datetime = None) -> Optional[List[dict]]:
+        return await self.repository.get_throughput(board_id=board_id, period=period, since=since, until=until)
+    
+    async def get_wip(self, board_id: int, at: datetime = None) -> Optional[List[dict]]:
+        return await self.repository.get_wip(board_id=board_id, at=at)
+    
+    # Arquivamento
+    async def archive_boards(self, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+        return await self.repository.archive_boards(batch_size=batch_size)
+    
+    async def archive_done_cards(self, older_than_days: int = DONE_CARD_RETENTION_DAYS,
+                                 batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+        return await self.repository.archive_done_cards(older_than_days=older_than_days, batch_size=batch_size)
+    
+    async def restore_board(self, board_id: int) -> Optional[BoardRecord]:
+        return await self.repository.restore_board(board_id=board_id)
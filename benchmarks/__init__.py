@@ -0,0 +1 @@
+# Benchmarks do Sistema Kanban (execute a partir da raiz do projeto)
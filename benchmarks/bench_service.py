@@ -0,0 +1,421 @@
+"""Benchmark reprodutível dos caminhos críticos do KanbanService.
+
+Gera quadros sintéticos (quadros x colunas x cards) em um arquivo SQLite
+temporário e mede, para cada método público do serviço, percentis de
+latência, vazão e número de consultas por chamada. Em seguida executa uma
+carga mista concorrente com várias threads. O resultado é gravado em JSON
+para comparação entre execuções.
+
+Ficam de fora apenas `batch`, `read_from_primary` e `retry_on_conflict`, que
+envolvem outras operações em vez de acessar o banco, e `cache_stats`, que só
+lê contadores em memória (ver EXCLUDED_METHODS); um método público novo sem
+operação correspondente é apontado no início da execução.
+
+Uso (a partir da raiz do projeto):
+
+    python -m benchmarks.bench_service --boards 20 --columns 5 --cards 40 --output antes.json
+    python -m benchmarks.bench_service --boards 20 --columns 5 --cards 40 --output depois.json
+    python -m benchmarks.bench_service --compare antes.json depois.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Callable, Dict, List, Set
+
+import sqlalchemy
+from sqlalchemy import event
+
+from db import DatabaseConfig
+from model import PriorityLevel
+from repository import KanbanRepository
+from service import KanbanService
+
+# Métodos públicos do KanbanService que não são medidos isoladamente
+EXCLUDED_METHODS = {"batch", "read_from_primary", "retry_on_conflict", "cache_stats"}
+
+WORDS = "login deploy banco cache fila api erro tela relatório pagamento busca email".split()
+ASSIGNEES = ["Ana", "Bruno", "Carla", "Diego", "Elisa", None]
+
+
+class QueryCounter:
+    """Conta os comandos SQL enviados pelo engine na thread atual"""
+    
+    def __init__(self, engine):
+        self._local = threading.local()
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+    
+    def _on_execute(self, *args):
+        self._local.count = getattr(self._local, "count", 0) + 1
+    
+    def read(self) -> int:
+        return getattr(self._local, "count", 0)
+
+
+class Workload:
+    """Dados sintéticos e as operações medidas sobre eles"""
+    
+    def __init__(self, kanban: KanbanService, seed: int):
+        self.kanban = kanban
+        self.random = random.Random(seed)
+        self.board_ids: List[int] = []
+        self.column_ids: Dict[int, List[int]] = {}
+        self.card_ids: List[int] = []
+        # Revisão de cada quadro ao fim da geração (base de get_board_changes)
+        self.revisions: Dict[int, int] = {}
+        self._lock = threading.Lock()
+    
+    def populate(self, boards: int, columns: int, cards: int):
+        for board_index in range(boards):
+            board = self.kanban.create_board(f"Quadro {board_index}", "Gerado pelo benchmark")
+            ids = [column.id for column in board.kcolumns]
+            for column_index in range(len(ids), columns):
+                ids.append(self.kanban.create_column(board.id, f"Coluna {column_index}").id)
+            self.board_ids.append(board.id)
+            self.column_ids[board.id] = ids[:columns]
+        
+        now = datetime.now()
+        rows = (
+            {
+                "kcolumn_id": self.random.choice(self.column_ids[board_id]),
+                "title": " ".join(self.random.choices(WORDS, k=3)),
+                "description": " ".join(self.random.choices(WORDS, k=12)),
+                "assignee": self.random.choice(ASSIGNEES),
+                "due_date": now + timedelta(days=self.random.randint(-30, 30)),
+                "priority": self.random.choice(list(PriorityLevel))
+            }
+            for board_id in self.board_ids
+            for _ in range(columns * cards)
+        )
+        self.card_ids = self.kanban.bulk_create_cards(rows, batch_size=5000)
+        self.revisions = {board.id: board.revision for board in self.kanban.get_all_boards()}
+    
+    # Escolhas aleatórias protegidas para uso concorrente
+    def _choice(self, items):
+        with self._lock:
+            return self.random.choice(items)
+    
+    def _board(self) -> int:
+        return self._choice(self.board_ids)
+    
+    def _column(self) -> int:
+        return self._choice(self.column_ids[self._board()])
+    
+    def _card(self) -> int:
+        return self._choice(self.card_ids)
+    
+    def _new_card(self) -> int:
+        card = self.kanban.create_card(self._column(), "Card temporário")
+        return card.id
+    
+    def _new_inactive_board(self) -> int:
+        board = self.kanban.create_board("Quadro temporário")
+        self.kanban.create_card(board.kcolumns[0].id, "Card temporário")
+        self.kanban.delete_board(board.id)
+        return board.id
+    
+    def operations(self) -> Dict[str, Callable[[], object]]:
+        k = self.kanban
+        return {
+            "get_board": lambda: k.get_board(self._board()),
+            "get_all_boards": lambda: k.get_all_boards(),
+            "get_board_with_data": lambda: k.get_board_with_data(self._board()),
+            "get_boards_with_data": lambda: k.get_boards_with_data(
+                [self._board() for _ in range(10)]
+            ),
+            "get_board_summary": lambda: k.get_board_summary(self._board()),
+            "list_boards": lambda: k.list_boards(limit=20),
+            "list_cards": lambda: k.list_cards(assignee=self._choice(ASSIGNEES[:-1]), limit=50),
+            "search_cards": lambda: k.search_cards(self._choice(WORDS), limit=20),
+            "create_board": lambda: k.create_board("Quadro temporário"),
+            "update_board": lambda: k.update_board(self._board(), description="Atualizado"),
+            "create_column": lambda: k.create_column(self._board(), "Coluna temporária"),
+            "update_column": lambda: k.update_column(self._column(), title="Renomeada"),
+            "create_card": lambda: k.create_card(self._column(), "Card novo"),
+            "update_card": lambda: k.update_card(self._card(), assignee="Fábio"),
+            "move_card": lambda: k.move_card(self._card(), self._column()),
+            "move_card_middle": lambda: self._move_to_middle(),
+            # Inclui a criação do card removido, para não esgotar os dados
+            "create_and_delete_card": lambda: k.delete_card(self._new_card()),
+            "rebalance_column": lambda: k.rebalance_column(self._column()),
+            "get_column": lambda: k.get_column(self._column()),
+            "get_card": lambda: k.get_card(self._card()),
+            "create_and_delete_board": lambda: k.delete_board(k.create_board("Quadro temporário").id),
+            "create_and_delete_column": lambda: k.delete_column(
+                k.create_column(self._board(), "Coluna temporária").id
+            ),
+            "bulk_create_cards": lambda: k.bulk_create_cards(
+                {"kcolumn_id": self._column(), "title": "Card importado"} for _ in range(50)
+            ),
+            "bulk_move_cards": lambda: k.bulk_move_cards(
+                (self._card(), self._column()) for _ in range(50)
+            ),
+            "export_board_jsonl": lambda: sum(1 for _ in k.export_board_jsonl(self._board())),
+            "export_board_csv": lambda: sum(1 for _ in k.export_board_csv(self._board())),
+            "iter_cards": lambda: sum(1 for _ in islice(
+                k.iter_cards(assignee=self._choice(ASSIGNEES[:-1]), batch_size=100), 500
+            )),
+            "verify_aggregates": lambda: k.verify_aggregates(self._board()),
+            "get_board_changes": lambda: self._board_changes(),
+            "prune_board_changes": lambda: k.prune_board_changes(),
+            "get_cycle_times": lambda: k.get_cycle_times(self._board()),
+            "get_throughput": lambda: k.get_throughput(self._board(), period="day"),
+            "get_wip": lambda: k.get_wip(self._board(), at=datetime.now()),
+            "archive_done_cards": lambda: k.archive_done_cards(),
+            # Inclui a criação e a exclusão do quadro arquivado e restaurado
+            "archive_and_restore_board": lambda: self._archive_and_restore(),
+        }
+    
+    # Métodos medidos por operações compostas
+    COMPOSITE = {
+        "move_card_middle": {"move_card", "list_cards"},
+        "create_and_delete_card": {"create_card", "delete_card"},
+        "create_and_delete_board": {"create_board", "delete_board"},
+        "create_and_delete_column": {"create_column", "delete_column"},
+        "archive_and_restore_board": {"archive_boards", "restore_board"},
+    }
+    
+    def _board_changes(self):
+        board_id = self._board()
+        return self.kanban.get_board_changes(board_id, since_revision=self.revisions[board_id])
+    
+    def _archive_and_restore(self):
+        board_id = self._new_inactive_board()
+        self.kanban.archive_boards()
+        self.kanban.restore_board(board_id)
+        self.kanban.delete_board(board_id)
+    
+    @classmethod
+    def uncovered_methods(cls, operations) -> Set[str]:
+        """Métodos públicos do serviço sem operação que os meça"""
+        public = {
+            name for name in dir(KanbanService)
+            if not name.startswith("_") and callable(getattr(KanbanService, name))
+        }
+        covered = set(operations)
+        for name in operations:
+            covered |= cls.COMPOSITE.get(name, set())
+        return public - covered - EXCLUDED_METHODS
+    
+    def _move_to_middle(self):
+        page = self.kanban.list_cards(kcolumn_id=self._column(), limit=2)
+        if page.items:
+            target = page.items[-1]
+            self.kanban.move_card(self._card(), target.kcolumn_id, before_card_id=target.id)
+    
+    # Operações e pesos da carga mista concorrente (leitura predominante)
+    MIXED_WEIGHTS = {
+        "get_board_with_data": 40,
+        "get_board": 15,
+        "list_cards": 10,
+        "search_cards": 5,
+        "move_card": 15,
+        "update_card": 10,
+        "create_card": 5,
+    }
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies: List[float], queries: List[int], elapsed: float, errors: int = 0) -> dict:
+    latencies = sorted(latencies)
+    return {
+        "calls": len(latencies),
+        "errors": errors,
+        "throughput_ops": len(latencies) / elapsed if elapsed else 0.0,
+        "mean_ms": statistics.fmean(latencies) * 1000 if latencies else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p90_ms": percentile(latencies, 0.90) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "max_ms": latencies[-1] * 1000 if latencies else 0.0,
+        "queries_per_call": statistics.fmean(queries) if queries else 0.0,
+    }
+
+
+def measure(operation: Callable[[], object], counter: QueryCounter, iterations: int, warmup: int) -> dict:
+    for _ in range(warmup):
+        operation()
+    
+    latencies, queries = [], []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        before = counter.read()
+        start = time.perf_counter()
+        operation()
+        latencies.append(time.perf_counter() - start)
+        queries.append(counter.read() - before)
+    return summarize(latencies, queries, time.perf_counter() - started)
+
+
+def run_concurrent(workload: Workload, counter: QueryCounter, threads: int, iterations: int, seed: int) -> dict:
+    operations = workload.operations()
+    names = list(Workload.MIXED_WEIGHTS)
+    weights = [Workload.MIXED_WEIGHTS[name] for name in names]
+    per_operation = {name: {"latencies": [], "queries": [], "errors": 0} for name in names}
+    lock = threading.Lock()
+    
+    def worker(worker_index: int):
+        rng = random.Random(seed + worker_index)
+        local = {name: {"latencies": [], "queries": [], "errors": 0} for name in names}
+        for _ in range(iterations):
+            name = rng.choices(names, weights)[0]
+            before = counter.read()
+            start = time.perf_counter()
+            try:
+                operations[name]()
+            except Exception:
+                local[name]["errors"] += 1
+                continue
+            local[name]["latencies"].append(time.perf_counter() - start)
+            local[name]["queries"].append(counter.read() - before)
+        with lock:
+            for name, data in local.items():
+                per_operation[name]["latencies"].extend(data["latencies"])
+                per_operation[name]["queries"].extend(data["queries"])
+                per_operation[name]["errors"] += data["errors"]
+    
+    pool = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+    started = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    
+    all_latencies = [value for data in per_operation.values() for value in data["latencies"]]
+    all_queries = [value for data in per_operation.values() for value in data["queries"]]
+    return {
+        "threads": threads,
+        "total": summarize(all_latencies, all_queries, elapsed,
+                           sum(data["errors"] for data in per_operation.values())),
+        "operations": {
+            name: summarize(data["latencies"], data["queries"], elapsed, data["errors"])
+            for name, data in per_operation.items()
+        },
+    }
+
+
+def run(args) -> dict:
+    workdir = tempfile.mkdtemp(prefix="kanban_bench_")
+    try:
+        config = DatabaseConfig("sqlite", db_path=os.path.join(workdir, "bench.db"),
+                                performance_profile=args.profile)
+        repository = KanbanRepository(config)
+        kanban = KanbanService(repository)
+        counter = QueryCounter(repository.engine)
+        
+        workload = Workload(kanban, args.seed)
+        started = time.perf_counter()
+        workload.populate(args.boards, args.columns, args.cards)
+        populate_seconds = time.perf_counter() - started
+        
+        operations = workload.operations()
+        uncovered = Workload.uncovered_methods(operations)
+        if uncovered:
+            print(f"Métodos públicos sem operação no benchmark: {', '.join(sorted(uncovered))}")
+        
+        selected = args.only.split(",") if args.only else None
+        results = {}
+        for name, operation in operations.items():
+            if selected and name not in selected:
+                continue
+            results[name] = measure(operation, counter, args.iterations, args.warmup)
+            print(f"{name:24} p50={results[name]['p50_ms']:8.3f}ms "
+                  f"p99={results[name]['p99_ms']:8.3f}ms "
+                  f"queries={results[name]['queries_per_call']:6.2f}")
+        
+        concurrent = None
+        if args.threads > 0:
+            concurrent = run_concurrent(workload, counter, args.threads, args.iterations, args.seed)
+            total = concurrent["total"]
+            print(f"{'concurrent mix':24} {total['throughput_ops']:.1f} ops/s "
+                  f"p99={total['p99_ms']:.3f}ms errors={total['errors']}")
+        
+        repository.engine.dispose()
+        return {
+            "meta": {
+                "timestamp": datetime.now().isoformat(),
+                "python": platform.python_version(),
+                "sqlalchemy": sqlalchemy.__version__,
+                "platform": platform.platform(),
+                "boards": args.boards,
+                "columns": args.columns,
+                "cards_per_column": args.cards,
+                "iterations": args.iterations,
+                "seed": args.seed,
+                "profile": args.profile,
+                "populate_seconds": populate_seconds,
+            },
+            "results": results,
+            "concurrent": concurrent,
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def compare(baseline_path: str, candidate_path: str):
+    """Imprime a variação de p50, p99 e consultas por operação entre dois resultados"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    with open(candidate_path) as f:
+        candidate = json.load(f)
+    
+    def change(old, new):
+        return f"{(new - old) / old * 100:+7.1f}%" if old else "    n/a"
+    
+    print(f"{'operação':24} {'p50 antes':>10} {'p50 depois':>10} {'Δp50':>8} {'Δp99':>8} {'consultas':>12}")
+    for name, old in baseline["results"].items():
+        new = candidate["results"].get(name)
+        if new is None:
+            continue
+        print(f"{name:24} {old['p50_ms']:10.3f} {new['p50_ms']:10.3f} "
+              f"{change(old['p50_ms'], new['p50_ms'])} {change(old['p99_ms'], new['p99_ms'])} "
+              f"{old['queries_per_call']:5.1f}→{new['queries_per_call']:<5.1f}")
+    
+    if baseline.get("concurrent") and candidate.get("concurrent"):
+        old = baseline["concurrent"]["total"]["throughput_ops"]
+        new = candidate["concurrent"]["total"]["throughput_ops"]
+        print(f"{'concurrent mix (ops/s)':24} {old:10.1f} {new:10.1f} {change(old, new)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--boards", type=int, default=10)
+    parser.add_argument("--columns", type=int, default=4)
+    parser.add_argument("--cards", type=int, default=50, help="cards por coluna")
+    parser.add_argument("--iterations", type=int, default=200, help="chamadas medidas por operação")
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--threads", type=int, default=4, help="threads da carga mista (0 desativa)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--profile", default="performance", help="perfil de desempenho do DatabaseConfig")
+    parser.add_argument("--only", help="lista de operações separadas por vírgula")
+    parser.add_argument("--output", help="arquivo JSON de saída")
+    parser.add_argument("--compare", nargs=2, metavar=("ANTES", "DEPOIS"))
+    args = parser.parse_args(argv)
+    
+    if args.compare:
+        compare(*args.compare)
+        return
+    
+    result = run(args)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"Resultados gravados em {args.output}")
+
+
+if __name__ == "__main__":
+    main()
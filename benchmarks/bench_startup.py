@@ -0,0 +1,187 @@
+"""Benchmark do tempo de inicialização a frio, de `import service` à primeira leitura.
+
+Cada medição roda em um processo Python novo, como um worker ou um comando de
+linha de comando de curta duração: importa o serviço, constrói o repositório
+sobre um banco SQLite já existente (esquema na versão atual) e chama
+`get_board`. Os cenários comparados são:
+
+- full_ddl: create_all e migrações a cada início (comportamento anterior à
+  verificação da versão do esquema)
+- eager: padrão; o construtor confere a versão registrada e pula o DDL
+- lazy: `lazy_schema=True`; nenhuma conexão até a primeira consulta
+
+Além dos tempos, cada cenário registra quantos comandos SQL foram enviados
+até a primeira leitura: no SQLite a verificação do esquema é barata, mas no
+PostgreSQL cada comando é uma ida e volta pela rede.
+
+Uso (a partir da raiz do projeto):
+
+    python -m benchmarks.bench_startup --runs 20 --output startup.json
+    python -m benchmarks.bench_startup --compare antes.json depois.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List
+
+from db import DatabaseConfig
+from repository import KanbanRepository
+
+# Os processos medidos importam os módulos a partir da raiz do projeto
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = ("full_ddl", "eager", "lazy")
+
+PHASES = ("import_ms", "construct_ms", "first_read_ms", "total_ms", "process_ms")
+
+# Executado em cada processo medido: argv = caminho do banco, cenário, perfil
+CHILD = """
+import json, sys, time
+started = time.perf_counter()
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from db import Base, DatabaseConfig
+from migrations import apply_migrations
+from repository import KanbanRepository
+from service import KanbanService
+imported = time.perf_counter()
+
+queries = []
+event.listen(Engine, "before_cursor_execute", lambda *args: queries.append(1))
+
+db_path, scenario, profile = sys.argv[1:4]
+config = DatabaseConfig("sqlite", db_path=db_path, performance_profile=profile)
+if scenario == "full_ddl":
+    repository = KanbanRepository(config, create_schema=False)
+    with repository.engine.begin() as connection:
+        Base.metadata.create_all(bind=connection)
+        apply_migrations(connection)
+else:
+    repository = KanbanRepository(config, lazy_schema=scenario == "lazy")
+kanban = KanbanService(repository)
+constructed = time.perf_counter()
+
+assert kanban.get_board(1) is not None
+finished = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "construct_ms": (constructed - imported) * 1000,
+    "first_read_ms": (finished - constructed) * 1000,
+    "total_ms": (finished - started) * 1000,
+    "queries": len(queries),
+}))
+"""
+
+
+def prepare_database(path: str, profile: str):
+    """Cria o banco com o esquema atual e um quadro"""
+    repository = KanbanRepository(DatabaseConfig("sqlite", db_path=path, performance_profile=profile))
+    repository.create_board("Quadro do benchmark")
+    repository.engine.dispose()
+
+
+def measure(db_path: str, scenario: str, profile: str) -> Dict[str, float]:
+    started = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD, db_path, scenario, profile],
+        check=True, capture_output=True, text=True, cwd=PROJECT_ROOT
+    ).stdout
+    timings = json.loads(output.strip().splitlines()[-1])
+    timings["process_ms"] = (time.perf_counter() - started) * 1000
+    return timings
+
+
+def summarize(samples: List[Dict[str, float]]) -> Dict[str, dict]:
+    return {
+        phase: {
+            "median_ms": statistics.median(sample[phase] for sample in samples),
+            "min_ms": min(sample[phase] for sample in samples),
+            "max_ms": max(sample[phase] for sample in samples),
+        }
+        for phase in PHASES
+    } | {"queries": statistics.median(sample["queries"] for sample in samples)}
+
+
+def run(args) -> dict:
+    workdir = tempfile.mkdtemp(prefix="kanban_startup_")
+    try:
+        db_path = os.path.join(workdir, "startup.db")
+        prepare_database(db_path, args.profile)
+        scenarios = args.only.split(",") if args.only else SCENARIOS
+        
+        results = {}
+        for scenario in scenarios:
+            for _ in range(args.warmup):
+                measure(db_path, scenario, args.profile)
+            samples = [measure(db_path, scenario, args.profile) for _ in range(args.runs)]
+            results[scenario] = summarize(samples)
+            print(f"{scenario:10} " + " ".join(
+                f"{phase}={results[scenario][phase]['median_ms']:8.2f}" for phase in PHASES
+            ) + f" queries={results[scenario]['queries']:g}")
+        
+        return {
+            "meta": {
+                "timestamp": datetime.now().isoformat(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "runs": args.runs,
+                "profile": args.profile,
+            },
+            "results": results,
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def compare(baseline_path: str, candidate_path: str):
+    """Imprime a variação das medianas de cada fase entre dois resultados"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    with open(candidate_path) as f:
+        candidate = json.load(f)
+    
+    def change(old, new):
+        return f"{(new - old) / old * 100:+7.1f}%" if old else "    n/a"
+    
+    print(f"{'cenário':10} {'fase':14} {'antes':>10} {'depois':>10} {'Δ':>8}")
+    for scenario, old in baseline["results"].items():
+        new = candidate["results"].get(scenario)
+        if new is None:
+            continue
+        for phase in PHASES:
+            before, after = old[phase]["median_ms"], new[phase]["median_ms"]
+            print(f"{scenario:10} {phase:14} {before:10.2f} {after:10.2f} {change(before, after)}")
+        print(f"{scenario:10} {'queries':14} {old['queries']:10g} {new['queries']:10g}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10, help="processos medidos por cenário")
+    parser.add_argument("--warmup", type=int, default=1, help="processos descartados por cenário")
+    parser.add_argument("--profile", default="performance", help="perfil de desempenho do DatabaseConfig")
+    parser.add_argument("--only", help="lista de cenários separados por vírgula")
+    parser.add_argument("--output", help="arquivo JSON de saída")
+    parser.add_argument("--compare", nargs=2, metavar=("ANTES", "DEPOIS"))
+    args = parser.parse_args(argv)
+    
+    if args.compare:
+        compare(*args.compare)
+        return
+    
+    result = run(args)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"Resultados gravados em {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# Cache de leitura para o KanbanService
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class Cache(ABC):
+    """Interface mínima esperada pelo KanbanService.
+    
+    Qualquer objeto com estes métodos pode ser usado (ex.: um adaptador para
+    Redis); subclasses que não implementam todos eles falham já na construção.
+    `get` retorna None quando a chave não está no cache; por isso valores None
+    nunca são armazenados.
+    """
+    
+    @abstractmethod
+    def get(self, key: Hashable) -> Optional[Any]:
+        ...
+    
+    @abstractmethod
+    def set(self, key: Hashable, value: Any) -> None:
+        ...
+    
+    @abstractmethod
+    def delete(self, key: Hashable) -> None:
+        ...
+    
+    @abstractmethod
+    def clear(self) -> None:
+        ...
+    
+    def stats(self) -> Dict[str, int]:
+        return {}
+
+
+class TTLCache(Cache):
+    """Cache em memória com expiração por tempo (TTL) e remoção LRU.
+    
+    Seguro para uso por várias threads. Os contadores de `stats()` ajudam a
+    dimensionar `max_entries` e `ttl`.
+    """
+    
+    def __init__(self, max_entries: int = 1024, ttl: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        if max_entries <= 0:
+            raise ValueError("max_entries deve ser positivo")
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+    
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            
+            expires_at, value = entry
+            if expires_at <= self._clock():
+                del self._entries[key]
+                self._expirations += 1
+                self._misses += 1
+                return None
+            
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+    
+    def set(self, key: Hashable, value: Any) -> None:
+        if value is None:
+            return
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+    
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self._invalidations += 1
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "invalidations": self._invalidations,
+                "size": len(self._entries)
+            }
@@ -0,0 +1,195 @@
+# Registro de alterações por quadro (change feed)
+#
+# Cada mutação do repositório incrementa a revisão dos quadros afetados e grava
+# um registro compacto por entidade alterada (entidade, ID, operação e valores
+# novos dos campos) em `board_changes`. O incremento é um UPDATE na linha do
+# quadro, que fica bloqueada até o commit: as revisões de um quadro são
+# confirmadas na ordem em que foram atribuídas, e um cliente que já leu até a
+# revisão N não perde alterações posteriores. `get_board_changes` devolve apenas
+# o delta desde uma revisão, com um registro por entidade; alterações antigas
+# são removidas por `prune_changes` e clientes que ficaram para trás da poda
+# recebem `reset` e devem recarregar o quadro completo.
+import enum
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from sqlalchemy import bindparam, case, func, insert, select, update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.util import identity_key
+
+from model import Board, BoardChange
+
+ENTITY_BOARD = "board"
+ENTITY_KCOLUMN = "kcolumn"
+ENTITY_CARD = "card"
+
+OP_CREATE = "create"
+OP_UPDATE = "update"
+OP_DELETE = "delete"
+
+# Campos registrados na criação de cada entidade
+BOARD_CHANGE_FIELDS = ("uuid", "name", "description")
+KCOLUMN_CHANGE_FIELDS = ("uuid", "title", "position", "is_done")
+CARD_CHANGE_FIELDS = (
+    "uuid", "title", "description", "assignee", "due_date", "priority", "position", "kcolumn_id",
+    "version"
+)
+
+# Idade a partir da qual prune_changes remove alterações, por padrão
+CHANGE_RETENTION = timedelta(days=7)
+
+boards = Board.__table__
+board_changes = BoardChange.__table__
+
+
+class Change(NamedTuple):
+    board_id: int
+    entity: str
+    entity_id: int
+    op: str
+    fields: Optional[dict] = None
+
+
+def _jsonable(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, enum.Enum):
+        return value.value
+    return value
+
+
+def change_fields(source, names: Iterable[str]) -> dict:
+    """Valores dos campos `names` de um modelo ou registro, prontos para JSON"""
+    return {name: _jsonable(getattr(source, name)) for name in names}
+
+
+def record_changes(session: Session, changes: Iterable[Change],
+                   revisions: Dict[int, int] = None) -> Dict[int, int]:
+    """Atribui uma nova revisão a cada quadro das alterações e as grava.
+    
+    `revisions` informa quadros cuja revisão já foi definida pela operação
+    (ex.: quadro recém-criado). Retorna a revisão de cada quadro alterado.
+    """
+    changes = list(changes)
+    if not changes:
+        return {}
+    
+    revisions = dict(revisions or {})
+    for board_id in dict.fromkeys(change.board_id for change in changes):
+        if board_id not in revisions:
+            revisions[board_id] = session.execute(
+                update(boards).where(boards.c.id == board_id).values(
+                    revision=boards.c.revision + 1
+                ).returning(boards.c.revision)
+            ).scalar_one()
+        # O quadro carregado na sessão recebe a revisão nova sem expirar: ele
+        # continua legível depois que a sessão é fechada
+        board = session.identity_map.get(identity_key(Board, board_id))
+        if board is not None:
+            set_committed_value(board, "revision", revisions[board_id])
+    
+    now = datetime.now()
+    session.execute(insert(board_changes), [
+        {
+            "board_id": change.board_id,
+            "revision": revisions[change.board_id],
+            "entity": change.entity,
+            "entity_id": change.entity_id,
+            "op": change.op,
+            "fields": change.fields,
+            "created_at": now
+        }
+        for change in changes
+    ])
+    return revisions
+
+
+def compact(rows: Iterable[tuple]) -> List[dict]:
+    """Reduz as alterações (revision, entity, entity_id, op, fields), em ordem de
+    revisão, a um registro por entidade com o estado final.
+    
+    Criação seguida de alterações vira uma criação com os campos finais (o
+    cliente deve aplicá-la como inclusão ou substituição); alterações
+    sucessivas têm os campos unidos; exclusão prevalece, e uma entidade criada
+    e excluída dentro do intervalo desaparece. O resultado fica na ordem da
+    última alteração de cada entidade.
+    """
+    merged = {}
+    # Entidades cujo primeiro registro no intervalo é a criação
+    created = set()
+    for revision, entity, entity_id, op, fields in rows:
+        key = (entity, entity_id)
+        current = merged.pop(key, None)
+        if current is None and op == OP_CREATE:
+            created.add(key)
+        
+        if op == OP_DELETE and key in created:
+            created.discard(key)
+            continue
+        if op == OP_UPDATE and current is not None and current["op"] != OP_DELETE:
+            current["revision"] = revision
+            current["fields"].update(fields or {})
+        else:
+            current = {
+                "revision": revision,
+                "entity": entity,
+                "id": entity_id,
+                "op": op,
+                "fields": None if op == OP_DELETE else dict(fields or {})
+            }
+        merged[key] = current
+    return list(merged.values())
+
+
+def get_changes(session: Session, board_id: int, since_revision: int) -> Optional[dict]:
+    """Delta de um quadro desde `since_revision` (ver KanbanRepository.get_board_changes)"""
+    board = session.execute(
+        select(Board.revision, Board.pruned_revision).where(Board.id == board_id)
+    ).first()
+    if board is None:
+        return None
+    
+    revision, pruned_revision = board
+    if since_revision < pruned_revision:
+        return {"board_id": board_id, "revision": revision, "reset": True, "changes": []}
+    
+    rows = session.execute(
+        select(
+            BoardChange.revision, BoardChange.entity, BoardChange.entity_id,
+            BoardChange.op, BoardChange.fields
+        ).where(
+            BoardChange.board_id == board_id,
+            BoardChange.revision > since_revision
+        ).order_by(BoardChange.revision, BoardChange.id)
+    )
+    return {"board_id": board_id, "revision": revision, "reset": False, "changes": compact(rows)}
+
+
+def prune_changes(session: Session, before: datetime) -> int:
+    """Remove as alterações gravadas antes de `before` e registra, em cada
+    quadro, a maior revisão removida. Retorna o número de registros removidos."""
+    pruned = session.execute(
+        select(BoardChange.board_id, func.max(BoardChange.revision)).where(
+            BoardChange.created_at < before
+        ).group_by(BoardChange.board_id)
+    ).all()
+    if not pruned:
+        return 0
+    
+    session.execute(
+        update(boards).where(boards.c.id == bindparam("target_id")).values(
+            pruned_revision=case(
+                (boards.c.pruned_revision < bindparam("pruned_through"), bindparam("pruned_through")),
+                else_=boards.c.pruned_revision
+            )
+        ),
+        [{"target_id": board_id, "pruned_through": revision} for board_id, revision in pruned]
+    )
+    for board_id, _ in pruned:
+        board = session.identity_map.get(identity_key(Board, board_id))
+        if board is not None:
+            session.expire(board, ["pruned_revision"])
+    
+    result = session.execute(board_changes.delete().where(board_changes.c.created_at < before))
+    return result.rowcount
@@ -1,16 +1,61 @@
+import itertools
+import sqlite3
+import threading
+from contextlib import closing, contextmanager
+from typing import Dict, Iterator, List
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.declarative import declarative_base
 
 # Configuração de Base
 Base = declarative_base()
 
+# Presets de desempenho por banco. Opções passadas explicitamente ao
+# DatabaseConfig têm precedência sobre o preset escolhido.
+PERFORMANCE_PRESETS = {
+    "sqlite": {
+        "default": {},
+        "performance": {
+            # WAL permite leituras concorrentes com uma escrita; NORMAL só faz
+            # fsync nos checkpoints, seguro com WAL
+            "sqlite_pragmas": {
+                "journal_mode": "WAL",
+                "synchronous": "NORMAL",
+                "mmap_size": 268435456,
+                "cache_size": -64000,
+                "temp_store": "MEMORY",
+                "busy_timeout": 5000
+            }
+        }
+    },
+    "postgresql": {
+        "default": {},
+        "performance": {
+            "pool_size": 20,
+            "max_overflow": 30,
+            "pool_recycle": 1800,
+            "pool_timeout": 10,
+            "connect_timeout": 5
+        }
+    }
+}
+
+POOL_OPTIONS = ("pool_size", "max_overflow", "pool_recycle", "pool_timeout")
+
+# Políticas de escolha da réplica de leitura
+ROUND_ROBIN = "round_robin"
+LEAST_LOADED = "least_loaded"
+REPLICA_SELECTIONS = (ROUND_ROBIN, LEAST_LOADED)
+
 # Classe de Configuração do Banco
 class DatabaseConfig:
     def __init__(self, database_url: str, database_type="sqlite", **kwargs):
         self.database_type = database_type.lower()
         
         if self.database_type == "sqlite":
-            db_path = kwargs.get("db_path", "kanban.db")
-            self.connection_string = f"sqlite:///{db_path}"          
+            db_path = self.db_path = kwargs.get("db_path", "kanban.db")
+            self.connection_string = f"sqlite:///{db_path}"
+            self.async_connection_string = f"sqlite+aiosqlite:///{db_path}"
         elif self.database_type == "postgresql":
             host = kwargs.get("host", "localhost")
             port = kwargs.get("port", 5432)
@@ -18,5 +63,180 @@ class DatabaseConfig:
             username = kwargs.get("username", "postgres")
             password = kwargs.get("password", "")
             self.connection_string = f"postgresql://{username}:{password}@{host}:{port}/{database}"
+            self.async_connection_string = f"postgresql+asyncpg://{username}:{password}@{host}:{port}/{database}"
         else:
             raise ValueError("Tipo de banco não suportado. Use 'sqlite' ou 'postgresql'")
+        
+        # Pool de conexões e ajustes de desempenho
+        self.performance_profile = kwargs.get("performance_profile", "default")
+        presets = PERFORMANCE_PRESETS[self.database_type]
+        if self.performance_profile not in presets:
+            raise ValueError(f"Perfil de desempenho desconhecido. Use um de: {', '.join(presets)}")
+        preset = presets[self.performance_profile]
+        
+        self.pool_size = kwargs.get("pool_size", preset.get("pool_size"))
+        self.max_overflow = kwargs.get("max_overflow", preset.get("max_overflow"))
+        self.pool_recycle = kwargs.get("pool_recycle", preset.get("pool_recycle"))
+        self.pool_timeout = kwargs.get("pool_timeout", preset.get("pool_timeout"))
+        self.pool_pre_ping = kwargs.get("pool_pre_ping", self.database_type == "postgresql")
+        # Segundos: tempo de conexão no PostgreSQL, espera por lock no SQLite
+        self.connect_timeout = kwargs.get("connect_timeout", preset.get("connect_timeout"))
+        self.sqlite_pragmas = {**preset.get("sqlite_pragmas", {}), **kwargs.get("sqlite_pragmas", {})}
+        self.echo = kwargs.get("echo", False)  # True para ver as queries SQL
+        # Reutilizar um único engine (e pool) entre repositórios com a mesma configuração
+        self.share_engine = kwargs.get("share_engine", False)
+        
+        # Réplicas de leitura: cada item sobrepõe parâmetros de conexão do
+        # primário, ex.: [{"host": "replica-1"}] ou, no SQLite, [{"db_path": "replica-1.db"}]
+        primary = {name: value for name, value in kwargs.items() if name != "replicas"}
+        self.replicas: List[DatabaseConfig] = [
+            DatabaseConfig(database_url, database_type, **{**primary, **replica})
+            for replica in kwargs.get("replicas", [])
+        ]
+        self.replica_selection = kwargs.get("replica_selection", ROUND_ROBIN)
+        if self.replica_selection not in REPLICA_SELECTIONS:
+            raise ValueError(f"Seleção de réplica desconhecida. Use uma de: {', '.join(REPLICA_SELECTIONS)}")
+        # Segundos após uma escrita em que as leituras do mesmo contexto (thread
+        # ou tarefa) continuam no primário, para enxergar a própria escrita
+        self.read_your_writes_window = kwargs.get("read_your_writes_window", 1.0)
+    
+    def engine_options(self, async_driver: bool = False) -> dict:
+        """Argumentos para create_engine/create_async_engine"""
+        options = {"echo": self.echo, "pool_pre_ping": self.pool_pre_ping}
+        for name in POOL_OPTIONS:
+            value = getattr(self, name)
+            if value is not None:
+                options[name] = value
+        
+        if self.connect_timeout is not None:
+            if self.database_type == "sqlite":
+                options["connect_args"] = {"timeout": self.connect_timeout}
+            elif async_driver:
+                options["connect_args"] = {"timeout": self.connect_timeout}
+            else:
+                options["connect_args"] = {"connect_timeout": int(self.connect_timeout)}
+        return options
+    
+    def create_engine(self) -> Engine:
+        """Cria um engine com as opções de pool e os PRAGMAs configurados"""
+        engine = create_engine(self.connection_string, **self.engine_options())
+        self._install_sqlite_pragmas(engine)
+        return engine
+    
+    def create_async_engine(self):
+        """Cria um AsyncEngine com as opções de pool e os PRAGMAs configurados"""
+        from sqlalchemy.ext.asyncio import create_async_engine
+        
+        engine = create_async_engine(self.async_connection_string, **self.engine_options(async_driver=True))
+        self._install_sqlite_pragmas(engine.sync_engine)
+        return engine
+    
+    def create_replica_set(self) -> "ReplicaSet":
+        """ReplicaSet com um engine por réplica (compartilhados se share_engine)"""
+        return ReplicaSet(
+            [get_shared_engine(replica) if self.share_engine else replica.create_engine() for replica in self.replicas],
+            self.replica_selection
+        )
+    
+    def create_async_replica_set(self) -> "ReplicaSet":
+        return ReplicaSet([replica.create_async_engine() for replica in self.replicas], self.replica_selection)
+    
+    def engine_key(self) -> tuple:
+        """Identifica configurações que podem compartilhar o mesmo engine"""
+        options = self.engine_options()
+        return (
+            self.connection_string,
+            repr(sorted(options.items())),
+            tuple(sorted(self.sqlite_pragmas.items()))
+        )
+    
+    def _install_sqlite_pragmas(self, engine: Engine):
+        if self.database_type != "sqlite" or not self.sqlite_pragmas:
+            return
+        pragmas = dict(self.sqlite_pragmas)
+        
+        @event.listens_for(engine, "connect")
+        def set_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+            cursor.close()
+
+class ReplicaSet:
+    """Engines das réplicas de leitura e a escolha entre elas.
+    
+    `round_robin` alterna as réplicas a cada leitura; `least_loaded` escolhe a
+    que tem menos leituras em andamento neste processo (empates em rodízio).
+    Um conjunto vazio é falso: as leituras ficam no primário.
+    """
+    
+    def __init__(self, engines: list, selection: str = ROUND_ROBIN):
+        self.engines = list(engines)
+        self.selection = selection
+        self._in_flight = [0] * len(self.engines)
+        self._turns = itertools.count()
+        self._lock = threading.Lock()
+    
+    def __bool__(self) -> bool:
+        return bool(self.engines)
+    
+    def __len__(self) -> int:
+        return len(self.engines)
+    
+    @contextmanager
+    def acquire(self) -> Iterator:
+        """Escolhe uma réplica e a conta como ocupada enquanto o bloco executa"""
+        with self._lock:
+            count = len(self.engines)
+            start = index = next(self._turns) % count
+            if self.selection == LEAST_LOADED:
+                index = min(
+                    range(count),
+                    key=lambda candidate: (self._in_flight[candidate], (candidate - start) % count)
+                )
+            self._in_flight[index] += 1
+        try:
+            yield self.engines[index]
+        finally:
+            with self._lock:
+                self._in_flight[index] -= 1
+    
+    def in_flight(self) -> List[int]:
+        """Leituras em andamento em cada réplica"""
+        with self._lock:
+            return list(self._in_flight)
+    
+    def dispose(self):
+        for engine in self.engines:
+            engine.dispose()
+
+
+def copy_sqlite_database(source_path: str, target_path: str) -> None:
+    """Copia o banco SQLite `source_path` sobre `target_path` pela API de backup.
+    
+    Permite usar arquivos SQLite locais como réplicas, atualizadas sob demanda,
+    no lugar da replicação do PostgreSQL; conexões já abertas na réplica passam
+    a ver o novo conteúdo.
+    """
+    with closing(sqlite3.connect(source_path)) as source, closing(sqlite3.connect(target_path)) as target:
+        source.backup(target)
+
+# Engines compartilhados por processo, indexados por DatabaseConfig.engine_key()
+_shared_engines: Dict[tuple, Engine] = {}
+_shared_engines_lock = threading.Lock()
+
+def get_shared_engine(config: DatabaseConfig) -> Engine:
+    """Retorna o engine do processo para a configuração, criando-o na primeira chamada"""
+    key = config.engine_key()
+    with _shared_engines_lock:
+        engine = _shared_engines.get(key)
+        if engine is None:
+            engine = _shared_engines[key] = config.create_engine()
+        return engine
+
+def dispose_shared_engines():
+    """Fecha os pools de todos os engines compartilhados"""
+    with _shared_engines_lock:
+        for engine in _shared_engines.values():
+            engine.dispose()
+        _shared_engines.clear()
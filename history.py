@@ -0,0 +1,39 @@
+# Histórico de transições de cards entre colunas
+#
+# `move_card` sobrescreve a coluna do card; para medir tempo de ciclo, vazão e
+# WIP ao longo do tempo (ver analytics.py), cada criação, mudança de coluna,
+# exclusão, arquivamento e restauração de card grava também uma linha em
+# `card_transitions`, na mesma transação da operação. A tabela só recebe
+# inserções: uma transição com origem nula é a entrada do card no quadro
+# (criação ou restauração), e uma com destino nulo, a sua saída (exclusão ou
+# arquivamento). Reordenações dentro da mesma coluna não são transições.
+from datetime import datetime
+from typing import Iterable, NamedTuple, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from model import CardTransition
+
+card_transitions = CardTransition.__table__
+
+
+class Transition(NamedTuple):
+    card_id: int
+    # Quadro da coluna de destino (da de origem, na saída)
+    board_id: int
+    from_kcolumn_id: Optional[int]
+    to_kcolumn_id: Optional[int]
+
+
+def record_transitions(session: Session, transitions: Iterable[Transition], at: datetime = None) -> None:
+    """Grava as transições com um único executemany, no instante `at` (agora,
+    por padrão); transições para a própria coluna são ignoradas"""
+    at = at or datetime.now()
+    rows = [
+        {**transition._asdict(), "transitioned_at": at}
+        for transition in transitions
+        if transition.from_kcolumn_id != transition.to_kcolumn_id
+    ]
+    if rows:
+        session.execute(insert(card_transitions), rows)
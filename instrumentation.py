@@ -0,0 +1,390 @@
+# Instrumentação opcional de consultas e operações do serviço
+#
+# Uso:
+#     kanban = instrument_service(KanbanService(repository), sink=InMemoryMetricsSink(),
+#                                 slow_threshold_ms=200, max_queries=10)
+#
+# Cada chamada de método público do serviço registra número de consultas,
+# tempo total no banco, linhas lidas/afetadas e tempo de parede. Os valores vão
+# para o sink como contadores e histogramas, e operações acima dos limites são
+# registradas no log junto com o SQL executado.
+import bisect
+import functools
+import inspect
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger("kanban.instrumentation")
+
+# Limites superiores dos buckets dos histogramas (ms para tempos, unidades para contagens)
+DEFAULT_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# Quantidade máxima de comandos SQL guardados por operação para o log
+MAX_LOGGED_STATEMENTS = 50
+
+
+class OperationStats:
+    """Medidas acumuladas durante uma operação do serviço"""
+    __slots__ = ("name", "queries", "db_time", "rows", "wall_time", "statements")
+    
+    def __init__(self, name: str):
+        self.name = name
+        self.queries = 0
+        self.db_time = 0.0
+        self.rows = 0
+        self.wall_time = 0.0
+        self.statements: List[str] = []
+
+
+_current_operation: ContextVar[Optional[OperationStats]] = ContextVar(
+    "kanban_current_operation", default=None
+)
+
+
+class MetricsSink(ABC):
+    """Destino das métricas; implemente para exportar (Prometheus, StatsD, ...)"""
+    
+    @abstractmethod
+    def increment(self, name: str, value: float = 1, tags: Dict[str, str] = None) -> None:
+        ...
+    
+    @abstractmethod
+    def observe(self, name: str, value: float, tags: Dict[str, str] = None) -> None:
+        ...
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "count", "total", "max")
+    
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+    
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+    
+    def quantile(self, fraction: float) -> float:
+        """Estimativa pelo limite superior do bucket que contém o quantil"""
+        if not self.count:
+            return 0.0
+        target = fraction * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= target:
+                # O limite do bucket nunca passa do maior valor observado
+                return min(self.buckets[index], self.max) if index < len(self.buckets) else self.max
+        return self.max
+    
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.quantile(0.50),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "max": self.max,
+        }
+
+
+class InMemoryMetricsSink(MetricsSink):
+    """Contadores e histogramas mantidos no processo, seguros para várias threads"""
+    
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._counters: Dict[tuple, float] = {}
+        self._histograms: Dict[tuple, Histogram] = {}
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _key(name: str, tags: Dict[str, str]) -> tuple:
+        return (name, tuple(sorted((tags or {}).items())))
+    
+    def increment(self, name: str, value: float = 1, tags: Dict[str, str] = None) -> None:
+        key = self._key(name, tags)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+    
+    def observe(self, name: str, value: float, tags: Dict[str, str] = None) -> None:
+        key = self._key(name, tags)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(value)
+    
+    def counter(self, name: str, **tags) -> float:
+        with self._lock:
+            return self._counters.get(self._key(name, tags), 0)
+    
+    def histogram(self, name: str, **tags) -> dict:
+        with self._lock:
+            histogram = self._histograms.get(self._key(name, tags))
+            return histogram.summary() if histogram else Histogram(self.buckets).summary()
+    
+    def snapshot(self) -> dict:
+        """Todas as métricas, com as tags formatadas como name{tag=valor}"""
+        def label(key):
+            name, tags = key
+            return name + ("{" + ",".join(f"{k}={v}" for k, v in tags) + "}" if tags else "")
+        
+        with self._lock:
+            return {
+                "counters": {label(key): value for key, value in self._counters.items()},
+                "histograms": {label(key): h.summary() for key, h in self._histograms.items()},
+            }
+    
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+class _CountingCursor:
+    """Proxy do cursor DBAPI que conta as linhas lidas pelo resultado"""
+    
+    def __init__(self, cursor, stats: OperationStats):
+        self._cursor = cursor
+        self._stats = stats
+    
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            self._stats.rows += 1
+        return row
+    
+    def fetchmany(self, *args, **kwargs):
+        rows = self._cursor.fetchmany(*args, **kwargs)
+        self._stats.rows += len(rows)
+        return rows
+    
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self._stats.rows += len(rows)
+        return rows
+    
+    def __iter__(self):
+        for row in self._cursor:
+            self._stats.rows += 1
+            yield row
+    
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class QueryInstrumentation:
+    """Coleta consultas, tempo de banco e linhas via eventos do engine.
+    
+    Só há custo quando existe uma operação ativa (ver `operation`).
+    """
+    
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+    
+    def remove(self):
+        event.remove(self.engine, "before_cursor_execute", self._before_cursor_execute)
+        event.remove(self.engine, "after_cursor_execute", self._after_cursor_execute)
+    
+    @staticmethod
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if _current_operation.get() is not None:
+            conn.info.setdefault("kanban_query_start", []).append(time.perf_counter())
+    
+    @staticmethod
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        stats = _current_operation.get()
+        if stats is None:
+            return
+        started = conn.info["kanban_query_start"].pop()
+        stats.queries += 1
+        stats.db_time += time.perf_counter() - started
+        if len(stats.statements) < MAX_LOGGED_STATEMENTS:
+            stats.statements.append(statement)
+        
+        if cursor.description is None:
+            # Comandos sem resultado: linhas afetadas, quando o driver informa
+            if cursor.rowcount > 0:
+                stats.rows += cursor.rowcount
+        elif context is not None:
+            context.cursor = _CountingCursor(cursor, stats)
+    
+    @staticmethod
+    def operation(name: str):
+        """Acumula as consultas do bloco em um OperationStats"""
+        return QueryInstrumentation.resume(OperationStats(name))
+    
+    @staticmethod
+    @contextmanager
+    def resume(stats: OperationStats) -> Iterator[OperationStats]:
+        """Reativa uma operação durante o bloco, somando-o às suas medidas"""
+        token = _current_operation.set(stats)
+        started = time.perf_counter()
+        try:
+            yield stats
+        finally:
+            stats.wall_time += time.perf_counter() - started
+            _current_operation.reset(token)
+
+
+class InstrumentedService:
+    """Proxy de um KanbanService/AsyncKanbanService que mede cada método público.
+    
+    Métricas enviadas ao sink (tag `operation`): contadores `kanban.operation.calls`,
+    `kanban.operation.errors` e `kanban.operation.slow`; histogramas
+    `kanban.operation.wall_ms`, `kanban.operation.db_ms`, `kanban.operation.queries`
+    e `kanban.operation.rows`.
+    """
+    
+    # Métodos repassados sem medição
+    _PASSTHROUGH = {"cache_stats", "read_from_primary"}
+    
+    def __init__(self, service, sink: MetricsSink = None, slow_threshold_ms: float = None,
+                 max_queries: int = None):
+        self._service = service
+        self.sink = sink or InMemoryMetricsSink()
+        self.slow_threshold_ms = slow_threshold_ms
+        self.max_queries = max_queries
+        # Primário e réplicas de leitura
+        repository = service.repository
+        self.instrumentations = [
+            QueryInstrumentation(getattr(engine, "sync_engine", engine))
+            for engine in (repository.engine, *repository.replicas.engines)
+        ]
+    
+    def __getattr__(self, name):
+        attribute = getattr(self._service, name)
+        if name.startswith("_") or name in self._PASSTHROUGH or not callable(attribute):
+            return attribute
+        if inspect.iscoroutinefunction(attribute):
+            return self._measure_coroutine(name, attribute)
+        
+        @functools.wraps(attribute)
+        def measured(*args, **kwargs):
+            with self._operation(name) as stats:
+                result = attribute(*args, **kwargs)
+            # Geradores (exportações, iter_cards) são medidos até o fim da iteração
+            if inspect.isgenerator(result):
+                return self._measure_generator(name, result)
+            if inspect.isasyncgen(result):
+                return self._measure_async_generator(name, result)
+            self._record(stats)
+            return result
+        return measured
+    
+    def _measure_coroutine(self, name, attribute):
+        @functools.wraps(attribute)
+        async def measured(*args, **kwargs):
+            with self._operation(name) as stats:
+                result = await attribute(*args, **kwargs)
+            self._record(stats)
+            return result
+        return measured
+    
+    # A operação de um gerador só fica ativa em cada passo: enquanto ele está
+    # suspenso, as consultas do consumidor não são atribuídas a ela. A medição
+    # é registrada também quando o consumidor interrompe a iteração.
+    def _measure_generator(self, name, generator):
+        stats = OperationStats(name)
+        try:
+            while True:
+                with self._step(stats):
+                    try:
+                        item = next(generator)
+                    except StopIteration:
+                        break
+                yield item
+        finally:
+            generator.close()
+            self._record(stats)
+    
+    async def _measure_async_generator(self, name, generator):
+        stats = OperationStats(name)
+        try:
+            while True:
+                with self._step(stats):
+                    try:
+                        item = await generator.__anext__()
+                    except StopAsyncIteration:
+                        break
+                yield item
+        finally:
+            await generator.aclose()
+            self._record(stats)
+    
+    def _operation(self, name: str):
+        return self._step(OperationStats(name))
+    
+    @contextmanager
+    def _step(self, stats: OperationStats) -> Iterator[OperationStats]:
+        with QueryInstrumentation.resume(stats):
+            try:
+                yield stats
+            except Exception:
+                self.sink.increment("kanban.operation.errors", tags={"operation": stats.name})
+                raise
+    
+    def batch(self):
+        """Como o batch() do serviço, mantendo as chamadas do bloco instrumentadas"""
+        context = self._service.batch()
+        if hasattr(context, "__aenter__"):
+            return self._async_batch(context)
+        return self._sync_batch(context)
+    
+    @contextmanager
+    def _sync_batch(self, context):
+        with context:
+            yield self
+    
+    @asynccontextmanager
+    async def _async_batch(self, context):
+        async with context:
+            yield self
+    
+    def _record(self, stats: OperationStats):
+        tags = {"operation": stats.name}
+        wall_ms = stats.wall_time * 1000
+        self.sink.increment("kanban.operation.calls", tags=tags)
+        self.sink.observe("kanban.operation.wall_ms", wall_ms, tags=tags)
+        self.sink.observe("kanban.operation.db_ms", stats.db_time * 1000, tags=tags)
+        self.sink.observe("kanban.operation.queries", stats.queries, tags=tags)
+        self.sink.observe("kanban.operation.rows", stats.rows, tags=tags)
+        
+        slow = self.slow_threshold_ms is not None and wall_ms > self.slow_threshold_ms
+        chatty = self.max_queries is not None and stats.queries > self.max_queries
+        if slow or chatty:
+            self.sink.increment("kanban.operation.slow", tags=tags)
+            logger.warning(
+                "Operação %s: %.1f ms, %d consultas (%.1f ms no banco), %d linhas%s\n%s",
+                stats.name, wall_ms, stats.queries, stats.db_time * 1000, stats.rows,
+                " - possível N+1" if chatty else "",
+                "\n".join(stats.statements)
+            )
+    
+    def remove(self):
+        """Remove os listeners dos engines"""
+        for instrumentation in self.instrumentations:
+            instrumentation.remove()
+
+
+def instrument_service(service, sink: MetricsSink = None, slow_threshold_ms: float = None,
+                       max_queries: int = None) -> InstrumentedService:
+    """Envolve o serviço com instrumentação; o original continua sem medição"""
+    return InstrumentedService(service, sink=sink, slow_threshold_ms=slow_threshold_ms,
+                               max_queries=max_queries)
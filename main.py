@@ -1,4 +1,5 @@
 # Função de exemplo de uso
+import asyncio
 from datetime import datetime
 from db import DatabaseConfig
 from model import PriorityLevel
@@ -70,8 +71,35 @@ def exemplo_uso():
     
     return kanban
 
+async def exemplo_uso_async():
+    """Exemplo do serviço assíncrono sobre o mesmo banco SQLite"""
+    from async_repository import AsyncKanbanRepository
+    from async_service import AsyncKanbanService
+    
+    repository = AsyncKanbanRepository(DatabaseConfig("sqlite", db_path="kanban_example.db"))
+    await repository.create_tables()
+    kanban = AsyncKanbanService(repository)
+    
+    board = await kanban.create_board("Projeto Assíncrono", "Criado com AsyncKanbanService")
+    todo_column = board.kcolumns[0]
+    
+    # Operações independentes rodam em paralelo, cada uma em sua sessão
+    await asyncio.gather(
+        kanban.create_card(todo_column.id, "Configurar CI", priority=PriorityLevel.HIGH),
+        kanban.create_card(todo_column.id, "Escrever documentação")
+    )
+    
+    boards = await kanban.get_all_boards()
+    snapshots = await asyncio.gather(*(kanban.get_board_with_data(b.id) for b in boards))
+    for board_data in snapshots:
+        total = sum(len(column['cards']) for column in board_data['columns'])
+        print(f"{board_data['name']}: {total} cards")
+    
+    await repository.dispose()
+
 if __name__ == "__main__":
     # Executar exemplo
     sistema = exemplo_uso()
+    asyncio.run(exemplo_uso_async())
     print("\nSistema Kanban inicializado com sucesso!")
     print("Para usar com PostgreSQL, descomente e configure as credenciais na função exemplo_uso()")
\ No newline at end of file
@@ -0,0 +1,253 @@
+# Migrações versionadas do esquema
+#
+# Base.metadata.create_all só cria tabelas inexistentes: índices e colunas novos
+# em tabelas já existentes precisam de um passo explícito. Cada migração recebe
+# uma conexão dentro de uma transação e deve ser idempotente, pois em bancos
+# novos create_all já terá criado os objetos que ela adiciona. Todas as
+# migrações pendentes rodam na mesma transação.
+#
+# ensure_schema só executa DDL quando a versão registrada é menor que
+# SCHEMA_VERSION; com o esquema atual, a inicialização custa duas consultas. Por
+# isso toda alteração nos modelos precisa vir acompanhada de uma migração.
+from datetime import datetime
+from typing import Callable, List, NamedTuple, Optional
+
+from sqlalchemy import func, inspect, literal, null, select, text, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.schema import CreateColumn
+
+from aggregates import install_aggregates
+from db import Base
+from model import (ArchivedBoard, ArchivedCard, ArchivedKcolumn, Board, BoardChange, Card, CardTransition,
+                   Kcolumn, SchemaMigration)
+from search import install_search
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    upgrade: Callable[[Connection], None]
+
+
+def _create_indexes(connection: Connection, *indexes) -> None:
+    """Cria os índices informados, ignorando os que já existem"""
+    for index in indexes:
+        index.create(bind=connection, checkfirst=True)
+
+
+def _add_columns(connection: Connection, model, *names: str) -> None:
+    """Adiciona à tabela do modelo as colunas informadas que ainda não existem"""
+    table = model.__table__
+    existing = {column["name"] for column in inspect(connection).get_columns(table.name)}
+    for name in names:
+        if name not in existing:
+            ddl = CreateColumn(table.c[name]).compile(dialect=connection.dialect)
+            connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {ddl}"))
+
+
+def _create_tables(connection: Connection, *models) -> None:
+    """Cria as tabelas (com seus índices) dos modelos informados, se não existirem"""
+    for model in models:
+        model.__table__.create(bind=connection, checkfirst=True)
+
+
+def _has_autoincrement(connection: Connection, model) -> bool:
+    """Indica se a tabela do modelo foi criada com AUTOINCREMENT (SQLite)"""
+    ddl = connection.execute(
+        text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {"name": model.__tablename__}
+    ).scalar()
+    return "AUTOINCREMENT" in (ddl or "").upper()
+
+
+def _rebuild_tables(connection: Connection, *models) -> None:
+    """Recria no SQLite as tabelas dos modelos com o DDL atual, preservando as linhas.
+    
+    Os modelos devem vir em ordem de dependência e incluir todas as tabelas que
+    referenciam as demais, pois renomear uma tabela também altera as chaves
+    estrangeiras que apontam para ela. Triggers das tabelas antigas são
+    descartados com elas e precisam ser recriados.
+    """
+    for model in models:
+        name = model.__tablename__
+        indexes = connection.execute(
+            text("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :name AND sql IS NOT NULL"),
+            {"name": name}
+        ).scalars().all()
+        for index in indexes:
+            connection.execute(text(f"DROP INDEX {index}"))
+        connection.execute(text(f"ALTER TABLE {name} RENAME TO {name}_legacy"))
+    for model in models:
+        table = model.__table__
+        table.create(bind=connection)
+        columns = ", ".join(column.name for column in table.columns)
+        connection.execute(text(f"INSERT INTO {table.name} ({columns}) SELECT {columns} FROM {table.name}_legacy"))
+    # Filhas antes das pais, para não acionar o ON DELETE CASCADE das antigas
+    for model in reversed(models):
+        connection.execute(text(f"DROP TABLE {model.__tablename__}_legacy"))
+
+
+def _reserve_ids(connection: Connection, reserved) -> None:
+    """Avança a sequência AUTOINCREMENT de cada tabela (SQLite) para além dos
+    IDs já usados em outras tabelas (modelo -> colunas com IDs dele)"""
+    for model, columns in reserved.items():
+        name = model.__tablename__
+        current = connection.execute(
+            text("SELECT seq FROM sqlite_sequence WHERE name = :name"), {"name": name}
+        ).scalar()
+        used = max(
+            [current or 0] + [connection.execute(select(func.max(column))).scalar() or 0
+                              for column in (model.id, *columns)]
+        )
+        if current is None:
+            connection.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES (:name, :seq)"),
+                               {"name": name, "seq": used})
+        else:
+            connection.execute(text("UPDATE sqlite_sequence SET seq = :seq WHERE name = :name"),
+                               {"name": name, "seq": used})
+
+
+def _index(model, name: str):
+    """Localiza um índice declarado no modelo pelo nome"""
+    return next(index for index in model.__table__.indexes if index.name == name)
+
+
+def _add_hot_lookup_indexes(connection: Connection) -> None:
+    _create_indexes(
+        connection,
+        _index(Card, "ix_cards_kcolumn_position"),
+        _index(Kcolumn, "ix_kcolumns_board_position"),
+        _index(Board, "ix_boards_active_id"),
+    )
+
+
+def _add_card_filter_indexes(connection: Connection) -> None:
+    _create_indexes(
+        connection,
+        _index(Card, "ix_cards_assignee_id"),
+        _index(Card, "ix_cards_priority_due_date"),
+    )
+
+
+def _install_card_search(connection: Connection) -> None:
+    install_search(connection)
+
+
+def _add_column_aggregates(connection: Connection) -> None:
+    install_aggregates(connection)
+    _create_indexes(connection, _index(Card, "ix_cards_kcolumn_due_date"))
+
+
+def _add_board_change_feed(connection: Connection) -> None:
+    _add_columns(connection, Board, "revision", "pruned_revision")
+    _create_tables(connection, BoardChange)
+
+
+def _add_versions(connection: Connection) -> None:
+    _add_columns(connection, Card, "version")
+    _add_columns(connection, Kcolumn, "version")
+
+
+def _add_archive(connection: Connection) -> None:
+    _add_columns(connection, Kcolumn, "is_done")
+    # A coluna de concluídos entre as colunas padrão dos quadros existentes
+    connection.execute(update(Kcolumn.__table__).where(Kcolumn.title == "Concluído").values(is_done=True))
+    _create_tables(connection, ArchivedBoard, ArchivedKcolumn, ArchivedCard)
+
+
+def _add_card_transitions(connection: Connection) -> None:
+    _create_tables(connection, CardTransition)
+    # O histórico anterior é desconhecido: cada card existente recebe a entrada
+    # na coluna atual, na data de criação, para que o WIP o considere. Sem
+    # origem, essa entrada não conta como conclusão nas métricas de fluxo.
+    transitions = CardTransition.__table__
+    if connection.execute(select(transitions.c.id).limit(1)).first() is None:
+        connection.execute(transitions.insert().from_select(
+            ["card_id", "board_id", "from_kcolumn_id", "to_kcolumn_id", "transitioned_at"],
+            select(
+                Card.id, Kcolumn.board_id, null(), Card.kcolumn_id,
+                func.coalesce(Card.created_at, literal(datetime.now()))
+            ).join(Kcolumn, Kcolumn.id == Card.kcolumn_id)
+        ))
+
+
+def _stop_id_reuse(connection: Connection) -> None:
+    # Sem AUTOINCREMENT o SQLite reutiliza o maior ID depois de uma remoção, e o
+    # novo registro colidiria com o arquivado de mesmo ID. Bancos criados antes
+    # da migração 7 não têm AUTOINCREMENT (create_all não altera tabelas
+    # existentes) e são reconstruídos; board_changes entra na reconstrução por
+    # referenciar boards. No PostgreSQL as sequências nunca retrocedem.
+    if connection.dialect.name != "sqlite":
+        return
+    if not all(_has_autoincrement(connection, model) for model in (Board, Kcolumn, Card)):
+        _rebuild_tables(connection, Board, Kcolumn, Card, BoardChange)
+        # Os triggers da busca foram descartados com a tabela antiga de cards
+        install_search(connection)
+    # IDs que já foram usados e não estão mais nas tabelas principais: os
+    # arquivados e os de cards e colunas removidos, que continuam no histórico
+    # de transições (um card novo com o mesmo ID herdaria esse histórico)
+    _reserve_ids(connection, {
+        Board: (ArchivedBoard.id, CardTransition.board_id),
+        Kcolumn: (ArchivedKcolumn.id, CardTransition.from_kcolumn_id, CardTransition.to_kcolumn_id),
+        Card: (ArchivedCard.id, CardTransition.card_id),
+    })
+
+
+# Lista ordenada de migrações; novas entradas devem ir sempre ao final
+MIGRATIONS: List[Migration] = [
+    Migration(1, "Índices compostos para colunas de busca frequente", _add_hot_lookup_indexes),
+    Migration(2, "Índices para filtros de listagem de cards", _add_card_filter_indexes),
+    Migration(3, "Busca textual em títulos e descrições de cards", _install_card_search),
+    Migration(4, "Agregados de cards por coluna", _add_column_aggregates),
+    Migration(5, "Revisão por quadro e registro de alterações", _add_board_change_feed),
+    Migration(6, "Versões para controle de concorrência otimista", _add_versions),
+    Migration(7, "Tabelas de arquivo e colunas de concluídos", _add_archive),
+    Migration(8, "Histórico de transições de cards entre colunas", _add_card_transitions),
+    Migration(9, "IDs de quadros, colunas e cards nunca reutilizados no SQLite", _stop_id_reuse),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1].version
+
+
+def get_schema_version(connection: Connection) -> int:
+    """Retorna a versão de esquema registrada (0 se nenhuma migração foi aplicada)"""
+    if not inspect(connection).has_table(SchemaMigration.__tablename__):
+        return 0
+    versions = connection.execute(select(SchemaMigration.version)).scalars().all()
+    return max(versions, default=0)
+
+
+def apply_migrations(connection: Connection) -> List[int]:
+    """Aplica as migrações pendentes na transação da conexão informada.
+    
+    Retorna as versões aplicadas nesta chamada.
+    """
+    current = get_schema_version(connection)
+    
+    applied = []
+    for migration in MIGRATIONS:
+        if migration.version <= current:
+            continue
+        migration.upgrade(connection)
+        connection.execute(
+            SchemaMigration.__table__.insert().values(
+                version=migration.version,
+                description=migration.description,
+                applied_at=datetime.now()
+            )
+        )
+        applied.append(migration.version)
+    return applied
+
+
+def ensure_schema(connection: Connection) -> Optional[List[int]]:
+    """Cria as tabelas e aplica as migrações pendentes, na transação da conexão,
+    somente se o esquema não estiver na versão atual.
+    
+    Retorna as versões aplicadas, ou None se o esquema já estava atual e nenhum
+    DDL foi executado.
+    """
+    if get_schema_version(connection) >= SCHEMA_VERSION:
+        return None
+    Base.metadata.create_all(bind=connection)
+    return apply_migrations(connection)
@@ -8,7 +8,10 @@ from sqlalchemy import (
     DateTime, 
     ForeignKey,
     Enum as SQLEnum,
-    Boolean
+    Boolean,
+    Index,
+    JSON,
+    false
 )
 
 from sqlalchemy.orm import relationship
@@ -35,6 +38,23 @@ class Board(Base):
     updated_at = Column(DateTime(timezone=True), default=datetime.now, onupdate=datetime.now)
     is_active = Column(Boolean, default=True)
     
+    # Revisão incrementada a cada alteração do quadro e maior revisão já
+    # removida do registro de alterações (ver changes.py)
+    revision = Column(Integer, nullable=False, default=0, server_default="0")
+    pruned_revision = Column(Integer, nullable=False, default=0, server_default="0")
+    
+    __table_args__ = (
+        # Índice parcial: apenas quadros ativos, usado pelas listagens
+        Index(
+            "ix_boards_active_id", "id",
+            sqlite_where=is_active == True,
+            postgresql_where=is_active == True
+        ),
+        # IDs nunca reutilizados no SQLite, para que quadros arquivados possam
+        # ser restaurados com o mesmo ID (ver archive.py)
+        {"sqlite_autoincrement": True},
+    )
+    
     # Relacionamentos
     kcolumns = relationship("Kcolumn", back_populates="board", cascade="all, delete-orphan")
     
@@ -52,6 +72,23 @@ class Kcolumn(Base):
     created_at = Column(DateTime(timezone=True), default=datetime.now)
     updated_at = Column(DateTime(timezone=True), default=datetime.now, onupdate=datetime.now)
     
+    # Agregados dos cards da coluna, mantidos pelo repositório (ver aggregates.py)
+    card_count = Column(Integer, nullable=False, default=0, server_default="0")
+    low_count = Column(Integer, nullable=False, default=0, server_default="0")
+    medium_count = Column(Integer, nullable=False, default=0, server_default="0")
+    high_count = Column(Integer, nullable=False, default=0, server_default="0")
+    max_position = Column(Integer, nullable=True)  # None quando a coluna está vazia
+    # Coluna de itens concluídos: seus cards são arquivados após um período (ver archive.py)
+    is_done = Column(Boolean, nullable=False, default=False, server_default=false())
+    # Versão da ordem dos cards na coluna: incrementada (com comparação) pelas
+    # inserções em posição explícita e pelo rebalanceamento
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    
+    __table_args__ = (
+        Index("ix_kcolumns_board_position", "board_id", "position"),
+        {"sqlite_autoincrement": True},
+    )
+    
     # Relacionamentos
     board = relationship("Board", back_populates="kcolumns")
     cards = relationship("Card", back_populates="kcolumn", cascade="all, delete-orphan")
@@ -73,9 +110,155 @@ class Card(Base):
     kcolumn_id = Column(Integer, ForeignKey("kcolumns.id", ondelete="CASCADE"), nullable=False)
     created_at = Column(DateTime(timezone=True), default=datetime.now)
     updated_at = Column(DateTime(timezone=True), default=datetime.now, onupdate=datetime.now)
+    # Controle de concorrência otimista: o ORM inclui a versão lida no WHERE de
+    # cada UPDATE/DELETE e a incrementa; os UPDATEs em lote a incrementam também
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    
+    __table_args__ = (
+        Index("ix_cards_kcolumn_position", "kcolumn_id", "position"),
+        # Filtros de list_cards: "meus cards" e "vencidos por prioridade"
+        Index("ix_cards_assignee_id", "assignee", "id"),
+        Index("ix_cards_priority_due_date", "priority", "due_date"),
+        # Cards vencidos por coluna, no resumo do quadro
+        Index("ix_cards_kcolumn_due_date", "kcolumn_id", "due_date"),
+        {"sqlite_autoincrement": True},
+    )
+    
+    __mapper_args__ = {"version_id_col": version}
     
     # Relacionamentos
     kcolumn = relationship("Kcolumn", back_populates="cards")
     
     def __repr__(self):
         return f"<Card(id={self.id}, title='{self.title}', kcolumn_id={self.kcolumn_id})>"
+
+
+class BoardChange(Base):
+    """Alteração de uma entidade do quadro, para sincronização incremental (ver changes.py)"""
+    __tablename__ = "board_changes"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    board_id = Column(Integer, ForeignKey("boards.id", ondelete="CASCADE"), nullable=False)
+    revision = Column(Integer, nullable=False)
+    entity = Column(String(16), nullable=False)  # board, kcolumn ou card
+    entity_id = Column(Integer, nullable=False)
+    op = Column(String(8), nullable=False)  # create, update ou delete
+    fields = Column(JSON, nullable=True)  # Valores novos dos campos alterados
+    created_at = Column(DateTime(timezone=True), default=datetime.now)
+    
+    __table_args__ = (
+        Index("ix_board_changes_board_revision", "board_id", "revision"),
+        # Poda das alterações antigas
+        Index("ix_board_changes_created_at", "created_at"),
+    )
+    
+    def __repr__(self):
+        return f"<BoardChange(board_id={self.board_id}, revision={self.revision}, {self.op} {self.entity} {self.entity_id})>"
+
+
+class SchemaMigration(Base):
+    """Registro das migrações de esquema já aplicadas (ver migrations.py)"""
+    __tablename__ = "schema_migrations"
+    
+    version = Column(Integer, primary_key=True, autoincrement=False)
+    description = Column(String(255), nullable=False)
+    applied_at = Column(DateTime(timezone=True), default=datetime.now)
+    
+    def __repr__(self):
+        return f"<SchemaMigration(version={self.version}, description='{self.description}')>"
+
+
+# Tabelas de arquivo (ver archive.py): cópias das linhas removidas das tabelas
+# principais, com os mesmos IDs e sem chaves estrangeiras
+class ArchivedBoard(Base):
+    __tablename__ = "archived_boards"
+    
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    uuid = Column(String(36))
+    name = Column(String(255), nullable=False)
+    description = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True))
+    updated_at = Column(DateTime(timezone=True))
+    is_active = Column(Boolean)
+    revision = Column(Integer, nullable=False)
+    archived_at = Column(DateTime(timezone=True), default=datetime.now)
+    
+    def __repr__(self):
+        return f"<ArchivedBoard(id={self.id}, name='{self.name}')>"
+
+
+class ArchivedKcolumn(Base):
+    __tablename__ = "archived_kcolumns"
+    
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    uuid = Column(String(36))
+    title = Column(String(255), nullable=False)
+    position = Column(Integer)
+    board_id = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True))
+    updated_at = Column(DateTime(timezone=True))
+    is_done = Column(Boolean, nullable=False)
+    archived_at = Column(DateTime(timezone=True), default=datetime.now)
+    
+    __table_args__ = (
+        Index("ix_archived_kcolumns_board_id", "board_id"),
+    )
+    
+    def __repr__(self):
+        return f"<ArchivedKcolumn(id={self.id}, title='{self.title}', board_id={self.board_id})>"
+
+
+class ArchivedCard(Base):
+    __tablename__ = "archived_cards"
+    
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    uuid = Column(String(36))
+    title = Column(String(255), nullable=False)
+    description = Column(Text, nullable=True)
+    assignee = Column(String(255), nullable=True)
+    due_date = Column(DateTime(timezone=True), nullable=True)
+    priority = Column(SQLEnum(PriorityLevel))
+    position = Column(Integer)
+    kcolumn_id = Column(Integer, nullable=False)
+    # Quadro da coluna no momento do arquivamento
+    board_id = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True))
+    updated_at = Column(DateTime(timezone=True))
+    version = Column(Integer, nullable=False)
+    archived_at = Column(DateTime(timezone=True), default=datetime.now)
+    
+    __table_args__ = (
+        Index("ix_archived_cards_kcolumn_position", "kcolumn_id", "position"),
+        Index("ix_archived_cards_board_id", "board_id"),
+    )
+    
+    def __repr__(self):
+        return f"<ArchivedCard(id={self.id}, title='{self.title}', kcolumn_id={self.kcolumn_id})>"
+
+
+class CardTransition(Base):
+    """Entrada, mudança de coluna ou saída de um card (ver history.py).
+    
+    Tabela apenas de inserção e sem chaves estrangeiras: o histórico sobrevive
+    à exclusão e ao arquivamento dos cards e colunas.
+    """
+    __tablename__ = "card_transitions"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    card_id = Column(Integer, nullable=False)
+    # Quadro de destino (de origem, na saída)
+    board_id = Column(Integer, nullable=False)
+    from_kcolumn_id = Column(Integer, nullable=True)  # Nula na entrada (criação ou restauração)
+    to_kcolumn_id = Column(Integer, nullable=True)  # Nula na saída (exclusão ou arquivamento)
+    transitioned_at = Column(DateTime(timezone=True), nullable=False, default=datetime.now)
+    
+    __table_args__ = (
+        # Chegadas a colunas (conclusões, WIP) por período
+        Index("ix_card_transitions_to_time", "to_kcolumn_id", "transitioned_at"),
+        # Sequência de transições de cada card
+        Index("ix_card_transitions_card_time", "card_id", "transitioned_at"),
+    )
+    
+    def __repr__(self):
+        return (f"<CardTransition(card_id={self.card_id}, {self.from_kcolumn_id} -> {self.to_kcolumn_id}, "
+                f"at={self.transitioned_at})>")
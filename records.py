@@ -0,0 +1,79 @@
+# Registros de leitura imutáveis (tuplas nomeadas)
+#
+# As leituras do repositório selecionam apenas as colunas abaixo e devolvem
+# estas tuplas em vez de instâncias ORM: sem identity map nem instrumentação
+# por linha, e seguras para uso fora da sessão (não há lazy load).
+from datetime import datetime
+from typing import NamedTuple, Optional, Tuple
+
+from model import ArchivedBoard, ArchivedCard, ArchivedKcolumn, Board, Card, Kcolumn, PriorityLevel
+
+
+class ColumnRecord(NamedTuple):
+    id: int
+    uuid: str
+    title: str
+    position: int
+    board_id: int
+    created_at: datetime
+    updated_at: datetime
+    is_done: bool
+    
+    def __repr__(self):
+        return f"<Kcolumn(id={self.id}, title='{self.title}', board_id={self.board_id})>"
+
+
+class BoardRecord(NamedTuple):
+    id: int
+    uuid: str
+    name: str
+    description: Optional[str]
+    created_at: datetime
+    updated_at: datetime
+    is_active: bool
+    revision: int
+    # Preenchido apenas por operações que carregam as colunas (ex.: create_board)
+    kcolumns: Tuple[ColumnRecord, ...] = ()
+    
+    def __repr__(self):
+        return f"<Board(id={self.id}, name='{self.name}')>"
+
+
+class CardRecord(NamedTuple):
+    id: int
+    uuid: str
+    title: str
+    description: Optional[str]
+    assignee: Optional[str]
+    due_date: Optional[datetime]
+    priority: PriorityLevel
+    position: int
+    kcolumn_id: int
+    created_at: datetime
+    updated_at: datetime
+    # Enviada de volta em update_card/move_card/delete_card (expected_version)
+    version: int
+    
+    def __repr__(self):
+        return f"<Card(id={self.id}, title='{self.title}', kcolumn_id={self.kcolumn_id})>"
+
+
+# Colunas selecionadas para cada registro, na ordem dos campos
+BOARD_FIELDS = (
+    Board.id, Board.uuid, Board.name, Board.description,
+    Board.created_at, Board.updated_at, Board.is_active, Board.revision
+)
+COLUMN_FIELDS = (
+    Kcolumn.id, Kcolumn.uuid, Kcolumn.title, Kcolumn.position,
+    Kcolumn.board_id, Kcolumn.created_at, Kcolumn.updated_at, Kcolumn.is_done
+)
+CARD_FIELDS = (
+    Card.id, Card.uuid, Card.title, Card.description, Card.assignee, Card.due_date,
+    Card.priority, Card.position, Card.kcolumn_id, Card.created_at, Card.updated_at,
+    Card.version
+)
+
+# Mesmos campos, lidos das tabelas de arquivo (ver archive.py)
+ARCHIVED_BOARD_FIELDS = tuple(getattr(ArchivedBoard, column.key) for column in BOARD_FIELDS)
+ARCHIVED_COLUMN_FIELDS = tuple(getattr(ArchivedKcolumn, column.key) for column in COLUMN_FIELDS)
+ARCHIVED_CARD_FIELDS = tuple(getattr(ArchivedCard, column.key) for column in CARD_FIELDS)
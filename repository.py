@@ -1,111 +1,362 @@
 # Classe Principal do Sistema Kanban
-from datetime import datetime
-from typing import List, Optional
-from sqlalchemy import create_engine
+import base64
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Set, Tuple
+from sqlalchemy import and_, bindparam, case, func, insert, or_, select, update
+from sqlalchemy.engine import Engine, Row
 from sqlalchemy.orm import sessionmaker, Session
-from db import Base, DatabaseConfig
-from model import Board, Card, Kcolumn, PriorityLevel
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy.orm.util import identity_key
+from aggregates import (COUNT_COLUMNS, PRIORITY_COUNTS, apply_count_deltas, expire_columns,
+                        find_drift, kcolumns, recompute, refresh_max_positions)
+from analytics import CYCLE_TIME_PERCENTILES, cycle_times, throughput, wip
+from archive import (ARCHIVE_BATCH_SIZE, DONE_CARD_RETENTION_DAYS, archive_boards, archive_cards,
+                     restore_board)
+from changes import (BOARD_CHANGE_FIELDS, CARD_CHANGE_FIELDS, CHANGE_RETENTION, ENTITY_BOARD,
+                     ENTITY_CARD, ENTITY_KCOLUMN, KCOLUMN_CHANGE_FIELDS, OP_CREATE, OP_DELETE,
+                     OP_UPDATE, Change, change_fields, get_changes, prune_changes, record_changes)
+from db import Base, DatabaseConfig, ReplicaSet, copy_sqlite_database, get_shared_engine
+from history import Transition, record_transitions
+from migrations import SCHEMA_VERSION, ensure_schema
+from model import ArchivedBoard, ArchivedCard, ArchivedKcolumn, Board, Card, Kcolumn, PriorityLevel
+from records import (ARCHIVED_BOARD_FIELDS, ARCHIVED_CARD_FIELDS, ARCHIVED_COLUMN_FIELDS, BOARD_FIELDS,
+                     CARD_FIELDS, COLUMN_FIELDS, BoardRecord, CardRecord, ColumnRecord)
+from search import search_query, search_terms
+
+# Quantidade máxima de quadros carregados por lote em get_boards_with_data
+BOARD_BATCH_SIZE = 500
+
+# Intervalo entre posições consecutivas de cards; inserções no meio usam o ponto
+# médio entre os vizinhos e a coluna só é renumerada quando o intervalo se esgota
+POSITION_GAP = 1024
+
+# Tamanho padrão dos lotes nas operações em massa de cards
+CARD_BATCH_SIZE = 1000
+
+# Tamanho padrão das páginas nas listagens por cursor
+PAGE_SIZE = 50
+
+logger = logging.getLogger("kanban.repository")
+
+# Colunas criadas junto com cada novo quadro; a última é a de concluídos
+DEFAULT_COLUMNS = ("A Fazer", "Em Progresso", "Concluído")
+
+cards_table = Card.__table__
+
+class ConcurrencyConflictError(Exception):
+    """A entidade foi alterada por outra transação depois de lida.
+    
+    Nada da operação é gravado; ela pode ser repetida a partir do estado atual
+    (ver KanbanService.retry_on_conflict).
+    """
+    
+    def __init__(self, entity: str, entity_id: int, expected_version: int = None,
+                 actual_version: int = None):
+        self.entity = entity
+        self.entity_id = entity_id
+        self.expected_version = expected_version
+        self.actual_version = actual_version
+        detail = f" (esperada {expected_version}, atual {actual_version})" if expected_version is not None else ""
+        super().__init__(f"Conflito de versão em {entity} {entity_id}{detail}")
+
+class Page(NamedTuple):
+    """Página de uma listagem por cursor; `next_cursor` é None na última página"""
+    items: list
+    next_cursor: Optional[str]
+
+def encode_cursor(*values) -> str:
+    """Cursor opaco com os valores da chave de ordenação do último item"""
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+def decode_cursor(cursor: str) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("Cursor inválido")
+    if not isinstance(values, list):
+        raise ValueError("Cursor inválido")
+    return values
+
+def check_limit(limit: int) -> None:
+    """Valida o tamanho de página das listagens por cursor"""
+    if limit < 1:
+        raise ValueError("limit deve ser maior ou igual a 1")
+
+def batched(items: Iterable, batch_size: int) -> Iterator[list]:
+    """Agrupa um iterável em listas de até `batch_size` itens, sob demanda"""
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
 
 class KanbanRepository:
-    def __init__(self, config: DatabaseConfig):
+    def __init__(self, config: DatabaseConfig, engine: Engine = None, create_schema: bool = True,
+                 replicas: ReplicaSet = None, lazy_schema: bool = False):
+        """`engine` permite reutilizar um engine já existente (ex.: o sync_engine
+        de um AsyncEngine); `create_schema=False` não executa create_tables.
+        Com `lazy_schema=True`, create_tables só roda antes da primeira sessão:
+        o construtor não abre conexões, o que reduz o tempo de inicialização de
+        processos curtos (workers, comandos de linha de comando).
+        
+        As escritas vão sempre para `engine` (o primário); as leituras vão para
+        as réplicas de `config.replicas`, exceto dentro de unit_of_work(), de
+        read_from_primary() e logo após uma escrita (ver
+        DatabaseConfig.read_your_writes_window). `replicas` substitui o
+        conjunto criado a partir da configuração.
+        """
         self.config = config
-        self.engine = create_engine(
-            config.connection_string,
-            echo=False,  # Mude para True para ver as queries SQL
-            pool_pre_ping=True if config.database_type == "postgresql" else False
+        if engine is None:
+            engine = get_shared_engine(config) if config.share_engine else config.create_engine()
+        self.engine = engine
+        self.replicas = replicas if replicas is not None else config.create_replica_set()
+        # expire_on_commit=False: os objetos retornados continuam utilizáveis
+        # depois do commit feito ao final de cada operação
+        self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=self.engine)
+        # Sessão fornecida por quem chama (ex.: AsyncKanbanRepository); quando
+        # definida, as operações a reutilizam e não fazem commit
+        self._active_session: ContextVar[Optional[Session]] = ContextVar(
+            f"kanban_active_session_{id(self)}", default=None
+        )
+        # Momento (time.monotonic) da última escrita confirmada no contexto atual
+        self._last_write: ContextVar[Optional[float]] = ContextVar(
+            f"kanban_last_write_{id(self)}", default=None
         )
-        self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
-        self.create_tables()
+        self._primary_reads: ContextVar[bool] = ContextVar(f"kanban_primary_reads_{id(self)}", default=False)
+        self._schema_pending = create_schema and lazy_schema
+        self._schema_lock = threading.Lock()
+        if create_schema and not lazy_schema:
+            self.create_tables()
         
     def create_tables(self):
-        """Cria todas as tabelas no banco de dados"""
-        Base.metadata.create_all(bind=self.engine)
-        print(f"Tabelas criadas no banco {self.config.database_type}")
+        """Cria as tabelas e aplica as migrações pendentes; se o esquema já está
+        na versão atual, apenas confere a versão registrada, sem DDL"""
+        with self.engine.begin() as connection:
+            applied = ensure_schema(connection)
+        self._schema_pending = False
+        if applied is None:
+            logger.debug("Esquema do banco %s já está na versão %s", self.config.database_type, SCHEMA_VERSION)
+        else:
+            logger.info("Tabelas criadas no banco %s", self.config.database_type)
+            if applied:
+                logger.info("Migrações aplicadas: %s", applied)
+        if self.replicas and self.config.database_type == "sqlite":
+            self.refresh_replicas()
+    
+    def _ensure_schema(self) -> None:
+        """Executa create_tables adiado por `lazy_schema`, uma única vez"""
+        if not self._schema_pending:
+            return
+        with self._schema_lock:
+            if self._schema_pending:
+                self.create_tables()
         
+    def refresh_replicas(self) -> None:
+        """Copia o banco primário sobre cada réplica (somente SQLite).
+        
+        Réplicas SQLite são arquivos locais que simulam a replicação do
+        PostgreSQL em testes e desenvolvimento: ficam com o estado da última
+        cópia, como réplicas atrasadas, até a próxima chamada.
+        """
+        if self.config.database_type != "sqlite":
+            raise ValueError("refresh_replicas só se aplica a réplicas SQLite")
+        for replica in self.config.replicas:
+            copy_sqlite_database(self.config.db_path, replica.db_path)
+    
     def get_session(self) -> Session:
         """Retorna uma sessão do banco de dados"""
+        self._ensure_schema()
         return self.SessionLocal()
     
+    @contextmanager
+    def _session_scope(self) -> Iterator[Session]:
+        """Sessão de uma operação do repositório.
+        
+        Reutiliza a sessão ativa, se houver, deixando o commit para quem a
+        forneceu; caso contrário abre uma sessão própria e faz commit ao final.
+        """
+        session = self._active_session.get()
+        if session is not None:
+            yield session
+            return
+        
+        with self.get_session() as session:
+            yield session
+            session.commit()
+        self._last_write.set(time.monotonic())
+    
+    @contextmanager
+    def _read_session_scope(self, primary: bool = False) -> Iterator[Session]:
+        """Sessão de uma leitura: a ativa, se houver, ou uma sessão sem commit
+        em uma réplica. Vai para o primário com `primary=True`, sem réplicas
+        configuradas ou quando a leitura precisa enxergar escritas recentes.
+        """
+        session = self._active_session.get()
+        if session is not None:
+            yield session
+            return
+        
+        if primary or not self.replicas or self._reads_from_primary():
+            with self.get_session() as session:
+                yield session
+            return
+        
+        self._ensure_schema()
+        with self.replicas.acquire() as replica:
+            with self.SessionLocal(bind=replica) as session:
+                yield session
+    
+    def _reads_from_primary(self) -> bool:
+        if self._primary_reads.get():
+            return True
+        last_write = self._last_write.get()
+        return last_write is not None and time.monotonic() - last_write < self.config.read_your_writes_window
+    
+    @contextmanager
+    def read_from_primary(self) -> Iterator[None]:
+        """Direciona ao primário as leituras do bloco (ex.: logo após uma
+        escrita feita por outro processo, que as réplicas ainda não receberam)"""
+        token = self._primary_reads.set(True)
+        try:
+            yield
+        finally:
+            self._primary_reads.reset(token)
+    
+    @contextmanager
+    def unit_of_work(self) -> Iterator[Session]:
+        """Executa as operações do bloco em uma única sessão e transação.
+        
+        As alterações são enviadas ao banco sob demanda (autoflush) e o commit
+        acontece uma única vez ao final; qualquer exceção desfaz tudo. Blocos
+        aninhados reutilizam a transação externa.
+        """
+        if self._active_session.get() is not None:
+            yield self._active_session.get()
+            return
+        
+        with self.get_session() as session:
+            session.autoflush = True
+            with self.use_session(session):
+                try:
+                    yield session
+                except BaseException:
+                    session.rollback()
+                    raise
+            session.commit()
+        self._last_write.set(time.monotonic())
+    
+    @contextmanager
+    def use_session(self, session: Session) -> Iterator[Session]:
+        """Executa as operações do bloco na sessão informada, sem commit"""
+        token = self._active_session.set(session)
+        try:
+            yield session
+        finally:
+            self._active_session.reset(token)
+    
     def drop_tables(self):
         """Remove todas as tabelas (USE COM CUIDADO!)"""
         Base.metadata.drop_all(bind=self.engine)
-        print("Todas as tabelas foram removidas")
+        logger.info("Todas as tabelas foram removidas")
     
     # CRUD Operations para Board
-    def create_board(self, name: str, description: str = None) -> Board:
-        """Cria um novo quadro com colunas padrão"""
-        with self.get_session() as session:
-            board = Board(name=name, description=description)
-            session.add(board)
-            session.flush()  # Para obter o ID
-            
-            # Criar colunas padrão
-            default_columns = [
-                Kcolumn(title="A Fazer", position=0, board_id=board.id),
-                Kcolumn(title="Em Progresso", position=1, board_id=board.id),
-                Kcolumn(title="Concluído", position=2, board_id=board.id)
-            ]
-            
-            for col in default_columns:
-                session.add(col)
-            
-            session.commit()
-            
-            # Fazer um refresh para carregar os relacionamentos
-            session.refresh(board)
-            # Acessar explicitamente as colunas para carregá-las na sessão
-            _ = board.kcolumns
-            
-            # Fazer expunge/merge para garantir que o objeto possa ser usado fora da sessão
-            session.expunge(board)
+    def create_board(self, name: str, description: str = None) -> BoardRecord:
+        """Cria um novo quadro com colunas padrão.
+        
+        INSERT ... RETURNING do quadro e das colunas, sem nenhuma releitura: o
+        registro retornado já traz as colunas criadas em `kcolumns`. O quadro
+        nasce na revisão 1, com a criação dele e das colunas no registro de
+        alterações.
+        """
+        with self._session_scope() as session:
+            board_row = session.execute(
+                insert(Board).values(name=name, description=description, revision=1).returning(*BOARD_FIELDS)
+            ).one()
+            # Um único INSERT com vários VALUES; a ordem do RETURNING não é
+            # garantida pelo banco, por isso as colunas são ordenadas aqui
+            column_rows = session.execute(
+                insert(Kcolumn).values([
+                    {
+                        "title": title,
+                        "position": position,
+                        "board_id": board_row.id,
+                        "is_done": position == len(DEFAULT_COLUMNS) - 1
+                    }
+                    for position, title in enumerate(DEFAULT_COLUMNS)
+                ]).returning(*COLUMN_FIELDS)
+            ).all()
+            kcolumns = sorted((ColumnRecord(*row) for row in column_rows), key=lambda column: column.position)
+            board = BoardRecord(*board_row, kcolumns=tuple(kcolumns))
             
-            # Reattach o objeto em uma nova sessão para retornar com os dados carregados
-            with self.get_session() as new_session:
-                board_with_columns = new_session.merge(board)
-                # Carregar explicitamente as colunas
-                board_with_columns.kcolumns
-                new_session.expunge(board_with_columns)
-                return board_with_columns
-    
-    def get_board(self, board_id: int) -> Optional[Board]:
-        """Busca um quadro por ID"""
-        with self.get_session() as session:
-            return session.query(Board).filter(Board.id == board_id, Board.is_active == True).first()
+            record_changes(session, [
+                Change(board.id, ENTITY_BOARD, board.id, OP_CREATE, change_fields(board, BOARD_CHANGE_FIELDS)),
+                *(
+                    Change(board.id, ENTITY_KCOLUMN, column.id, OP_CREATE,
+                           change_fields(column, KCOLUMN_CHANGE_FIELDS))
+                    for column in kcolumns
+                )
+            ], revisions={board.id: board.revision})
+            return board
     
-    def get_all_boards(self) -> List[Board]:
-        """Lista todos os quadros ativos"""
-        with self.get_session() as session:
-            return session.query(Board).filter(Board.is_active == True).all()
+    def get_board(self, board_id: int, include_archived: bool = False) -> Optional[BoardRecord]:
+        """Busca um quadro por ID; com `include_archived`, também entre os arquivados"""
+        with self._read_session_scope() as session:
+            row = session.execute(
+                select(*BOARD_FIELDS).where(Board.id == board_id, Board.is_active == True)
+            ).first()
+            if row is None and include_archived:
+                row = session.execute(
+                    select(*ARCHIVED_BOARD_FIELDS).where(ArchivedBoard.id == board_id)
+                ).first()
+            return BoardRecord(*row) if row else None
+    
+    def get_all_boards(self, include_archived: bool = False) -> List[BoardRecord]:
+        """Lista todos os quadros ativos, seguidos dos arquivados se `include_archived`"""
+        with self._read_session_scope() as session:
+            rows = session.execute(select(*BOARD_FIELDS).where(Board.is_active == True)).all()
+            if include_archived:
+                rows += session.execute(select(*ARCHIVED_BOARD_FIELDS).order_by(ArchivedBoard.id)).all()
+            return [BoardRecord(*row) for row in rows]
     
     def update_board(self, board_id: int, name: str = None, description: str = None) -> Optional[Board]:
         """Atualiza um quadro"""
-        with self.get_session() as session:
+        with self._session_scope() as session:
             board = session.query(Board).filter(Board.id == board_id).first()
             if board:
+                fields = {}
                 if name:
-                    board.name = name
+                    board.name = fields["name"] = name
                 if description is not None:
-                    board.description = description
+                    board.description = fields["description"] = description
                 board.updated_at = datetime.now()
-                session.commit()
-                session.refresh(board)
+                if fields:
+                    record_changes(session, [Change(board.id, ENTITY_BOARD, board.id, OP_UPDATE, fields)])
             return board
     
     def delete_board(self, board_id: int) -> bool:
         """Soft delete de um quadro"""
-        with self.get_session() as session:
+        with self._session_scope() as session:
             board = session.query(Board).filter(Board.id == board_id).first()
             if board:
                 board.is_active = False
                 board.updated_at = datetime.now()
-                session.commit()
+                record_changes(session, [Change(board.id, ENTITY_BOARD, board.id, OP_DELETE)])
                 return True
             return False
     
     # CRUD Operations para Kcolumn
-    def create_column(self, board_id: int, title: str, position: int = None) -> Optional[Kcolumn]:
-        """Cria uma nova coluna"""
-        with self.get_session() as session:
+    def create_column(self, board_id: int, title: str, position: int = None,
+                      is_done: bool = False) -> Optional[Kcolumn]:
+        """Cria uma nova coluna; `is_done` a marca como coluna de concluídos"""
+        with self._session_scope() as session:
             # Verificar se o board existe
             board = session.query(Board).filter(Board.id == board_id).first()
             if not board:
@@ -116,29 +367,43 @@ class KanbanRepository:
                 max_position = session.query(Kcolumn).filter(Kcolumn.board_id == board_id).count()
                 position = max_position
             
-            column = Kcolumn(title=title, position=position, board_id=board_id)
+            column = Kcolumn(title=title, position=position, board_id=board_id, is_done=is_done)
             session.add(column)
-            session.commit()
-            session.refresh(column)
+            session.flush()  # Para obter o ID
+            record_changes(session, [
+                Change(board_id, ENTITY_KCOLUMN, column.id, OP_CREATE, change_fields(column, KCOLUMN_CHANGE_FIELDS))
+            ])
             return column
     
-    def update_column(self, column_id: int, title: str = None, position: int = None) -> Optional[Kcolumn]:
+    def get_column(self, column_id: int) -> Optional[ColumnRecord]:
+        """Busca uma coluna por ID"""
+        with self._read_session_scope() as session:
+            row = session.execute(select(*COLUMN_FIELDS).where(Kcolumn.id == column_id)).first()
+            return ColumnRecord(*row) if row else None
+    
+    def update_column(self, column_id: int, title: str = None, position: int = None,
+                      is_done: bool = None) -> Optional[Kcolumn]:
         """Atualiza uma coluna"""
-        with self.get_session() as session:
+        with self._session_scope() as session:
             column = session.query(Kcolumn).filter(Kcolumn.id == column_id).first()
             if column:
+                fields = {}
                 if title:
-                    column.title = title
+                    column.title = fields["title"] = title
                 if position is not None:
-                    column.position = position
+                    column.position = fields["position"] = position
+                if is_done is not None:
+                    column.is_done = fields["is_done"] = is_done
                 column.updated_at = datetime.now()
-                session.commit()
-                session.refresh(column)
+                if fields:
+                    record_changes(session, [
+                        Change(column.board_id, ENTITY_KCOLUMN, column.id, OP_UPDATE, fields)
+                    ])
             return column
     
     def delete_column(self, column_id: int) -> bool:
         """Deleta uma coluna (apenas se não for a última do quadro)"""
-        with self.get_session() as session:
+        with self._session_scope() as session:
             column = session.query(Kcolumn).filter(Kcolumn.id == column_id).first()
             if not column:
                 return False
@@ -148,23 +413,35 @@ class KanbanRepository:
             if columns_count <= 1:
                 return False
             
+            # Os cards da coluna são removidos junto com ela
+            card_ids = session.execute(select(Card.id).where(Card.kcolumn_id == column.id)).scalars().all()
             session.delete(column)
-            session.commit()
+            record_changes(session, [Change(column.board_id, ENTITY_KCOLUMN, column.id, OP_DELETE)])
+            record_transitions(session, (
+                Transition(card_id, column.board_id, column.id, None) for card_id in card_ids
+            ))
             return True
     
     # CRUD Operations para Card
     def create_card(self, kcolumn_id: int, title: str, description: str = None, 
                    assignee: str = None, due_date: datetime = None, 
-                   priority: PriorityLevel = PriorityLevel.MEDIUM) -> Optional[Card]:
-        """Cria um novo card"""
-        with self.get_session() as session:
-            # Verificar se a coluna existe
-            column = session.query(Kcolumn).filter(Kcolumn.id == kcolumn_id).first()
-            if not column:
-                return None
+                   priority: PriorityLevel = PriorityLevel.MEDIUM,
+                   before_card_id: int = None) -> Optional[Card]:
+        """Cria um novo card no final da coluna ou antes de `before_card_id`"""
+        priority = PriorityLevel(priority or PriorityLevel.MEDIUM)
+        with self._session_scope() as session:
+            position = column_version = None
+            if before_card_id is not None:
+                placed = self._position_before(session, kcolumn_id, before_card_id)
+                if placed is None:
+                    return None
+                position, column_version = placed
             
-            # Obter a próxima posição
-            max_position = session.query(Card).filter(Card.kcolumn_id == kcolumn_id).count()
+            # Também valida a coluna e, sem `before_card_id`, reserva o final dela
+            placed = self._add_to_column(session, kcolumn_id, priority, position, column_version)
+            if placed is None:
+                return None
+            position, board_id = placed
             
             card = Card(
                 title=title,
@@ -172,110 +449,1008 @@ class KanbanRepository:
                 assignee=assignee,
                 due_date=due_date,
                 priority=priority,
-                position=max_position,
+                position=position,
                 kcolumn_id=kcolumn_id
             )
             session.add(card)
-            session.commit()
-            session.refresh(card)
+            session.flush()  # Para obter o ID
+            record_changes(session, [
+                Change(board_id, ENTITY_CARD, card.id, OP_CREATE, change_fields(card, CARD_CHANGE_FIELDS))
+            ])
+            record_transitions(session, [Transition(card.id, board_id, None, kcolumn_id)], at=card.created_at)
             return card
     
-    def update_card(self, card_id: int, **kwargs) -> Optional[Card]:
-        """Atualiza um card"""
-        with self.get_session() as session:
-            card = session.query(Card).filter(Card.id == card_id).first()
-            if card:
-                for key, value in kwargs.items():
-                    if hasattr(card, key) and value is not None:
-                        setattr(card, key, value)
-                card.updated_at = datetime.now()
-                session.commit()
-                session.refresh(card)
+    def get_card(self, card_id: int, include_archived: bool = False) -> Optional[CardRecord]:
+        """Busca um card por ID; com `include_archived`, também entre os arquivados"""
+        with self._read_session_scope() as session:
+            row = session.execute(select(*CARD_FIELDS).where(Card.id == card_id)).first()
+            if row is None and include_archived:
+                row = session.execute(select(*ARCHIVED_CARD_FIELDS).where(ArchivedCard.id == card_id)).first()
+            return CardRecord(*row) if row else None
+    
+    def update_card(self, card_id: int, expected_version: int = None, **kwargs) -> Optional[Card]:
+        """Atualiza um card.
+        
+        Com `expected_version`, levanta ConcurrencyConflictError se o card não
+        estiver mais nessa versão; sem ela, o conflito só ocorre se outra
+        transação alterar o card entre a leitura e a gravação.
+        """
+        with self._session_scope() as session:
+            row = self._card_with_board(session, card_id)
+            if row is None:
+                return None
+            
+            card, board_id = row
+            self._check_version(card, expected_version)
+            previous = (card.kcolumn_id, card.priority, card.position)
+            changed = []
+            for key, value in kwargs.items():
+                if hasattr(card, key) and key not in ("id", "version") and value is not None:
+                    setattr(card, key, value)
+                    changed.append(key)
+            if kwargs.get("priority") is not None:
+                card.priority = PriorityLevel(card.priority)
+            card.updated_at = datetime.now()
+            
+            target_board_id = board_id
+            if (card.kcolumn_id, card.priority, card.position) != previous:
+                # Em batch() a sessão usa autoflush: sem no_autoflush, os UPDATEs
+                # das colunas gravariam o card antes de _flush_versioned, e um
+                # conflito de versão escaparia como StaleDataError
+                with session.no_autoflush:
+                    self._remove_from_column(session, previous[0], previous[1], previous[2], card.id)
+                    placed = self._add_to_column(session, card.kcolumn_id, card.priority, card.position)
+                if placed is None:
+                    raise ValueError(f"Coluna inexistente: {card.kcolumn_id}")
+                target_board_id = placed[1]
+            self._flush_versioned(session, card_id)
+            if changed:
+                record_changes(session, self._card_changes(
+                    card, board_id, target_board_id, change_fields(card, changed + ["version"])
+                ))
+            record_transitions(session, [
+                Transition(card_id, target_board_id, previous[0], card.kcolumn_id)
+            ], at=card.updated_at)
             return card
     
-    def move_card(self, card_id: int, target_kcolumn_id: int, position: int = None) -> Optional[Card]:
-        """Move um card para outra coluna"""
-        with self.get_session() as session:
-            card = session.query(Card).filter(Card.id == card_id).first()
+    def move_card(self, card_id: int, target_kcolumn_id: int, position: int = None,
+                  before_card_id: int = None, expected_version: int = None) -> Optional[Card]:
+        """Move um card para outra coluna (ou dentro da mesma).
+        
+        Sem `position` nem `before_card_id` o card vai para o final da coluna de
+        destino; com `before_card_id` ele é posicionado imediatamente antes desse
+        card. Entre os cards, apenas a linha do card movido é alterada.
+        
+        Levanta ConcurrencyConflictError se o card não estiver em
+        `expected_version`, se for alterado por outra transação durante a
+        operação ou se, com `before_card_id`, a ordem da coluna de destino
+        mudar entre o cálculo da posição e a gravação.
+        """
+        with self._session_scope() as session:
+            row = self._card_with_board(session, card_id)
             target_column = session.query(Kcolumn).filter(Kcolumn.id == target_kcolumn_id).first()
             
-            if not card or not target_column:
+            if not row or not target_column:
                 return None
+            card, board_id = row
+            self._check_version(card, expected_version)
             
-            if position is None:
-                # Colocar no final da coluna de destino
-                position = session.query(Card).filter(Card.kcolumn_id == target_kcolumn_id).count()
+            column_version = None
+            if position is None and before_card_id is not None:
+                placed = self._position_before(
+                    session, target_kcolumn_id, before_card_id, exclude_card_id=card_id
+                )
+                if placed is None:
+                    return None
+                position, column_version = placed
+            
+            # Sem posição o card vai para o final da coluna de destino, reservado
+            # depois de retirá-lo da coluna de origem
+            source_kcolumn_id = card.kcolumn_id
+            self._remove_from_column(session, source_kcolumn_id, card.priority, card.position, card.id)
+            position, _ = self._add_to_column(
+                session, target_kcolumn_id, card.priority, position, column_version
+            )
             
-            card.column_id = target_kcolumn_id
+            card.kcolumn_id = target_kcolumn_id
             card.position = position
             card.updated_at = datetime.now()
-            session.commit()
-            session.refresh(card)
+            self._flush_versioned(session, card_id)
+            record_changes(session, self._card_changes(
+                card, board_id, target_column.board_id,
+                change_fields(card, ("kcolumn_id", "position", "version"))
+            ))
+            record_transitions(session, [
+                Transition(card_id, target_column.board_id, source_kcolumn_id, target_kcolumn_id)
+            ], at=card.updated_at)
             return card
     
-    def delete_card(self, card_id: int) -> bool:
-        """Deleta um card"""
-        with self.get_session() as session:
-            card = session.query(Card).filter(Card.id == card_id).first()
-            if card:
+    def delete_card(self, card_id: int, expected_version: int = None) -> bool:
+        """Deleta um card (ver update_card quanto a `expected_version`)"""
+        with self._session_scope() as session:
+            row = self._card_with_board(session, card_id)
+            if row:
+                card, board_id = row
+                self._check_version(card, expected_version)
+                kcolumn_id = card.kcolumn_id
+                self._remove_from_column(session, kcolumn_id, card.priority, card.position, card.id)
                 session.delete(card)
-                session.commit()
+                self._flush_versioned(session, card_id)
+                record_changes(session, [Change(board_id, ENTITY_CARD, card_id, OP_DELETE)])
+                record_transitions(session, [Transition(card_id, board_id, kcolumn_id, None)])
                 return True
             return False
     
-    def get_board_with_data(self, board_id: int) -> Optional[dict]:
-        """Retorna um quadro completo com colunas e cards"""
-        with self.get_session() as session:
-            board = session.query(Board).filter(
-                Board.id == board_id, 
-                Board.is_active == True
+    @staticmethod
+    def _card_with_board(session: Session, card_id: int) -> Optional[Tuple[Card, int]]:
+        """O card e o ID do quadro dele, em uma única consulta"""
+        return session.query(Card, Kcolumn.board_id).join(
+            Kcolumn, Kcolumn.id == Card.kcolumn_id
+        ).filter(Card.id == card_id).first()
+    
+    @staticmethod
+    def _check_version(card: Card, expected_version: Optional[int]) -> None:
+        if expected_version is not None and card.version != expected_version:
+            raise ConcurrencyConflictError(ENTITY_CARD, card.id, expected_version, card.version)
+    
+    @staticmethod
+    def _flush_versioned(session: Session, card_id: int) -> None:
+        """Grava o card comparando a versão lida; se outra transação o alterou
+        nesse meio-tempo, nenhuma linha é afetada e o conflito é levantado"""
+        try:
+            session.flush()
+        except StaleDataError as error:
+            raise ConcurrencyConflictError(ENTITY_CARD, card_id) from error
+    
+    @staticmethod
+    def _expire_cards(session: Session, card_ids: Iterable[int]) -> None:
+        """Descarta posição, coluna e versão em memória dos cards já carregados
+        na sessão, alterados por UPDATEs feitos fora do ORM"""
+        for card_id in card_ids:
+            card = session.identity_map.get(identity_key(Card, card_id))
+            if card is not None:
+                session.expire(card, ["kcolumn_id", "position", "updated_at", "version"])
+    
+    @staticmethod
+    def _card_changes(card, board_id: int, target_board_id: int, fields: dict) -> List[Change]:
+        """Alterações de um card que pode ter mudado de quadro: para cada quadro
+        ele sai (exclusão) ou entra (criação com todos os campos)"""
+        if board_id == target_board_id:
+            return [Change(board_id, ENTITY_CARD, card.id, OP_UPDATE, fields)]
+        return [
+            Change(board_id, ENTITY_CARD, card.id, OP_DELETE),
+            Change(target_board_id, ENTITY_CARD, card.id, OP_CREATE, change_fields(card, CARD_CHANGE_FIELDS))
+        ]
+    
+    # Operações em lote para Card
+    def bulk_create_cards(self, cards: Iterable[dict], batch_size: int = CARD_BATCH_SIZE) -> List[int]:
+        """Cria cards em lote a partir de dicionários com os campos de create_card.
+        
+        A entrada é consumida em lotes de `batch_size`; cada lote valida suas
+        colunas com uma única consulta, insere tudo com um executemany e faz um
+        único commit. Os cards de cada coluna são anexados ao final, na ordem da
+        entrada. Levanta ValueError se um lote referenciar colunas inexistentes
+        (lotes anteriores permanecem gravados). Retorna os IDs criados.
+        """
+        created_ids = []
+        for batch in batched(cards, batch_size):
+            with self._session_scope() as session:
+                tails, board_ids = self._column_tails(session, {card["kcolumn_id"] for card in batch})
+                
+                rows = []
+                for card in batch:
+                    kcolumn_id = card["kcolumn_id"]
+                    tails[kcolumn_id] += POSITION_GAP
+                    rows.append({
+                        "title": card["title"],
+                        "description": card.get("description"),
+                        "assignee": card.get("assignee"),
+                        "due_date": card.get("due_date"),
+                        "priority": PriorityLevel(card.get("priority") or PriorityLevel.MEDIUM),
+                        "position": tails[kcolumn_id],
+                        "kcolumn_id": kcolumn_id
+                    })
+                
+                # Sem sort_by_parameter_order, que no SQLite faz um INSERT por
+                # linha, a ordem do RETURNING não é garantida: as linhas
+                # voltam à ordem da entrada por (coluna, posição), única no lote
+                inserted = {
+                    (row.kcolumn_id, row.position): CardRecord(*row)
+                    for row in session.execute(insert(Card).returning(*CARD_FIELDS), rows)
+                }
+                created = [inserted[row["kcolumn_id"], row["position"]] for row in rows]
+                created_ids.extend(card.id for card in created)
+                
+                deltas = {kcolumn_id: {} for kcolumn_id in tails}
+                for row in rows:
+                    counts = deltas[row["kcolumn_id"]]
+                    counts[row["priority"]] = counts.get(row["priority"], 0) + 1
+                self._apply_column_changes(session, deltas)
+                record_changes(session, (
+                    Change(board_ids[card.kcolumn_id], ENTITY_CARD, card.id, OP_CREATE,
+                           change_fields(card, CARD_CHANGE_FIELDS))
+                    for card in created
+                ))
+                record_transitions(session, (
+                    Transition(card.id, board_ids[card.kcolumn_id], None, card.kcolumn_id) for card in created
+                ), at=created[0].created_at)
+                session.flush()
+        return created_ids
+    
+    def bulk_move_cards(self, moves: Iterable[Tuple[int, int]], batch_size: int = CARD_BATCH_SIZE) -> int:
+        """Move cards em lote a partir de pares (card_id, target_kcolumn_id).
+        
+        Cada lote valida cards e colunas com uma consulta para cada, anexa os
+        cards ao final das colunas de destino com um executemany e faz um único
+        commit. A versão de cada card movido é incrementada, sem comparação.
+        Levanta ValueError para IDs inexistentes. Retorna o total movido.
+        """
+        moved = 0
+        for batch in batched(moves, batch_size):
+            with self._session_scope() as session:
+                card_ids = {card_id for card_id, _ in batch}
+                current = {
+                    row.id: CardRecord(*row)
+                    for row in session.execute(select(*CARD_FIELDS).where(Card.id.in_(card_ids)))
+                }
+                missing = card_ids - current.keys()
+                if missing:
+                    raise ValueError(f"Cards inexistentes: {sorted(missing)}")
+                
+                # Colunas de origem entram na consulta para obter seus quadros
+                tails, board_ids = self._column_tails(
+                    session,
+                    {kcolumn_id for _, kcolumn_id in batch} | {card.kcolumn_id for card in current.values()}
+                )
+                deltas = {}
+                changes = []
+                transitions = []
+                now = datetime.now()
+                rows = []
+                for card_id, kcolumn_id in batch:
+                    card = current[card_id]
+                    source = deltas.setdefault(card.kcolumn_id, {})
+                    source[card.priority] = source.get(card.priority, 0) - 1
+                    target = deltas.setdefault(kcolumn_id, {})
+                    target[card.priority] = target.get(card.priority, 0) + 1
+                    
+                    tails[kcolumn_id] += POSITION_GAP
+                    moved_card = current[card_id] = card._replace(
+                        kcolumn_id=kcolumn_id, position=tails[kcolumn_id], updated_at=now,
+                        version=card.version + 1
+                    )
+                    changes.extend(self._card_changes(
+                        moved_card, board_ids[card.kcolumn_id], board_ids[kcolumn_id],
+                        change_fields(moved_card, ("kcolumn_id", "position", "version"))
+                    ))
+                    transitions.append(Transition(card_id, board_ids[kcolumn_id], card.kcolumn_id, kcolumn_id))
+                    rows.append({
+                        "card_id": card_id,
+                        "target_kcolumn_id": kcolumn_id,
+                        "new_position": tails[kcolumn_id]
+                    })
+                
+                session.execute(
+                    update(cards_table).where(cards_table.c.id == bindparam("card_id")).values(
+                        kcolumn_id=bindparam("target_kcolumn_id"),
+                        position=bindparam("new_position"),
+                        updated_at=now,
+                        version=cards_table.c.version + 1
+                    ),
+                    rows
+                )
+                self._expire_cards(session, card_ids)
+                self._apply_column_changes(session, deltas)
+                record_changes(session, changes)
+                record_transitions(session, transitions, at=now)
+                session.flush()
+                moved += len(rows)
+        return moved
+    
+    def iter_board_cards(self, board_id: int, batch_size: int = CARD_BATCH_SIZE) -> Iterator[dict]:
+        """Percorre os cards de um quadro ativo sem carregá-lo inteiro na memória.
+        
+        Os cards são lidos do cursor em blocos de `batch_size`, ordenados por
+        coluna e posição, e cada um traz o ID e o título da sua coluna.
+        """
+        statement = self._board_cards_statement(board_id).execution_options(yield_per=batch_size)
+        with self._read_session_scope() as session:
+            for row in session.execute(statement):
+                yield self._export_row(row)
+    
+    @staticmethod
+    def _board_cards_statement(board_id: int):
+        return select(
+            Kcolumn.id.label("kcolumn_id"),
+            Kcolumn.title.label("kcolumn_title"),
+            Card.id,
+            Card.uuid,
+            Card.title,
+            Card.description,
+            Card.assignee,
+            Card.due_date,
+            Card.priority,
+            Card.position,
+            Card.created_at
+        ).join(
+            Card, Card.kcolumn_id == Kcolumn.id
+        ).join(
+            Board, Board.id == Kcolumn.board_id
+        ).where(
+            Board.id == board_id,
+            Board.is_active == True
+        ).order_by(
+            Kcolumn.position, Kcolumn.id, Card.position, Card.id
+        )
+    
+    @staticmethod
+    def _export_row(row: Row) -> dict:
+        card_data = row._asdict()
+        card_data["priority"] = row.priority.value
+        return card_data
+    
+    @staticmethod
+    def _column_tails(session: Session, kcolumn_ids: set) -> Tuple[Dict[int, int], Dict[int, int]]:
+        """Valida as colunas e retorna a última posição ocupada e o quadro de cada uma.
+        
+        Lê apenas max_position e board_id das colunas; levanta ValueError se
+        alguma não existir.
+        """
+        rows = session.query(Kcolumn.id, Kcolumn.max_position, Kcolumn.board_id).filter(
+            Kcolumn.id.in_(kcolumn_ids)
+        ).all()
+        
+        tails = {kcolumn_id: max_position or 0 for kcolumn_id, max_position, _ in rows}
+        missing = kcolumn_ids - tails.keys()
+        if missing:
+            raise ValueError(f"Colunas inexistentes: {sorted(missing)}")
+        return tails, {kcolumn_id: board_id for kcolumn_id, _, board_id in rows}
+    
+    def rebalance_column(self, kcolumn_id: int) -> int:
+        """Redistribui as posições dos cards da coluna com espaçamento POSITION_GAP.
+        
+        Chamado automaticamente quando não há mais espaço entre dois cards
+        vizinhos; pode ser executado sob demanda (ex.: em manutenção) para
+        restaurar os intervalos. Retorna o número de cards renumerados.
+        """
+        with self._session_scope() as session:
+            column_version = session.query(Kcolumn.version).filter(Kcolumn.id == kcolumn_id).scalar()
+            if column_version is None:
+                return 0
+            renumbered = self._rebalance_column(session, kcolumn_id, column_version)
+            session.flush()
+            return renumbered
+    
+    # Posicionamento de cards por intervalos esparsos
+    # Manutenção dos agregados por coluna (ver aggregates.py)
+    @staticmethod
+    def _add_to_column(session: Session, kcolumn_id: int, priority: PriorityLevel,
+                       position: int = None, column_version: int = None) -> Optional[Tuple[int, int]]:
+        """Contabiliza um card que entra na coluna e retorna a posição dele e o
+        quadro da coluna.
+        
+        Sem `position`, o próprio UPDATE reserva o final da coluna a partir de
+        max_position, sem COUNT nem MAX sobre os cards. Uma posição explícita
+        incrementa a versão da coluna; com `column_version` (a versão lida ao
+        calcular a posição), o UPDATE só é aplicado se ela não tiver mudado,
+        senão levanta ConcurrencyConflictError. Retorna None se a coluna não
+        existir.
+        """
+        values = {}
+        statement = update(kcolumns).where(kcolumns.c.id == kcolumn_id)
+        if position is None:
+            values["max_position"] = func.coalesce(kcolumns.c.max_position, 0) + POSITION_GAP
+        else:
+            values["max_position"] = case(
+                (or_(kcolumns.c.max_position.is_(None), kcolumns.c.max_position < position), position),
+                else_=kcolumns.c.max_position
+            )
+            values["version"] = kcolumns.c.version + 1
+            if column_version is not None:
+                statement = statement.where(kcolumns.c.version == column_version)
+        count = PRIORITY_COUNTS[PriorityLevel(priority)].key
+        row = session.execute(
+            statement.values({
+                "card_count": kcolumns.c.card_count + 1,
+                count: kcolumns.c[count] + 1,
+                **values
+            }).returning(kcolumns.c.max_position, kcolumns.c.board_id)
+        ).first()
+        expire_columns(session, [kcolumn_id])
+        if row is None:
+            if column_version is not None:
+                raise ConcurrencyConflictError(ENTITY_KCOLUMN, kcolumn_id, column_version)
+            return None
+        reserved, board_id = row
+        return (reserved if position is None else position), board_id
+    
+    @staticmethod
+    def _remove_from_column(session: Session, kcolumn_id: int, priority: PriorityLevel,
+                            position: int, card_id: int) -> None:
+        """Contabiliza a saída de um card; max_position só é recalculado (pelo
+        índice) quando o card ocupava o final da coluna"""
+        count = PRIORITY_COUNTS[PriorityLevel(priority)].key
+        remaining = select(func.max(Card.position)).where(
+            Card.kcolumn_id == kcolumn_id,
+            Card.id != card_id
+        ).scalar_subquery()
+        session.execute(
+            update(kcolumns).where(kcolumns.c.id == kcolumn_id).values({
+                "card_count": kcolumns.c.card_count - 1,
+                count: kcolumns.c[count] - 1,
+                "max_position": case(
+                    (kcolumns.c.max_position <= position, remaining),
+                    else_=kcolumns.c.max_position
+                )
+            })
+        )
+        expire_columns(session, [kcolumn_id])
+    
+    @staticmethod
+    def _apply_column_changes(session: Session, deltas: Dict[int, Dict[PriorityLevel, int]]) -> None:
+        """Aplica as variações de contagem de uma operação em lote e recalcula
+        max_position das colunas envolvidas"""
+        connection = session.connection()
+        apply_count_deltas(connection, deltas)
+        refresh_max_positions(connection, deltas.keys())
+        expire_columns(session, deltas.keys())
+    
+    def _position_before(self, session: Session, kcolumn_id: int, before_card_id: int,
+                         exclude_card_id: int = None) -> Optional[Tuple[int, int]]:
+        """Posição entre `before_card_id` e seu antecessor na coluna, e a versão
+        da coluna em que ela foi calculada (ver _add_to_column).
+        
+        Retorna None se o card de referência não estiver na coluna. Quando os
+        vizinhos são consecutivos, a coluna é rebalanceada antes do cálculo.
+        """
+        for _ in range(2):
+            # A versão é lida junto com a primeira consulta: qualquer alteração
+            # posterior na ordem da coluna a incrementa
+            row = session.query(Card.position, Kcolumn.version).join(
+                Kcolumn, Kcolumn.id == Card.kcolumn_id
+            ).filter(
+                Card.id == before_card_id,
+                Card.kcolumn_id == kcolumn_id
             ).first()
-            
-            if not board:
+            if row is None:
                 return None
+            anchor, column_version = row
+            
+            query = session.query(func.max(Card.position)).filter(
+                Card.kcolumn_id == kcolumn_id,
+                Card.position < anchor
+            )
+            if exclude_card_id is not None:
+                query = query.filter(Card.id != exclude_card_id)
+            previous = query.scalar()
+            
+            if previous is None:
+                return anchor - POSITION_GAP, column_version
+            if anchor - previous > 1 and not self._has_position_ties(session, kcolumn_id, anchor):
+                return (previous + anchor) // 2, column_version
+            
+            self._rebalance_column(session, kcolumn_id, column_version)
+        raise RuntimeError(f"Não foi possível posicionar o card na coluna {kcolumn_id}")
+    
+    @staticmethod
+    def _has_position_ties(session: Session, kcolumn_id: int, position: int) -> bool:
+        """Indica se há mais de um card ocupando a mesma posição na coluna"""
+        return session.query(Card.id).filter(
+            Card.kcolumn_id == kcolumn_id,
+            Card.position == position
+        ).limit(2).count() > 1
+    
+    def _rebalance_column(self, session: Session, kcolumn_id: int, column_version: int) -> int:
+        """Renumera os cards da coluna, desde que a versão dela ainda seja
+        `column_version` (lida antes dos cards); senão levanta
+        ConcurrencyConflictError sem alterar nada"""
+        board_id = session.execute(
+            update(kcolumns).where(
+                kcolumns.c.id == kcolumn_id,
+                kcolumns.c.version == column_version
+            ).values(version=kcolumns.c.version + 1).returning(kcolumns.c.board_id)
+        ).scalar()
+        expire_columns(session, [kcolumn_id])
+        if board_id is None:
+            raise ConcurrencyConflictError(ENTITY_KCOLUMN, kcolumn_id, column_version)
+        
+        rows = session.query(Card.id, Card.position, Card.version).filter(
+            Card.kcolumn_id == kcolumn_id
+        ).order_by(Card.position, Card.id).all()
+        
+        changes = [
+            {"card_id": card_id, "new_position": (index + 1) * POSITION_GAP, "version": version + 1}
+            for index, (card_id, position, version) in enumerate(rows)
+            if position != (index + 1) * POSITION_GAP
+        ]
+        if changes:
+            session.execute(
+                update(cards_table).where(
+                    cards_table.c.id == bindparam("card_id"),
+                    cards_table.c.kcolumn_id == kcolumn_id
+                ).values(position=bindparam("new_position"), version=cards_table.c.version + 1),
+                [{"card_id": change["card_id"], "new_position": change["new_position"]} for change in changes]
+            )
+            self._expire_cards(session, (change["card_id"] for change in changes))
+        refresh_max_positions(session.connection(), [kcolumn_id])
+        expire_columns(session, [kcolumn_id])
+        record_changes(session, (
+            Change(board_id, ENTITY_CARD, change["card_id"], OP_UPDATE,
+                   {"position": change["new_position"], "version": change["version"]})
+            for change in changes
+        ))
+        return len(changes)
+    
+    # Listagens paginadas por cursor (keyset)
+    def list_boards(self, limit: int = PAGE_SIZE, cursor: str = None) -> Page:
+        """Lista quadros ativos em ordem de ID, uma página por chamada"""
+        check_limit(limit)
+        with self._read_session_scope() as session:
+            query = select(*BOARD_FIELDS).where(Board.is_active == True)
+            if cursor is not None:
+                last_id, = decode_cursor(cursor)
+                query = query.where(Board.id > last_id)
+            rows = session.execute(query.order_by(Board.id).limit(limit + 1))
+            return self._page([BoardRecord(*row) for row in rows], limit)
+    
+    def list_cards(self, assignee: str = None, priority: PriorityLevel = None,
+                   due_after: datetime = None, due_before: datetime = None,
+                   kcolumn_id: int = None, board_id: int = None,
+                   limit: int = PAGE_SIZE, cursor: str = None) -> Page:
+        """Lista cards de quadros ativos em ordem de ID, com filtros opcionais.
+        
+        `due_after` é inclusivo e `due_before` exclusivo; por exemplo, cards
+        vencidos de alta prioridade:
+        `list_cards(priority=PriorityLevel.HIGH, due_before=datetime.now())`.
+        """
+        check_limit(limit)
+        with self._read_session_scope() as session:
+            query = select(*CARD_FIELDS).join(
+                Kcolumn, Kcolumn.id == Card.kcolumn_id
+            ).join(
+                Board, Board.id == Kcolumn.board_id
+            ).where(Board.is_active == True)
+            
+            if assignee is not None:
+                query = query.where(Card.assignee == assignee)
+            if priority is not None:
+                query = query.where(Card.priority == PriorityLevel(priority))
+            if due_after is not None:
+                query = query.where(Card.due_date >= due_after)
+            if due_before is not None:
+                query = query.where(Card.due_date < due_before)
+            if kcolumn_id is not None:
+                query = query.where(Card.kcolumn_id == kcolumn_id)
+            if board_id is not None:
+                query = query.where(Kcolumn.board_id == board_id)
+            if cursor is not None:
+                last_id, = decode_cursor(cursor)
+                query = query.where(Card.id > last_id)
+            
+            rows = session.execute(query.order_by(Card.id).limit(limit + 1))
+            return self._page([CardRecord(*row) for row in rows], limit)
+    
+    def iter_cards(self, batch_size: int = PAGE_SIZE, **filters) -> Iterator[CardRecord]:
+        """Percorre todos os cards que atendem aos filtros de list_cards,
+        buscando uma página por vez sob demanda"""
+        cursor = None
+        while True:
+            page = self.list_cards(limit=batch_size, cursor=cursor, **filters)
+            yield from page.items
+            if page.next_cursor is None:
+                return
+            cursor = page.next_cursor
+    
+    def search_cards(self, query: str, board_id: int = None,
+                     limit: int = PAGE_SIZE, cursor: str = None) -> Page:
+        """Busca textual em título e descrição dos cards de quadros ativos.
+        
+        Os resultados vêm do índice de busca do banco (FTS5 no SQLite, tsvector
+        com GIN no PostgreSQL), ordenados por relevância; todas as palavras
+        precisam aparecer e a última é tratada como prefixo.
+        """
+        check_limit(limit)
+        if not search_terms(query):
+            return Page([], None)
+        
+        with self._read_session_scope() as session:
+            search, rank = search_query(session, query, *CARD_FIELDS)
+            search = search.join(
+                Kcolumn, Kcolumn.id == Card.kcolumn_id
+            ).join(
+                Board, Board.id == Kcolumn.board_id
+            ).filter(Board.is_active == True)
             
-            # Buscar colunas ordenadas por posição
-            kcolumns = session.query(Kcolumn).filter(
-                Kcolumn.board_id == board_id
-            ).order_by(Kcolumn.position).all()
+            if board_id is not None:
+                search = search.filter(Kcolumn.board_id == board_id)
+            if cursor is not None:
+                last_rank, last_id = decode_cursor(cursor)
+                search = search.filter(or_(
+                    rank > last_rank,
+                    and_(rank == last_rank, Card.id > last_id)
+                ))
             
-            board_data = {
-                "id": board.id,
-                "uuid": board.uuid,
-                "name": board.name,
-                "description": board.description,
-                "created_at": board.created_at,
-                "columns": []
-            }
+            rows = search.order_by(rank, Card.id).limit(limit + 1).all()
+            cards = [CardRecord(*row[:-1]) for row in rows[:limit]]
+            if len(rows) <= limit:
+                return Page(cards, None)
+            return Page(cards, encode_cursor(rows[limit - 1][-1], cards[-1].id))
+    
+    @staticmethod
+    def _page(rows: list, limit: int) -> Page:
+        # Uma linha a mais que o limite indica que existe próxima página
+        if len(rows) <= limit:
+            return Page(rows, None)
+        rows = rows[:limit]
+        return Page(rows, encode_cursor(rows[-1].id))
+    
+    # Localização do quadro dono de colunas e cards
+    def get_board_ids_for_columns(self, kcolumn_ids: Iterable[int]) -> Set[int]:
+        """Retorna os IDs dos quadros que contêm as colunas informadas"""
+        with self._read_session_scope(primary=True) as session:
+            rows = session.query(Kcolumn.board_id).filter(Kcolumn.id.in_(set(kcolumn_ids))).distinct()
+            return {board_id for board_id, in rows}
+    
+    def get_board_ids_for_cards(self, card_ids: Iterable[int]) -> Set[int]:
+        """Retorna os IDs dos quadros que contêm os cards informados"""
+        with self._read_session_scope(primary=True) as session:
+            rows = session.query(Kcolumn.board_id).join(
+                Card, Card.kcolumn_id == Kcolumn.id
+            ).filter(Card.id.in_(set(card_ids))).distinct()
+            return {board_id for board_id, in rows}
+    
+    # Resumo do quadro a partir dos agregados por coluna
+    def get_board_summary(self, board_id: int) -> Optional[dict]:
+        """Totais de cards do quadro e de cada coluna, por prioridade e vencidos.
+        
+        Uma única consulta sobre as colunas do quadro: as contagens vêm dos
+        agregados armazenados e os vencidos de uma contagem pelo índice
+        (kcolumn_id, due_date). Retorna None se o quadro não existir ou estiver
+        inativo.
+        """
+        overdue = select(func.count(Card.id)).where(
+            Card.kcolumn_id == Kcolumn.id,
+            Card.due_date < datetime.now()
+        ).scalar_subquery()
+        
+        with self._read_session_scope() as session:
+            rows = session.execute(select(
+                Kcolumn.id, Kcolumn.title, Kcolumn.position, *COUNT_COLUMNS, overdue
+            ).join(
+                Board, Board.id == Kcolumn.board_id
+            ).where(
+                Board.id == board_id,
+                Board.is_active == True
+            ).order_by(Kcolumn.position, Kcolumn.id)).all()
+        if not rows:
+            return None
+        
+        columns = []
+        for kcolumn_id, title, position, card_count, *priority_counts, overdue_count in rows:
+            columns.append({
+                "id": kcolumn_id,
+                "title": title,
+                "position": position,
+                "card_count": card_count,
+                "priority_counts": {
+                    priority.value: count for priority, count in zip(PRIORITY_COUNTS, priority_counts)
+                },
+                "overdue_count": overdue_count
+            })
+        return {
+            "board_id": board_id,
+            "card_count": sum(column["card_count"] for column in columns),
+            "priority_counts": {
+                priority.value: sum(column["priority_counts"][priority.value] for column in columns)
+                for priority in PRIORITY_COUNTS
+            },
+            "overdue_count": sum(column["overdue_count"] for column in columns),
+            "columns": columns
+        }
+    
+    def verify_aggregates(self, board_id: int = None, repair: bool = False) -> List[int]:
+        """Compara os agregados das colunas com os cards e retorna os IDs das
+        colunas divergentes (de um quadro ou de todos); com `repair=True`
+        recalcula os valores dessas colunas na mesma transação"""
+        with (self._session_scope() if repair else self._read_session_scope(primary=True)) as session:
+            connection = session.connection()
+            drifted = find_drift(connection, board_id)
+            if drifted and repair:
+                recompute(connection, drifted)
+                expire_columns(session, drifted)
+            return drifted
+    
+    # Registro de alterações para sincronização incremental (ver changes.py)
+    def get_board_changes(self, board_id: int, since_revision: int = 0) -> Optional[dict]:
+        """Alterações do quadro posteriores a `since_revision`.
+        
+        Retorna {"board_id", "revision", "reset", "changes"}, com um item por
+        entidade alterada ({"revision", "entity", "id", "op", "fields"}) na ordem
+        da última alteração; `revision` é a revisão atual, a ser usada na
+        próxima chamada. `reset=True` indica que parte do intervalo já foi podada
+        e o quadro deve ser recarregado com get_board_with_data. Retorna None se
+        o quadro não existir.
+        """
+        with self._read_session_scope() as session:
+            return get_changes(session, board_id, since_revision)
+    
+    def prune_board_changes(self, older_than: timedelta = CHANGE_RETENTION) -> int:
+        """Remove do registro as alterações mais antigas que `older_than`"""
+        with self._session_scope() as session:
+            return prune_changes(session, datetime.now() - older_than)
+    
+    # Métricas de fluxo (ver analytics.py)
+    def get_cycle_times(self, board_id: int, since: datetime = None, until: datetime = None,
+                        percentiles: Sequence[float] = CYCLE_TIME_PERCENTILES) -> Optional[dict]:
+        """Lead time e tempo de ciclo, em segundos, dos cards concluídos no
+        quadro em [since, until): contagem, média e percentis ("p50", "p85"...).
+        Retorna None se o quadro não existir ou estiver inativo."""
+        with self._read_session_scope() as session:
+            if not self._is_active_board(session, board_id):
+                return None
+            return {"board_id": board_id, **cycle_times(session, board_id, since, until, percentiles)}
+    
+    def get_throughput(self, board_id: int, period: str = "week", since: datetime = None,
+                       until: datetime = None) -> Optional[List[dict]]:
+        """Cards concluídos por dia, semana (a partir da segunda-feira) ou mês,
+        como {"period_start", "count"} em ordem cronológica; períodos sem
+        conclusões são omitidos. Retorna None se o quadro não estiver ativo."""
+        with self._read_session_scope() as session:
+            if not self._is_active_board(session, board_id):
+                return None
+            return throughput(session, board_id, period, since, until)
+    
+    def get_wip(self, board_id: int, at: datetime = None) -> Optional[List[dict]]:
+        """Cards em cada coluna atual do quadro no instante `at`, em ordem de
+        posição; sem `at`, o WIP atual vem dos agregados das colunas, sem
+        consultar o histórico. Retorna None se o quadro não estiver ativo."""
+        with self._read_session_scope() as session:
+            columns = session.execute(
+                select(Kcolumn.id, Kcolumn.title, Kcolumn.position, Kcolumn.is_done, Kcolumn.card_count).join(
+                    Board, Board.id == Kcolumn.board_id
+                ).where(
+                    Board.id == board_id,
+                    Board.is_active == True
+                ).order_by(Kcolumn.position, Kcolumn.id)
+            ).all()
+            if not columns:
+                return None
+            counts = None if at is None else wip(session, board_id, at)
+        return [
+            {"id": kcolumn_id, "title": title, "position": position, "is_done": is_done,
+             "wip": card_count if counts is None else counts.get(kcolumn_id, 0)}
+            for kcolumn_id, title, position, is_done, card_count in columns
+        ]
+    
+    @staticmethod
+    def _is_active_board(session: Session, board_id: int) -> bool:
+        return session.execute(
+            select(Board.id).where(Board.id == board_id, Board.is_active == True)
+        ).first() is not None
+    
+    # Arquivamento (ver archive.py)
+    def archive_boards(self, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+        """Move os quadros inativos, com colunas e cards, para as tabelas de arquivo.
+        
+        Processa até `batch_size` quadros por transação, até não restar nenhum
+        inativo. Retorna o número de quadros arquivados.
+        """
+        archived = 0
+        while True:
+            count = self._archive_boards_batch(batch_size)
+            if not count:
+                return archived
+            archived += count
+    
+    def _archive_boards_batch(self, batch_size: int) -> int:
+        """Arquiva, em uma transação, até `batch_size` quadros inativos"""
+        with self._session_scope() as session:
+            board_ids = list(session.execute(
+                select(Board.id).where(Board.is_active == False).order_by(Board.id).limit(batch_size)
+            ).scalars())
+            if board_ids:
+                archive_boards(session, board_ids)
+            return len(board_ids)
+    
+    def archive_done_cards(self, older_than_days: int = DONE_CARD_RETENTION_DAYS,
+                           batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+        """Move para `archived_cards` os cards de colunas de concluídos (is_done)
+        sem alterações há mais de `older_than_days` dias.
+        
+        A última alteração (updated_at) inclui a entrada na coluna, de modo que
+        o card fica pelo menos esse período entre os concluídos. Cada lote de
+        `batch_size` cards é uma transação, que ajusta os agregados das colunas
+        e registra a exclusão dos cards no registro de alterações. Retorna o
+        número de cards arquivados.
+        """
+        cutoff = datetime.now() - timedelta(days=older_than_days)
+        archived = 0
+        while True:
+            count = self._archive_done_cards_batch(cutoff, batch_size)
+            if not count:
+                return archived
+            archived += count
+    
+    def _archive_done_cards_batch(self, cutoff: datetime, batch_size: int) -> int:
+        """Arquiva, em uma transação, até `batch_size` cards concluídos sem
+        alterações desde `cutoff`"""
+        with self._session_scope() as session:
+            rows = session.execute(
+                select(Card.id, Card.kcolumn_id, Card.priority, Kcolumn.board_id).join(
+                    Kcolumn, Kcolumn.id == Card.kcolumn_id
+                ).where(
+                    Kcolumn.is_done == True,
+                    Card.updated_at < cutoff
+                ).order_by(Card.id).limit(batch_size)
+            ).all()
+            if not rows:
+                return 0
             
-            for kcolumn in kcolumns:
-                # Buscar cards da coluna ordenados por posição
-                cards = session.query(Card).filter(
-                    Card.kcolumn_id == kcolumn.id
-                ).order_by(Card.position).all()
+            archive_cards(session, [row.id for row in rows])
+            deltas = {}
+            for row in rows:
+                counts = deltas.setdefault(row.kcolumn_id, {})
+                counts[row.priority] = counts.get(row.priority, 0) - 1
+            self._apply_column_changes(session, deltas)
+            record_changes(session, (Change(row.board_id, ENTITY_CARD, row.id, OP_DELETE) for row in rows))
+            # A saída do quadro entra no histórico (a conclusão continua nas
+            # métricas), e o WIP deixa de contar os cards arquivados
+            record_transitions(session, (
+                Transition(row.id, row.board_id, row.kcolumn_id, None) for row in rows
+            ))
+            return len(rows)
+    
+    def restore_board(self, board_id: int) -> Optional[BoardRecord]:
+        """Devolve um quadro arquivado, com colunas e cards, às tabelas
+        principais como quadro ativo. Retorna None se ele não estiver arquivado."""
+        with self._session_scope() as session:
+            exists = session.execute(select(ArchivedBoard.id).where(ArchivedBoard.id == board_id)).first()
+            if exists is None:
+                return None
+            kcolumn_ids = restore_board(session, board_id)
+            recompute(session.connection(), kcolumn_ids)
+            # Os cards restaurados voltam a contar no WIP a partir de agora
+            restored = session.execute(
+                select(Card.id, Card.kcolumn_id).where(Card.kcolumn_id.in_(kcolumn_ids))
+            ).all()
+            record_transitions(session, (
+                Transition(card_id, board_id, None, kcolumn_id) for card_id, kcolumn_id in restored
+            ))
+            row = session.execute(select(*BOARD_FIELDS).where(Board.id == board_id)).one()
+            return BoardRecord(*row)
+    
+    def get_board_with_data(self, board_id: int, include_archived: bool = False) -> Optional[dict]:
+        """Retorna um quadro completo com colunas e cards.
+        
+        Com `include_archived`, o quadro e cada card trazem "archived"; os cards
+        arquivados entram nas suas colunas, na ordem de posição, e um quadro
+        arquivado é montado a partir das tabelas de arquivo.
+        """
+        if not include_archived:
+            return self.get_boards_with_data([board_id]).get(board_id)
+        
+        with self._read_session_scope() as session, self.use_session(session):
+            board_data = self.get_boards_with_data([board_id]).get(board_id)
+            archived = board_data is None
+            if archived:
+                board_data = self._archived_board_data(session, board_id)
+                if board_data is None:
+                    return None
+            board_data["archived"] = archived
+            
+            columns = {kcolumn_data["id"]: kcolumn_data for kcolumn_data in board_data["columns"]}
+            for kcolumn_data in columns.values():
+                for card_data in kcolumn_data["cards"]:
+                    card_data["archived"] = False
+            rows = session.execute(select(*ARCHIVED_CARD_FIELDS).where(ArchivedCard.board_id == board_id))
+            for row in rows:
+                kcolumn_data = columns.get(row.kcolumn_id)
+                if kcolumn_data is not None:
+                    kcolumn_data["cards"].append({**self._card_to_dict(CardRecord(*row)), "archived": True})
+            for kcolumn_data in columns.values():
+                kcolumn_data["cards"].sort(key=lambda card_data: (card_data["position"], card_data["id"]))
+            return board_data
+    
+    def _archived_board_data(self, session: Session, board_id: int) -> Optional[dict]:
+        """Quadro arquivado e suas colunas, no formato de get_board_with_data (sem cards)"""
+        row = session.execute(select(*ARCHIVED_BOARD_FIELDS).where(ArchivedBoard.id == board_id)).first()
+        if row is None:
+            return None
+        board_data = self._board_to_dict(BoardRecord(*row))
+        for row in session.execute(
+            select(*ARCHIVED_COLUMN_FIELDS).where(
+                ArchivedKcolumn.board_id == board_id
+            ).order_by(ArchivedKcolumn.position, ArchivedKcolumn.id)
+        ):
+            board_data["columns"].append(self._kcolumn_to_dict(ColumnRecord(*row)))
+        return board_data
+    
+    def get_boards_with_data(self, board_ids: Iterable[int]) -> Dict[int, dict]:
+        """Retorna vários quadros completos, indexados pelo ID do quadro.
+        
+        Cada lote de até BOARD_BATCH_SIZE quadros custa duas consultas: uma para
+        os quadros e uma junção plana colunas + cards, agrupada em Python.
+        Quadros inexistentes ou inativos são omitidos do resultado.
+        """
+        ids = list(dict.fromkeys(board_ids))
+        boards_data = {}
+        
+        with self._read_session_scope() as session:
+            for start in range(0, len(ids), BOARD_BATCH_SIZE):
+                chunk = ids[start:start + BOARD_BATCH_SIZE]
+                boards = [BoardRecord(*row) for row in session.execute(
+                    select(*BOARD_FIELDS).where(
+                        Board.id.in_(chunk),
+                        Board.is_active == True
+                    )
+                )]
+                if not boards:
+                    continue
                 
-                kcolumn_data = {
-                    "id": kcolumn.id,
-                    "uuid": kcolumn.uuid,
-                    "title": kcolumn.title,
-                    "position": kcolumn.position,
-                    "cards": []
-                }
+                for board in boards:
+                    boards_data[board.id] = self._board_to_dict(board)
                 
-                for card in cards:
-                    card_data = {
-                        "id": card.id,
-                        "uuid": card.uuid,
-                        "title": card.title,
-                        "description": card.description,
-                        "assignee": card.assignee,
-                        "due_date": card.due_date,
-                        "priority": card.priority.value,
-                        "position": card.position,
-                        "created_at": card.created_at
-                    }
-                    kcolumn_data["cards"].append(card_data)
+                # Colunas e cards em uma única consulta, apenas com as colunas
+                # necessárias; o desempate por ID mantém as linhas de cada
+                # coluna contíguas
+                rows = session.execute(select(*COLUMN_FIELDS, *CARD_FIELDS).outerjoin(
+                    Card, Card.kcolumn_id == Kcolumn.id
+                ).where(
+                    Kcolumn.board_id.in_([board.id for board in boards])
+                ).order_by(
+                    Kcolumn.board_id, Kcolumn.position, Kcolumn.id,
+                    Card.position, Card.id
+                ))
                 
-                board_data["columns"].append(kcolumn_data)
-            
-            return board_data
+                split = len(COLUMN_FIELDS)
+                kcolumn_data = None
+                for row in rows:
+                    kcolumn = ColumnRecord(*row[:split])
+                    if kcolumn_data is None or kcolumn_data["id"] != kcolumn.id:
+                        kcolumn_data = self._kcolumn_to_dict(kcolumn)
+                        boards_data[kcolumn.board_id]["columns"].append(kcolumn_data)
+                    # Coluna sem cards: os campos do card vêm todos nulos
+                    if row[split] is not None:
+                        kcolumn_data["cards"].append(self._card_to_dict(CardRecord(*row[split:])))
+        
+        # Preserva a ordem dos IDs solicitados
+        return {board_id: boards_data[board_id] for board_id in ids if board_id in boards_data}
+    
+    # Serialização para o formato de get_board_with_data
+    @staticmethod
+    def _board_to_dict(board: BoardRecord) -> dict:
+        return {
+            "id": board.id,
+            "uuid": board.uuid,
+            "name": board.name,
+            "description": board.description,
+            "created_at": board.created_at,
+            "revision": board.revision,
+            "columns": []
+        }
+    
+    @staticmethod
+    def _kcolumn_to_dict(kcolumn: ColumnRecord) -> dict:
+        return {
+            "id": kcolumn.id,
+            "uuid": kcolumn.uuid,
+            "title": kcolumn.title,
+            "position": kcolumn.position,
+            "is_done": kcolumn.is_done,
+            "cards": []
+        }
+    
+    @staticmethod
+    def _card_to_dict(card: CardRecord) -> dict:
+        return {
+            "id": card.id,
+            "uuid": card.uuid,
+            "title": card.title,
+            "description": card.description,
+            "assignee": card.assignee,
+            "due_date": card.due_date,
+            "priority": card.priority.value,
+            "position": card.position,
+            "version": card.version,
+            "created_at": card.created_at
+        }
@@ -0,0 +1,103 @@
+# Busca textual em títulos e descrições de cards
+#
+# SQLite: tabela virtual FTS5 (external content sobre `cards`) mantida por
+# triggers, de modo que inserções em lote e alterações feitas por SQL direto
+# também são indexadas. PostgreSQL: índice GIN sobre a expressão tsvector usada
+# nas consultas. Em ambos os casos o ranking é calculado pelo banco e a ordem é
+# "menor rank primeiro", o que permite paginar por (rank, id).
+import re
+from typing import List, Tuple
+
+from sqlalchemy import ColumnElement, column, func, literal_column, table
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Query, Session
+
+from model import Card
+
+# Configuração de texto do PostgreSQL; "simple" não aplica stemming de idioma
+SEARCH_CONFIG = "simple"
+
+_SEARCH_VECTOR = (
+    f"to_tsvector('{SEARCH_CONFIG}', "
+    "coalesce(cards.title, '') || ' ' || coalesce(cards.description, ''))"
+)
+
+_SQLITE_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS cards_fts USING fts5(
+        title, description,
+        content='cards', content_rowid='id',
+        prefix='2 3', tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS cards_fts_insert AFTER INSERT ON cards BEGIN
+        INSERT INTO cards_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS cards_fts_delete AFTER DELETE ON cards BEGIN
+        INSERT INTO cards_fts(cards_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS cards_fts_update AFTER UPDATE OF title, description ON cards BEGIN
+        INSERT INTO cards_fts(cards_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO cards_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END""",
+    # Indexa os cards já existentes
+    "INSERT INTO cards_fts(cards_fts) VALUES ('rebuild')",
+]
+
+_POSTGRESQL_DDL = [
+    f"CREATE INDEX IF NOT EXISTS ix_cards_search ON cards USING GIN ({_SEARCH_VECTOR})",
+]
+
+_cards_fts = table("cards_fts", column("rowid"))
+
+
+def install_search(connection: Connection) -> None:
+    """Cria as estruturas de busca do banco da conexão (usada pelas migrações)"""
+    dialect = connection.dialect.name
+    if dialect == "sqlite":
+        statements = _SQLITE_DDL
+    elif dialect == "postgresql":
+        statements = _POSTGRESQL_DDL
+    else:
+        raise ValueError(f"Busca textual não suportada para o banco '{dialect}'")
+    for statement in statements:
+        connection.exec_driver_sql(statement)
+
+
+def search_terms(text: str) -> List[str]:
+    """Palavras da consulta; pontuação e operadores são descartados"""
+    return re.findall(r"\w+", text, re.UNICODE)
+
+
+def search_query(session: Session, text: str, *columns) -> Tuple[Query, ColumnElement]:
+    """Consulta dos cards que contêm todas as palavras de `text`, com a última
+    tratada como prefixo, e a expressão de relevância usada para ordená-la.
+    
+    Seleciona `columns` (por padrão a entidade Card) seguidas do rank; ordenar
+    por (rank, Card.id).
+    """
+    terms = search_terms(text)
+    dialect = session.get_bind().dialect.name
+    columns = columns or (Card,)
+    
+    if dialect == "sqlite":
+        # Cada termo entre aspas para não ser interpretado como operador FTS5
+        match = " ".join(f'"{term}"' for term in terms) + "*"
+        rank = func.bm25(literal_column("cards_fts")).label("rank")
+        query = session.query(*columns, rank).select_from(_cards_fts).join(
+            Card, Card.id == _cards_fts.c.rowid
+        ).filter(literal_column("cards_fts").op("MATCH")(match))
+        return query, rank
+    
+    if dialect == "postgresql":
+        vector = literal_column(_SEARCH_VECTOR)
+        tsquery = func.to_tsquery(
+            SEARCH_CONFIG, " & ".join(terms[:-1] + [terms[-1] + ":*"])
+        )
+        # ts_rank cresce com a relevância; negado para manter "menor primeiro"
+        rank = (-func.ts_rank(vector, tsquery)).label("rank")
+        return session.query(*columns, rank).filter(vector.op("@@")(tsquery)), rank
+    
+    raise ValueError(f"Busca textual não suportada para o banco '{dialect}'")
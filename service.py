@@ -1,54 +1,434 @@
 # Classe Principal do Sistema Kanban
-from datetime import datetime
-from typing import List, Optional
-from repository import KanbanRepository
+import csv
+import io
+import json
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple, TypeVar
+from analytics import CYCLE_TIME_PERCENTILES
+from archive import ARCHIVE_BATCH_SIZE, DONE_CARD_RETENTION_DAYS
+from cache import Cache
+from changes import CHANGE_RETENTION
+from repository import (CARD_BATCH_SIZE, PAGE_SIZE, ConcurrencyConflictError, KanbanRepository,
+                        Page, batched)
 from model import Board, Card, Kcolumn, PriorityLevel
+from records import BoardRecord, CardRecord, ColumnRecord
+
+# Campos exportados por card, na ordem das colunas do CSV
+EXPORT_FIELDS = [
+    "kcolumn_id", "kcolumn_title", "id", "uuid", "title", "description",
+    "assignee", "due_date", "priority", "position", "created_at"
+]
+
+# Entradas do cache associadas a cada quadro e chave da listagem de quadros
+BOARD_CACHE_KINDS = ("board", "board_data")
+BOARD_LIST_CACHE_KEY = ("boards",)
+
+# Tentativas e espera base (em segundos) de retry_on_conflict
+CONFLICT_ATTEMPTS = 5
+CONFLICT_BACKOFF = 0.005
+
+T = TypeVar("T")
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Tipo não serializável: {type(value).__name__}")
 
 class KanbanService:
-    def __init__(self, repository: KanbanRepository):
+    def __init__(self, repository: KanbanRepository, cache: Cache = None):
+        """`cache` é opcional; sem ele todas as leituras vão ao banco.
+        
+        Com cache, as leituras de quadros são read-through e cada mutação
+        invalida as entradas do(s) quadro(s) afetado(s) e a listagem de quadros.
+        """
         self.repository = repository
-            
-    def create_board(self, name: str, description: str = None) -> Board:
-        return self.repository.create_board(name=name, description=description)
+        self.cache = cache
+        # Quadros invalidados dentro do batch() atual (None fora de um batch)
+        self._batch_invalidations: ContextVar[Optional[Set]] = ContextVar(
+            f"kanban_batch_invalidations_{id(self)}", default=None
+        )
+        # Geração de cada chave do cache, incrementada a cada invalidação: uma
+        # leitura só grava no cache se nenhuma invalidação ocorreu durante ela
+        self._generations: Dict = {}
+        self._generations_lock = threading.Lock()
     
-    def get_board(self, board_id: int) -> Optional[Board]:
-        return self.repository.get_board(board_id=board_id)
+    @contextmanager
+    def batch(self) -> Iterator["KanbanService"]:
+        """Executa várias chamadas do serviço em uma única transação.
+        
+            with kanban.batch() as uow:
+                column = uow.create_column(board_id, "Revisão")
+                for card_id in card_ids:
+                    uow.move_card(card_id, column.id)
+                uow.update_board(board_id, name="Sprint 2")
+        
+        Commit único ao final e rollback se ocorrer exceção. Dentro do bloco as
+        leituras não usam o cache, e as invalidações são repetidas após o
+        término para descartar leituras concorrentes de dados antigos.
+        """
+        if self._batch_invalidations.get() is not None:
+            yield self
+            return
+        
+        token = self._batch_invalidations.set(set())
+        try:
+            with self.repository.unit_of_work():
+                yield self
+        finally:
+            invalidated = self._batch_invalidations.get()
+            self._batch_invalidations.reset(token)
+            if self.cache is not None:
+                for key in invalidated:
+                    self._invalidate(key)
     
-    def get_all_boards(self) -> List[Board]:
-        return self.repository.get_all_boards()
+    def read_from_primary(self):
+        """Contexto em que as leituras vão ao banco primário, e não às réplicas:
+        
+            with kanban.read_from_primary():
+                data = kanban.get_board_with_data(board_id)
+        
+        Escritas feitas pelo mesmo contexto já são lidas do primário durante
+        `read_your_writes_window`; use-o para enxergar escritas de outros processos.
+        """
+        return self.repository.read_from_primary()
+    
+    def retry_on_conflict(self, operation: Callable[[], T], attempts: int = CONFLICT_ATTEMPTS,
+                          backoff: float = CONFLICT_BACKOFF) -> T:
+        """Executa `operation` repetindo-a quando levantar ConcurrencyConflictError.
+        
+            kanban.retry_on_conflict(lambda: kanban.move_card(card_id, column_id, before_card_id=other_id))
+        
+        Entre as tentativas espera um intervalo aleatório de até
+        `backoff * 2 ** tentativa` segundos, para que os escritores concorrentes
+        não colidam de novo; após `attempts` tentativas o último conflito é
+        propagado. Dentro de batch() a operação roda uma única vez: o conflito
+        desfaz a transação inteira, que deve ser repetida por quem a iniciou.
+        Não faz sentido repetir operações com `expected_version` fixa, que
+        voltariam a falhar.
+        """
+        if self._batch_invalidations.get() is not None:
+            return operation()
+        
+        for attempt in range(attempts):
+            try:
+                return operation()
+            except ConcurrencyConflictError:
+                if attempt == attempts - 1:
+                    raise
+                time.sleep(random.uniform(0, backoff * 2 ** attempt))
+    
+    def create_board(self, name: str, description: str = None) -> BoardRecord:
+        board = self.repository.create_board(name=name, description=description)
+        self._invalidate_board_list()
+        return board
+    
+    def get_board(self, board_id: int, include_archived: bool = False) -> Optional[BoardRecord]:
+        # Leituras que incluem o arquivo são raras e não passam pelo cache
+        if include_archived:
+            return self.repository.get_board(board_id=board_id, include_archived=True)
+        return self._cached(("board", board_id), lambda: self.repository.get_board(board_id=board_id))
+    
+    def get_all_boards(self, include_archived: bool = False) -> List[BoardRecord]:
+        if include_archived:
+            return self.repository.get_all_boards(include_archived=True)
+        return self._cached(BOARD_LIST_CACHE_KEY, self.repository.get_all_boards)
     
     def update_board(self, board_id: int, name: str = None, description: str = None) -> Optional[Board]:
-        return self.repository.update_board(board_id=board_id, name=name, description=description)
+        board = self.repository.update_board(board_id=board_id, name=name, description=description)
+        self._invalidate_boards({board_id})
+        return board
     
     def delete_board(self, board_id: int) -> bool:
-        return self.repository.delete_board(board_id=board_id)
+        deleted = self.repository.delete_board(board_id=board_id)
+        self._invalidate_boards({board_id})
+        return deleted
     
     # CRUD Operations para Kcolumn
-    def create_column(self, board_id: int, title: str, position: int = None) -> Optional[Kcolumn]:
-        return self.repository.create_column(board_id=board_id, title=title, position=position)
+    def create_column(self, board_id: int, title: str, position: int = None,
+                      is_done: bool = False) -> Optional[Kcolumn]:
+        column = self.repository.create_column(board_id=board_id, title=title, position=position, is_done=is_done)
+        self._invalidate_boards({board_id})
+        return column
+    
+    def get_column(self, column_id: int) -> Optional[ColumnRecord]:
+        return self.repository.get_column(column_id=column_id)
     
-    def update_column(self, column_id: int, title: str = None, position: int = None) -> Optional[Kcolumn]:
-        return self.repository.update_column(column_id=column_id, title=title, position=position)
+    def update_column(self, column_id: int, title: str = None, position: int = None,
+                      is_done: bool = None) -> Optional[Kcolumn]:
+        column = self.repository.update_column(column_id=column_id, title=title, position=position,
+                                               is_done=is_done)
+        if column:
+            self._invalidate_boards({column.board_id})
+        return column
     
     def delete_column(self, column_id: int) -> bool:
-        return self.repository.delete_column(column_id=column_id)
+        board_ids = self._boards_of_columns([column_id])
+        deleted = self.repository.delete_column(column_id=column_id)
+        self._invalidate_boards(board_ids)
+        return deleted
     
     # CRUD Operations para Card
     def create_card(self, kcolumn_id: int, title: str, description: str = None, 
                     assignee: str = None, due_date: datetime = None, 
-                    priority: PriorityLevel = PriorityLevel.MEDIUM) -> Optional[Card]:
-        return self.repository.create_card(kcolumn_id=kcolumn_id, title=title, description=description, 
+                    priority: PriorityLevel = PriorityLevel.MEDIUM,
+                    before_card_id: int = None) -> Optional[Card]:
+        card = self.repository.create_card(kcolumn_id=kcolumn_id, title=title, description=description, 
                     assignee=assignee, due_date=due_date, 
-                    priority=priority)
+                    priority=priority, before_card_id=before_card_id)
+        if card:
+            self._invalidate_boards(self._boards_of_columns([kcolumn_id]))
+        return card
+    
+    def get_card(self, card_id: int, include_archived: bool = False) -> Optional[CardRecord]:
+        return self.repository.get_card(card_id=card_id, include_archived=include_archived)
     
     def update_card(self, card_id: int, **kwargs) -> Optional[Card]:
-        return self.repository.update_card(card_id=card_id, kwargs=kwargs)
+        card = self.repository.update_card(card_id=card_id, **kwargs)
+        if card:
+            self._invalidate_boards(self._boards_of_cards([card_id]))
+        return card
+    
+    def move_card(self, card_id: int, target_kcolumn_id: int, position: int = None,
+                  before_card_id: int = None, expected_version: int = None) -> Optional[Card]:
+        # O quadro de origem precisa ser conhecido antes de o card sair dele
+        board_ids = self._boards_of_cards([card_id])
+        card = self.repository.move_card(card_id=card_id, target_kcolumn_id=target_kcolumn_id, position=position,
+                                         before_card_id=before_card_id, expected_version=expected_version)
+        if card:
+            self._invalidate_boards(board_ids | self._boards_of_columns([target_kcolumn_id]))
+        return card
+    
+    def delete_card(self, card_id: int, expected_version: int = None) -> bool:
+        board_ids = self._boards_of_cards([card_id])
+        deleted = self.repository.delete_card(card_id=card_id, expected_version=expected_version)
+        self._invalidate_boards(board_ids)
+        return deleted
+    
+    def rebalance_column(self, kcolumn_id: int) -> int:
+        renumbered = self.repository.rebalance_column(kcolumn_id=kcolumn_id)
+        if renumbered:
+            self._invalidate_boards(self._boards_of_columns([kcolumn_id]))
+        return renumbered
+    
+    # Importação e exportação em lote
+    def bulk_create_cards(self, cards: Iterable[dict], batch_size: int = CARD_BATCH_SIZE) -> List[int]:
+        if self.cache is None:
+            return self.repository.bulk_create_cards(cards=cards, batch_size=batch_size)
+        
+        kcolumn_ids = set()
+        
+        def track_columns(cards):
+            for card in cards:
+                kcolumn_ids.add(card["kcolumn_id"])
+                yield card
+        
+        try:
+            return self.repository.bulk_create_cards(cards=track_columns(cards), batch_size=batch_size)
+        finally:
+            # Lotes anteriores a um erro já foram gravados
+            self._invalidate_boards(self._boards_of_columns(kcolumn_ids))
+    
+    def bulk_move_cards(self, moves: Iterable[Tuple[int, int]], batch_size: int = CARD_BATCH_SIZE) -> int:
+        if self.cache is None:
+            return self.repository.bulk_move_cards(moves=moves, batch_size=batch_size)
+        
+        moved = 0
+        for batch in batched(moves, batch_size):
+            board_ids = self._boards_of_cards([card_id for card_id, _ in batch])
+            board_ids |= self._boards_of_columns([kcolumn_id for _, kcolumn_id in batch])
+            try:
+                moved += self.repository.bulk_move_cards(moves=batch, batch_size=batch_size)
+            finally:
+                self._invalidate_boards(board_ids)
+        return moved
+    
+    def export_board_jsonl(self, board_id: int, batch_size: int = CARD_BATCH_SIZE) -> Iterator[str]:
+        """Gera uma linha JSON por card do quadro, sem carregá-lo inteiro"""
+        for card_data in self.repository.iter_board_cards(board_id=board_id, batch_size=batch_size):
+            yield json.dumps(card_data, default=_json_default, ensure_ascii=False) + "\n"
+    
+    def export_board_csv(self, board_id: int, batch_size: int = CARD_BATCH_SIZE) -> Iterator[str]:
+        """Gera o cabeçalho e uma linha CSV por card do quadro, sem carregá-lo inteiro"""
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+        writer.writeheader()
+        for card_data in self.repository.iter_board_cards(board_id=board_id, batch_size=batch_size):
+            writer.writerow(card_data)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            # Quadro sem cards: apenas o cabeçalho
+            yield buffer.getvalue()
+    
+    def get_board_with_data(self, board_id: int, include_archived: bool = False) -> Optional[dict]:
+        """Retorna o quadro completo; com cache, o dicionário retornado é compartilhado
+        entre chamadas e não deve ser modificado pelo chamador"""
+        if include_archived:
+            return self.repository.get_board_with_data(board_id=board_id, include_archived=True)
+        return self._cached(("board_data", board_id),
+                            lambda: self.repository.get_board_with_data(board_id=board_id))
+    
+    def get_boards_with_data(self, board_ids: Iterable[int]) -> Dict[int, dict]:
+        if self.cache is None or self._batch_invalidations.get() is not None:
+            return self.repository.get_boards_with_data(board_ids=board_ids)
+        
+        board_ids = list(dict.fromkeys(board_ids))
+        boards_data = {}
+        for board_id in board_ids:
+            board_data = self.cache.get(("board_data", board_id))
+            if board_data is not None:
+                boards_data[board_id] = board_data
+        
+        # Apenas os quadros ausentes do cache vão ao banco, em uma única
+        # chamada ao primário (ver _cached)
+        missing = [board_id for board_id in board_ids if board_id not in boards_data]
+        if missing:
+            generations = {board_id: self._generation(("board_data", board_id)) for board_id in missing}
+            with self.repository.read_from_primary():
+                loaded = self.repository.get_boards_with_data(board_ids=missing)
+            for board_id, board_data in loaded.items():
+                self._store(("board_data", board_id), board_data, generations[board_id])
+                boards_data[board_id] = board_data
+        
+        return {board_id: boards_data[board_id] for board_id in board_ids if board_id in boards_data}
+    
+    def get_board_summary(self, board_id: int) -> Optional[dict]:
+        """Totais por coluna e prioridade e cards vencidos; não usa o cache, pois
+        a contagem de vencidos depende do horário da consulta"""
+        return self.repository.get_board_summary(board_id=board_id)
+    
+    def verify_aggregates(self, board_id: int = None, repair: bool = False) -> List[int]:
+        return self.repository.verify_aggregates(board_id=board_id, repair=repair)
+    
+    def get_board_changes(self, board_id: int, since_revision: int = 0) -> Optional[dict]:
+        """Delta do quadro desde `since_revision`; o cliente aplica as alterações
+        sobre o último get_board_with_data, cuja chave "revision" indica o ponto
+        de partida"""
+        return self.repository.get_board_changes(board_id=board_id, since_revision=since_revision)
+    
+    def prune_board_changes(self, older_than: timedelta = CHANGE_RETENTION) -> int:
+        return self.repository.prune_board_changes(older_than=older_than)
+    
+    # Métricas de fluxo, calculadas pelo banco sobre o histórico de transições;
+    # não usam o cache, pois dependem do horário e do intervalo consultados
+    def get_cycle_times(self, board_id: int, since: datetime = None, until: datetime = None,
+                        percentiles: Sequence[float] = CYCLE_TIME_PERCENTILES) -> Optional[dict]:
+        return self.repository.get_cycle_times(board_id=board_id, since=since, until=until,
+                                               percentiles=percentiles)
+    
+    def get_throughput(self, board_id: int, period: str = "week", since: datetime = None,
+                       until: datetime = None) -> Optional[List[dict]]:
+        return self.repository.get_throughput(board_id=board_id, period=period, since=since, until=until)
+    
+    def get_wip(self, board_id: int, at: datetime = None) -> Optional[List[dict]]:
+        return self.repository.get_wip(board_id=board_id, at=at)
+    
+    # Arquivamento
+    def archive_boards(self, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+        # Quadros inativos não são servidos pelo cache; nada a invalidar
+        return self.repository.archive_boards(batch_size=batch_size)
+    
+    def archive_done_cards(self, older_than_days: int = DONE_CARD_RETENTION_DAYS,
+                           batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+        archived = self.repository.archive_done_cards(older_than_days=older_than_days, batch_size=batch_size)
+        # Tarefa de manutenção que pode atingir muitos quadros: descarta o cache inteiro
+        if archived and self.cache is not None:
+            self.cache.clear()
+        return archived
+    
+    def restore_board(self, board_id: int) -> Optional[BoardRecord]:
+        board = self.repository.restore_board(board_id=board_id)
+        if board:
+            self._invalidate_boards({board_id})
+        return board
+    
+    # Listagens paginadas por cursor
+    def list_boards(self, limit: int = PAGE_SIZE, cursor: str = None) -> Page:
+        return self.repository.list_boards(limit=limit, cursor=cursor)
+    
+    def list_cards(self, assignee: str = None, priority: PriorityLevel = None,
+                   due_after: datetime = None, due_before: datetime = None,
+                   kcolumn_id: int = None, board_id: int = None,
+                   limit: int = PAGE_SIZE, cursor: str = None) -> Page:
+        return self.repository.list_cards(assignee=assignee, priority=priority,
+                                          due_after=due_after, due_before=due_before,
+                                          kcolumn_id=kcolumn_id, board_id=board_id,
+                                          limit=limit, cursor=cursor)
+    
+    def iter_cards(self, batch_size: int = PAGE_SIZE, **filters) -> Iterator[CardRecord]:
+        return self.repository.iter_cards(batch_size=batch_size, **filters)
+    
+    def search_cards(self, query: str, board_id: int = None,
+                     limit: int = PAGE_SIZE, cursor: str = None) -> Page:
+        return self.repository.search_cards(query=query, board_id=board_id, limit=limit, cursor=cursor)
+    
+    def cache_stats(self) -> Dict[str, int]:
+        """Contadores de acertos, falhas e remoções do cache (vazio sem cache)"""
+        return self.cache.stats() if self.cache is not None else {}
+    
+    # Cache de leitura
+    def _cached(self, key, loader):
+        # Dentro de um batch a leitura pode conter dados ainda não confirmados
+        if self.cache is None or self._batch_invalidations.get() is not None:
+            return loader()
+        value = self.cache.get(key)
+        if value is None:
+            generation = self._generation(key)
+            # O cache só é preenchido a partir do primário: o snapshot de uma
+            # réplica atrasada ficaria no cache por toda a TTL e seria servido
+            # até ao contexto que acabou de escrever (read-your-writes)
+            with self.repository.read_from_primary():
+                value = loader()
+            self._store(key, value, generation)
+        return value
+    
+    def _generation(self, key) -> int:
+        with self._generations_lock:
+            return self._generations.get(key, 0)
+    
+    def _store(self, key, value, generation: int):
+        """Grava no cache o valor lido a partir de `generation`, a menos que a
+        chave tenha sido invalidada durante a leitura (o valor pode ser antigo)"""
+        with self._generations_lock:
+            if self._generations.get(key, 0) == generation:
+                self.cache.set(key, value)
+    
+    def _invalidate_boards(self, board_ids: Set[int]):
+        if self.cache is None or not board_ids:
+            return
+        for board_id in board_ids:
+            for kind in BOARD_CACHE_KINDS:
+                self._invalidate((kind, board_id))
+        # Toda mutação incrementa a revisão dos quadros, presente na listagem
+        self._invalidate(BOARD_LIST_CACHE_KEY)
+    
+    def _invalidate_board_list(self):
+        if self.cache is not None:
+            self._invalidate(BOARD_LIST_CACHE_KEY)
     
-    def move_card(self, card_id: int, target_kcolumn_id: int, position: int = None) -> Optional[Card]:
-        return self.repository.move_card(card_id=card_id, target_kcolumn_id=target_kcolumn_id, position=position)
+    def _invalidate(self, key):
+        # A geração muda antes da remoção: uma leitura concorrente grava antes
+        # dela (e é removida) ou depois, quando _store a descarta
+        with self._generations_lock:
+            self._generations[key] = self._generations.get(key, 0) + 1
+        self.cache.delete(key)
+        pending = self._batch_invalidations.get()
+        if pending is not None:
+            pending.add(key)
     
-    def delete_card(self, card_id: int) -> bool:
-        return self.repository.delete_card(card_id=card_id)
+    def _boards_of_columns(self, kcolumn_ids: Iterable[int]) -> Set[int]:
+        # A consulta só é necessária quando há cache para invalidar
+        if self.cache is None:
+            return set()
+        return self.repository.get_board_ids_for_columns(kcolumn_ids)
     
-    def get_board_with_data(self, board_id: int) -> Optional[dict]:
-        return self.repository.get_board_with_data(board_id=board_id)
+    def _boards_of_cards(self, card_ids: Iterable[int]) -> Set[int]:
+        if self.cache is None:
+            return set()
+        return self.repository.get_board_ids_for_cards(card_ids)
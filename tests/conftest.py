@@ -0,0 +1,57 @@
+# Fixtures compartilhadas pelos testes
+#
+# Os testes rodam sobre cópias do banco SQLite de main.py (kanban_example.db):
+# o arquivo versionado nunca é alterado, e cada teste parte do mesmo estado.
+import enum
+import os
+import shutil
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import inspect
+
+from db import DatabaseConfig
+from repository import KanbanRepository
+from service import KanbanService
+
+EXAMPLE_DB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "kanban_example.db")
+
+# Campos que dependem do relógio ou são aleatórios, ignorados nas comparações
+VOLATILE_FIELDS = {"uuid", "created_at", "updated_at", "archived_at", "transitioned_at"}
+
+
+def copy_example_db(directory, name: str = "kanban.db") -> str:
+    path = os.path.join(str(directory), name)
+    shutil.copyfile(EXAMPLE_DB, path)
+    return path
+
+
+def normalize(value):
+    """Converte registros, modelos ORM e páginas em estruturas simples, sem os
+    campos voláteis, para comparar resultados de implementações diferentes"""
+    if isinstance(value, dict):
+        return {key: normalize(item) for key, item in value.items() if key not in VOLATILE_FIELDS}
+    if hasattr(value, "_asdict"):
+        return normalize(value._asdict())
+    if isinstance(value, (list, tuple)):
+        return [normalize(item) for item in value]
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, (str, int, float, bool, date, datetime)) or value is None:
+        return value
+    state = inspect(value, raiseerr=False)
+    if state is not None:
+        return normalize({attr.key: getattr(value, attr.key) for attr in state.mapper.column_attrs})
+    raise TypeError(f"Valor sem normalização: {value!r}")
+
+
+@pytest.fixture
+def example_db(tmp_path) -> str:
+    return copy_example_db(tmp_path)
+
+
+@pytest.fixture
+def kanban(example_db):
+    repository = KanbanRepository(DatabaseConfig("sqlite", db_path=example_db))
+    yield KanbanService(repository)
+    repository.engine.dispose()
@@ -0,0 +1,58 @@
+# Arquivamento em lotes: uma transação por lote nas duas APIs
+import asyncio
+
+from sqlalchemy import event
+
+from async_repository import AsyncKanbanRepository
+from db import DatabaseConfig
+
+
+def count_commits(engine) -> list:
+    commits = []
+    event.listen(engine, "commit", lambda connection: commits.append(1))
+    return commits
+
+
+def create_inactive_boards(kanban, count: int):
+    for index in range(count):
+        board = kanban.create_board(f"Inativo {index}")
+        kanban.create_card(board.kcolumns[0].id, "Card")
+        kanban.delete_board(board.id)
+
+
+def test_archive_boards_commits_each_batch(kanban):
+    create_inactive_boards(kanban, 5)
+    commits = count_commits(kanban.repository.engine)
+    
+    assert kanban.archive_boards(batch_size=2) == 5
+    assert len(commits) >= 3
+
+
+def test_async_archive_boards_commits_each_batch(kanban, example_db):
+    create_inactive_boards(kanban, 5)
+    
+    async def main():
+        repository = AsyncKanbanRepository(DatabaseConfig("sqlite", db_path=example_db))
+        commits = count_commits(repository.engine.sync_engine)
+        try:
+            archived = await repository.archive_boards(batch_size=2)
+            done_cards = await repository.archive_done_cards(older_than_days=0, batch_size=2)
+        finally:
+            await repository.dispose()
+        return archived, done_cards, len(commits)
+    
+    archived, done_cards, commits = asyncio.run(main())
+    assert archived == 5 and done_cards == 0
+    assert commits >= 3
+
+
+def test_archived_card_ids_are_not_reused(kanban):
+    board = kanban.create_board("Arquivo")
+    done = board.kcolumns[-1].id
+    archived = kanban.create_card(done, "Concluído")
+    assert kanban.archive_done_cards(older_than_days=0) >= 1
+    
+    # O card arquivado tinha o maior ID: sem AUTOINCREMENT o próximo o reutilizaria
+    card = kanban.create_card(done, "Outro concluído")
+    assert card.id > archived.id
+    assert kanban.archive_done_cards(older_than_days=0) == 1
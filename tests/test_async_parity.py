@@ -0,0 +1,141 @@
+# Paridade entre KanbanService e AsyncKanbanService
+#
+# A mesma sequência de operações roda nas duas APIs, cada uma sobre a sua cópia
+# de kanban_example.db; os resultados de cada passo devem ser iguais (exceto
+# campos voláteis, ver conftest.VOLATILE_FIELDS).
+import asyncio
+import json
+
+from async_repository import AsyncKanbanRepository
+from async_service import AsyncKanbanService
+from conftest import copy_example_db, normalize
+from db import DatabaseConfig
+from model import PriorityLevel
+from repository import KanbanRepository
+from service import KanbanService
+
+
+async def scenario(call) -> list:
+    """Executa as operações por `call(nome, *args, **kwargs)` e devolve o
+    resultado de cada passo"""
+    results = []
+    
+    async def step(name, *args, **kwargs):
+        result = await call(name, *args, **kwargs)
+        results.append((name, normalize(result)))
+        return result
+    
+    existing = await step("get_all_boards")
+    for board in existing:
+        await step("get_board_with_data", board.id)
+    
+    board = await step("create_board", "Paridade", "Quadro criado pelos testes")
+    await step("update_board", board.id, description="Descrição alterada")
+    todo, doing, done = (column.id for column in board.kcolumns)
+    review = await step("create_column", board.id, "Revisão", position=2)
+    await step("update_column", review.id, title="Em revisão")
+    
+    first = await step("create_card", todo, "Primeiro", "Descrição", "Ana", priority=PriorityLevel.HIGH)
+    second = await step("create_card", todo, "Segundo", priority=PriorityLevel.LOW)
+    third = await step("create_card", todo, "Terceiro", before_card_id=first.id)
+    await step("get_card", first.id)
+    await step("update_card", second.id, title="Segundo (editado)", priority=PriorityLevel.HIGH)
+    await step("move_card", first.id, doing)
+    await step("move_card", second.id, doing, before_card_id=first.id)
+    await step("move_card", third.id, review.id)
+    
+    imported = await step("bulk_create_cards", [
+        {"kcolumn_id": todo, "title": f"Importado {index}", "priority": list(PriorityLevel)[index % 3]}
+        for index in range(7)
+    ], batch_size=3)
+    await step("bulk_move_cards", [(card_id, done) for card_id in imported[:4]], batch_size=3)
+    await step("move_card", first.id, done)
+    await step("delete_card", imported[-1])
+    await step("rebalance_column", todo)
+    await step("delete_column", review.id)
+    
+    await step("get_board_with_data", board.id)
+    await step("get_boards_with_data", [board.id, *(existing_board.id for existing_board in existing)])
+    await step("get_board_summary", board.id)
+    await step("verify_aggregates", board.id)
+    await step("get_board_changes", board.id, since_revision=0)
+    await step("get_wip", board.id)
+    await step("list_boards", limit=2)
+    await step("list_cards", limit=3, assignee="Ana")
+    await step("search_cards", "Importado", board_id=board.id, limit=5)
+    await step("export_board_jsonl", board.id, batch_size=4)
+    
+    other = await step("create_board", "Descartável")
+    await step("delete_board", other.id)
+    await step("get_board", other.id)
+    await step("get_all_boards")
+    return results
+
+
+def run_sync(path: str) -> list:
+    repository = KanbanRepository(DatabaseConfig("sqlite", db_path=path))
+    kanban = KanbanService(repository)
+    
+    async def call(name, *args, **kwargs):
+        result = getattr(kanban, name)(*args, **kwargs)
+        if name == "export_board_jsonl":
+            return [json.loads(line) for line in result]
+        return result
+    
+    try:
+        return asyncio.run(scenario(call))
+    finally:
+        repository.engine.dispose()
+
+
+def run_async(path: str) -> list:
+    async def main():
+        repository = AsyncKanbanRepository(DatabaseConfig("sqlite", db_path=path))
+        await repository.create_tables()
+        kanban = AsyncKanbanService(repository)
+        
+        async def call(name, *args, **kwargs):
+            if name == "export_board_jsonl":
+                return [json.loads(line) async for line in kanban.export_board_jsonl(*args, **kwargs)]
+            return await getattr(kanban, name)(*args, **kwargs)
+        
+        try:
+            return await scenario(call)
+        finally:
+            await repository.dispose()
+    
+    return asyncio.run(main())
+
+
+def test_same_results_as_sync_service(tmp_path):
+    sync_results = run_sync(copy_example_db(tmp_path, "sync.db"))
+    async_results = run_async(copy_example_db(tmp_path, "async.db"))
+    
+    assert [name for name, _ in async_results] == [name for name, _ in sync_results]
+    for (name, expected), (_, actual) in zip(sync_results, async_results):
+        assert actual == expected, name
+
+
+def test_concurrent_snapshots_match_sequential_reads(example_db):
+    async def main():
+        repository = AsyncKanbanRepository(DatabaseConfig("sqlite", db_path=example_db))
+        await repository.create_tables()
+        kanban = AsyncKanbanService(repository)
+        try:
+            boards = await kanban.get_all_boards()
+            concurrent = await asyncio.gather(*(kanban.get_board_with_data(board.id) for board in boards))
+            sequential = [await kanban.get_board_with_data(board.id) for board in boards]
+            return concurrent, sequential
+        finally:
+            await repository.dispose()
+    
+    concurrent, sequential = asyncio.run(main())
+    assert concurrent == sequential
+    
+    repository = KanbanRepository(DatabaseConfig("sqlite", db_path=example_db))
+    try:
+        kanban = KanbanService(repository)
+        expected = [kanban.get_board_with_data(board.id) for board in kanban.get_all_boards()]
+    finally:
+        repository.engine.dispose()
+    assert normalize(concurrent) == normalize(expected)
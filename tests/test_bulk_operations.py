@@ -0,0 +1,32 @@
+# Operações em lote: poucas instruções por lote e resultados na ordem da entrada
+from sqlalchemy import event
+
+from model import PriorityLevel
+
+
+def count_card_inserts(engine) -> list:
+    inserts = []
+    
+    @event.listens_for(engine, "before_cursor_execute")
+    def count(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().startswith("INSERT INTO cards "):
+            inserts.append(statement)
+    
+    return inserts
+
+
+def test_bulk_create_cards_inserts_each_batch_at_once(kanban):
+    board = kanban.create_board("Importação")
+    todo, doing, _ = board.kcolumns
+    # Colunas alternadas: a ordem da entrada difere da ordem por coluna
+    cards = [
+        {"kcolumn_id": (todo, doing)[index % 2].id, "title": f"Card {index}", "priority": list(PriorityLevel)[index % 3]}
+        for index in range(50)
+    ]
+    inserts = count_card_inserts(kanban.repository.engine)
+    
+    card_ids = kanban.bulk_create_cards(cards, batch_size=25)
+    
+    assert len(inserts) == 2
+    assert [kanban.get_card(card_id).title for card_id in card_ids] == [card["title"] for card in cards]
+    assert kanban.verify_aggregates(board.id) == []
@@ -0,0 +1,49 @@
+# Cache de leitura do serviço
+import pytest
+
+from cache import TTLCache
+from db import DatabaseConfig
+from repository import KanbanRepository
+from service import KanbanService
+
+
+def test_cached_board_list_follows_revisions(example_db):
+    repository = KanbanRepository(DatabaseConfig("sqlite", db_path=example_db))
+    kanban = KanbanService(repository, cache=TTLCache(ttl=60.0))
+    try:
+        board = kanban.create_board("Revisões")
+        column = board.kcolumns[0]
+        kanban.get_all_boards()
+        
+        card = kanban.create_card(column.id, "Card")
+        kanban.move_card(card.id, board.kcolumns[1].id)
+        cached = {item.id: item.revision for item in kanban.get_all_boards()}
+        stored = {item.id: item.revision for item in repository.get_all_boards()}
+        assert cached == stored
+        assert cached[board.id] == kanban.get_board(board.id).revision
+    finally:
+        repository.engine.dispose()
+
+
+@pytest.mark.parametrize("loader", ["get_board_with_data", "get_boards_with_data"])
+def test_invalidation_during_load_is_not_overwritten(kanban, monkeypatch, loader):
+    kanban.cache = TTLCache(ttl=60.0)
+    board = kanban.create_board("Antigo")
+    original = getattr(kanban.repository, loader)
+    writes = []
+    
+    def load_then_write(*args, **kwargs):
+        # Um escritor invalida o quadro depois da leitura e antes do set
+        result = original(*args, **kwargs)
+        if not writes:
+            writes.append(kanban.update_board(board.id, name="Novo"))
+        return result
+    
+    monkeypatch.setattr(kanban.repository, loader, load_then_write)
+    if loader == "get_boards_with_data":
+        stale = kanban.get_boards_with_data([board.id])[board.id]
+    else:
+        stale = kanban.get_board_with_data(board.id)
+    assert stale["name"] == "Antigo"
+    assert kanban.get_board_with_data(board.id)["name"] == "Novo"
+    assert kanban.get_boards_with_data([board.id])[board.id]["name"] == "Novo"
@@ -0,0 +1,44 @@
+# Concorrência otimista: conflitos de versão chegam como ConcurrencyConflictError
+from contextlib import nullcontext
+
+import pytest
+from sqlalchemy import event
+
+from model import PriorityLevel
+from repository import ConcurrencyConflictError
+
+
+def bump_version_after_card_read(engine, card_id: int):
+    """Simula outro escritor: logo depois da leitura do card pela operação,
+    incrementa a versão dele na mesma conexão (sem disputar o bloqueio do SQLite)"""
+    armed = [True]
+    
+    @event.listens_for(engine, "after_cursor_execute")
+    def bump(conn, cursor, statement, parameters, context, executemany):
+        if armed and statement.lstrip().startswith("SELECT cards.id"):
+            armed.clear()
+            cursor.connection.execute("UPDATE cards SET version = version + 1 WHERE id = ?", (card_id,))
+    
+    return bump
+
+
+@pytest.mark.parametrize("batched", [False, True], ids=["direct", "batch"])
+@pytest.mark.parametrize("changes", [
+    {"title": "Editado"},
+    {"title": "Editado", "priority": PriorityLevel.HIGH},
+], ids=["fields", "aggregates"])
+def test_update_card_conflict_is_typed(kanban, batched, changes):
+    board = kanban.create_board("Conflitos")
+    card = kanban.create_card(board.kcolumns[0].id, "Card", priority=PriorityLevel.LOW)
+    engine = kanban.repository.engine
+    listener = bump_version_after_card_read(engine, card.id)
+    try:
+        with pytest.raises(ConcurrencyConflictError):
+            with kanban.batch() if batched else nullcontext():
+                kanban.update_card(card.id, **changes)
+    finally:
+        event.remove(engine, "after_cursor_execute", listener)
+    
+    stored = kanban.get_card(card.id)
+    assert stored.title == "Card" and stored.priority == PriorityLevel.LOW
+    assert kanban.verify_aggregates(board.id) == []
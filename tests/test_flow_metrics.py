@@ -0,0 +1,78 @@
+# Histórico de transições e métricas de fluxo
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, text, update
+
+from db import DatabaseConfig
+from model import Card, SchemaMigration
+from repository import KanbanRepository
+from service import KanbanService
+
+
+def wip_by_title(columns) -> dict:
+    return {column["title"]: column["wip"] for column in columns}
+
+
+def assert_history_matches_aggregates(kanban, board_id: int):
+    """O WIP atual (agregados) e o reconstruído do histórico devem coincidir"""
+    assert kanban.get_wip(board_id, at=datetime.now()) == kanban.get_wip(board_id)
+
+
+def test_update_card_column_change_is_a_transition(kanban):
+    board = kanban.create_board("Fluxo")
+    todo, doing, done = board.kcolumns
+    card = kanban.create_card(todo.id, "Card")
+    kanban.update_card(card.id, kcolumn_id=doing.id)
+    kanban.update_card(card.id, kcolumn_id=done.id)
+    
+    assert wip_by_title(kanban.get_wip(board.id))["Concluído"] == 1
+    assert_history_matches_aggregates(kanban, board.id)
+    metrics = kanban.get_cycle_times(board.id)
+    assert metrics["lead_time"]["count"] == 1 and metrics["cycle_time"]["count"] == 1
+
+
+def test_archived_and_restored_cards_leave_and_reenter_wip(kanban):
+    board = kanban.create_board("Arquivamento")
+    todo, _, done = board.kcolumns
+    cards = [kanban.create_card(todo.id, f"Card {index}") for index in range(3)]
+    for card in cards[:2]:
+        kanban.move_card(card.id, done.id)
+    with kanban.repository._session_scope() as session:
+        session.execute(update(Card).where(Card.kcolumn_id == done.id).values(
+            updated_at=datetime.now() - timedelta(days=60)
+        ))
+    
+    assert kanban.archive_done_cards(older_than_days=30) == 2
+    assert wip_by_title(kanban.get_wip(board.id))["Concluído"] == 0
+    assert_history_matches_aggregates(kanban, board.id)
+    assert kanban.get_cycle_times(board.id)["lead_time"]["count"] == 2
+    
+    kanban.delete_board(board.id)
+    kanban.archive_boards()
+    kanban.restore_board(board.id)
+    assert wip_by_title(kanban.get_wip(board.id)) == {"A Fazer": 1, "Em Progresso": 0, "Concluído": 2}
+    assert_history_matches_aggregates(kanban, board.id)
+    assert kanban.get_cycle_times(board.id)["lead_time"]["count"] == 2
+
+
+def test_new_card_does_not_inherit_deleted_card_history(kanban, example_db):
+    board = kanban.create_board("Reuso")
+    todo, _, done = board.kcolumns
+    deleted = kanban.create_card(todo.id, "Removido")
+    kanban.move_card(deleted.id, done.id)
+    kanban.delete_card(deleted.id)
+    
+    # Banco anterior à migração 9: sem sequência, o maior ID seria reutilizado
+    with kanban.repository._session_scope() as session:
+        session.execute(text("DELETE FROM sqlite_sequence WHERE name = 'cards'"))
+        session.execute(delete(SchemaMigration).where(SchemaMigration.version == 9))
+    repository = KanbanRepository(DatabaseConfig("sqlite", db_path=example_db))
+    try:
+        kanban = KanbanService(repository)
+        card = kanban.create_card(todo.id, "Novo")
+        assert card.id > deleted.id
+        assert kanban.get_cycle_times(board.id)["lead_time"]["count"] == 1
+        assert wip_by_title(kanban.get_wip(board.id))["A Fazer"] == 1
+        assert_history_matches_aggregates(kanban, board.id)
+    finally:
+        repository.engine.dispose()
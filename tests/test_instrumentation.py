@@ -0,0 +1,71 @@
+# Instrumentação do serviço: geradores medidos só durante os próprios passos
+import asyncio
+
+from async_repository import AsyncKanbanRepository
+from async_service import AsyncKanbanService
+from db import DatabaseConfig
+from instrumentation import Histogram, InMemoryMetricsSink, instrument_service
+
+
+def iter_cards_queries(kanban, interleave: bool) -> float:
+    """Consultas atribuídas a iter_cards, opcionalmente com consultas do
+    consumidor (fora da instrumentação) entre os itens"""
+    sink = InMemoryMetricsSink()
+    instrumented = instrument_service(kanban, sink=sink)
+    try:
+        for card in instrumented.iter_cards(batch_size=2):
+            if interleave:
+                kanban.get_board_summary(1)
+    finally:
+        instrumented.remove()
+    assert sink.counter("kanban.operation.calls", operation="iter_cards") == 1
+    return sink.histogram("kanban.operation.queries", operation="iter_cards")["sum"]
+
+
+def test_paused_generator_does_not_count_consumer_queries(kanban):
+    assert iter_cards_queries(kanban, interleave=True) == iter_cards_queries(kanban, interleave=False)
+
+
+def test_abandoned_generator_is_recorded(kanban):
+    board = kanban.create_board("Exportação")
+    for index in range(3):
+        kanban.create_card(board.kcolumns[0].id, f"Card {index}")
+    sink = InMemoryMetricsSink()
+    instrumented = instrument_service(kanban, sink=sink)
+    try:
+        lines = instrumented.export_board_jsonl(board.id, batch_size=1)
+        next(lines)
+        lines.close()
+    finally:
+        instrumented.remove()
+    assert sink.counter("kanban.operation.calls", operation="export_board_jsonl") == 1
+    assert sink.histogram("kanban.operation.queries", operation="export_board_jsonl")["sum"] >= 1
+
+
+def test_abandoned_async_generator_is_recorded(example_db):
+    async def main():
+        repository = AsyncKanbanRepository(DatabaseConfig("sqlite", db_path=example_db))
+        await repository.create_tables()
+        sink = InMemoryMetricsSink()
+        instrumented = instrument_service(AsyncKanbanService(repository), sink=sink)
+        try:
+            board = await instrumented.create_board("Exportação")
+            await instrumented.create_card(board.kcolumns[0].id, "Card")
+            lines = instrumented.export_board_jsonl(board.id, batch_size=1)
+            await lines.__anext__()
+            await lines.aclose()
+        finally:
+            instrumented.remove()
+            await repository.dispose()
+        return sink
+    
+    sink = asyncio.run(main())
+    assert sink.counter("kanban.operation.calls", operation="export_board_jsonl") == 1
+
+
+def test_histogram_quantile_is_capped_at_max():
+    histogram = Histogram()
+    for value in (3.0, 3.0, 4.0):
+        histogram.observe(value)
+    assert histogram.quantile(0.5) == 4.0
+    assert histogram.summary()["p99"] == 4.0
@@ -0,0 +1,25 @@
+# Interfaces extensíveis: implementações parciais falham na construção
+import pytest
+
+from cache import Cache, TTLCache
+from instrumentation import InMemoryMetricsSink, MetricsSink
+
+
+def test_partial_cache_fails_at_construction():
+    class GetOnlyCache(Cache):
+        def get(self, key):
+            return None
+    
+    with pytest.raises(TypeError):
+        GetOnlyCache()
+    assert TTLCache().stats()["size"] == 0
+
+
+def test_partial_metrics_sink_fails_at_construction():
+    class CounterOnlySink(MetricsSink):
+        def increment(self, name, value=1, tags=None):
+            pass
+    
+    with pytest.raises(TypeError):
+        CounterOnlySink()
+    InMemoryMetricsSink().observe("latency_ms", 1.0)
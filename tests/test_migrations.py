@@ -0,0 +1,44 @@
+# Migrações sobre o banco de main.py, criado antes do controle de versões
+from sqlalchemy import inspect, text
+
+from db import DatabaseConfig
+from migrations import MIGRATIONS, SCHEMA_VERSION, ensure_schema, get_schema_version
+from repository import KanbanRepository
+from service import KanbanService
+
+
+def test_example_db_migrates_to_current_schema(example_db):
+    repository = KanbanRepository(DatabaseConfig("sqlite", db_path=example_db))
+    try:
+        with repository.engine.begin() as connection:
+            assert get_schema_version(connection) == SCHEMA_VERSION
+            assert ensure_schema(connection) is None
+            indexes = {index["name"] for index in inspect(connection).get_indexes("cards")}
+        assert "ix_cards_kcolumn_due_date" in indexes
+        assert [migration.version for migration in MIGRATIONS] == list(range(1, SCHEMA_VERSION + 1))
+    finally:
+        repository.engine.dispose()
+
+
+def test_rebuilt_tables_keep_rows_and_search(example_db):
+    repository = KanbanRepository(DatabaseConfig("sqlite", db_path=example_db))
+    try:
+        kanban = KanbanService(repository)
+        boards = kanban.get_all_boards()
+        with repository.engine.begin() as connection:
+            for table in ("boards", "kcolumns", "cards"):
+                ddl = connection.execute(
+                    text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": table}
+                ).scalar()
+                assert "AUTOINCREMENT" in ddl
+        cards = [
+            card for board in kanban.get_boards_with_data([board.id for board in boards]).values()
+            for column in board["columns"] for card in column["cards"]
+        ]
+        assert cards
+        for card in cards:
+            assert card["id"] in [found.id for found in kanban.search_cards(card["title"]).items]
+        for board in boards:
+            assert kanban.verify_aggregates(board.id) == []
+    finally:
+        repository.engine.dispose()
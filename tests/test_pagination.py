@@ -0,0 +1,29 @@
+# Listagens paginadas por cursor
+import pytest
+
+
+@pytest.mark.parametrize("limit", [0, -1])
+@pytest.mark.parametrize("listing", [
+    lambda kanban, limit: kanban.list_boards(limit=limit),
+    lambda kanban, limit: kanban.list_cards(limit=limit),
+    lambda kanban, limit: kanban.search_cards("card", limit=limit),
+    lambda kanban, limit: list(kanban.iter_cards(batch_size=limit)),
+], ids=["list_boards", "list_cards", "search_cards", "iter_cards"])
+def test_page_size_must_be_positive(kanban, listing, limit):
+    with pytest.raises(ValueError):
+        listing(kanban, limit)
+
+
+def test_single_item_pages_cover_every_result(kanban):
+    board = kanban.create_board("Paginação")
+    created = [kanban.create_card(board.kcolumns[0].id, f"Card {index}").id for index in range(3)]
+    
+    seen, cursor = [], None
+    while True:
+        page = kanban.search_cards("card", board_id=board.id, limit=1, cursor=cursor)
+        seen.extend(card.id for card in page.items)
+        if page.next_cursor is None:
+            break
+        cursor = page.next_cursor
+    assert sorted(seen) == created
+    assert [card.id for card in kanban.iter_cards(batch_size=1, board_id=board.id)] == created
@@ -0,0 +1,44 @@
+# Réplicas de leitura com o cache do serviço
+import threading
+
+import pytest
+
+from cache import TTLCache
+from conftest import copy_example_db
+from db import DatabaseConfig
+from repository import KanbanRepository
+from service import KanbanService
+
+
+def read_single(kanban, board_id: int) -> dict:
+    return kanban.get_board_with_data(board_id)
+
+
+def read_many(kanban, board_id: int) -> dict:
+    return kanban.get_boards_with_data([board_id])[board_id]
+
+
+@pytest.mark.parametrize("read", [read_single, read_many], ids=["get_board_with_data", "get_boards_with_data"])
+def test_cache_keeps_read_your_writes_with_lagging_replica(tmp_path, read):
+    config = DatabaseConfig(
+        "sqlite", db_path=copy_example_db(tmp_path, "primary.db"),
+        replicas=[{"db_path": str(tmp_path / "replica.db")}], read_your_writes_window=60.0
+    )
+    repository = KanbanRepository(config)
+    kanban = KanbanService(repository, cache=TTLCache(ttl=60.0))
+    try:
+        board = kanban.create_board("Réplicas")
+        repository.refresh_replicas()
+        kanban.create_card(board.kcolumns[0].id, "Card")
+        
+        # Outra thread, sem escritas recentes, lê durante o atraso da réplica
+        reader = threading.Thread(target=read, args=(kanban, board.id))
+        reader.start()
+        reader.join()
+        
+        board_data = read(kanban, board.id)
+        assert [len(column["cards"]) for column in board_data["columns"]] == [1, 0, 0]
+    finally:
+        repository.engine.dispose()
+        for engine in repository.replicas.engines:
+            engine.dispose()